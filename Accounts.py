@@ -0,0 +1,144 @@
+# Customer accounts. Every sale is invoiced to its customer's account and
+# payments are recorded against it. CustomerAccounts keeps the running
+# totals, maintained by triggers on Sales and CustomerPayments, so a
+# customer's balance is a single primary-key lookup at the till however
+# long their history. CustomerLedger is the line-by-line view behind the
+# account statement.
+#
+# CustomerAccounts has no foreign key on purpose: it is derived from Sales
+# and payments, so when a customer is archived (see Archive.py) only those
+# rows move, and their triggers take the balance down and back up again.
+# The account row itself, and its credit limit, stays put.
+
+class CreditLimitExceeded(Exception):
+    def __init__(self, customer_id, available):
+        super().__init__(f"Sale exceeds the credit limit of customer {customer_id} (available {available:.2f})")
+        self.customer_id = customer_id
+        self.available = available
+
+# Balance change applied by the triggers: (customer, invoiced delta, paid delta)
+def _apply(customer, invoiced, paid):
+    return f'''
+        INSERT INTO CustomerAccounts (customer_id, balance, total_invoiced, total_paid)
+        VALUES ({customer}, {invoiced} - {paid}, {invoiced}, {paid})
+        ON CONFLICT (customer_id) DO UPDATE SET
+            balance = balance + excluded.balance,
+            total_invoiced = total_invoiced + excluded.total_invoiced,
+            total_paid = total_paid + excluded.total_paid;'''
+
+def ensure_accounts_schema(conn):
+    new = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'CustomerAccounts'").fetchone() is None
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS CustomerAccounts (
+        customer_id INTEGER PRIMARY KEY,
+        balance REAL NOT NULL DEFAULT 0,
+        total_invoiced REAL NOT NULL DEFAULT 0,
+        total_paid REAL NOT NULL DEFAULT 0,
+        credit_limit REAL
+    )
+    ''')
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS CustomerPayments (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        customer_id INTEGER NOT NULL,
+        date DATE NOT NULL,
+        amount REAL NOT NULL,
+        method TEXT,
+        reference TEXT,
+        FOREIGN KEY (customer_id) REFERENCES Customers(id) ON DELETE RESTRICT
+    )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_customer_payments_customer ON CustomerPayments (customer_id, date)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_sales_customer_date ON Sales (customer_id, date)')
+
+    for name, event, body in (
+        ('account_sale_insert', 'AFTER INSERT ON Sales',
+         _apply('NEW.customer_id', 'NEW.total_price', '0')),
+        ('account_sale_delete', 'AFTER DELETE ON Sales',
+         _apply('OLD.customer_id', '-OLD.total_price', '0')),
+        ('account_sale_update', 'AFTER UPDATE OF customer_id, total_price ON Sales',
+         _apply('OLD.customer_id', '-OLD.total_price', '0') + _apply('NEW.customer_id', 'NEW.total_price', '0')),
+        ('account_payment_insert', 'AFTER INSERT ON CustomerPayments',
+         _apply('NEW.customer_id', '0', 'NEW.amount')),
+        ('account_payment_delete', 'AFTER DELETE ON CustomerPayments',
+         _apply('OLD.customer_id', '0', '-OLD.amount')),
+        ('account_payment_update', 'AFTER UPDATE OF customer_id, amount ON CustomerPayments',
+         _apply('OLD.customer_id', '0', '-OLD.amount') + _apply('NEW.customer_id', '0', 'NEW.amount')),
+    ):
+        conn.execute(f'CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN {body} END')
+
+    conn.execute('''
+    CREATE VIEW IF NOT EXISTS CustomerLedger AS
+    SELECT customer_id, date, 'sale' AS kind, id AS entry_id, total_price AS amount FROM Sales
+    UNION ALL
+    SELECT customer_id, date, 'payment', id, -amount FROM CustomerPayments
+    ''')
+
+    # Open accounts for the sales already on file
+    if new:
+        conn.execute('''
+        INSERT INTO CustomerAccounts (customer_id, balance, total_invoiced)
+        SELECT customer_id, TOTAL(total_price), TOTAL(total_price) FROM Sales GROUP BY customer_id
+        ''')
+
+def get_account(conn, customer_id):
+    return conn.execute('SELECT * FROM CustomerAccounts WHERE customer_id = ?', (customer_id,)).fetchone()
+
+# Raise CreditLimitExceeded if adding `amount` to the customer's balance
+# (after taking off `released`, e.g. the sale being edited) would go over
+# their credit limit. Customers without a limit are never refused.
+def check_credit(conn, customer_id, amount, released=0.0):
+    row = conn.execute('SELECT balance, credit_limit FROM CustomerAccounts WHERE customer_id = ?',
+                       (customer_id,)).fetchone()
+    if row is None or row[1] is None:
+        return
+    available = row[1] - (row[0] - released)
+    if amount > available + 1e-9:
+        raise CreditLimitExceeded(customer_id, available)
+
+# None removes the limit
+def set_credit_limit(conn, customer_id, credit_limit):
+    conn.execute('''
+    INSERT INTO CustomerAccounts (customer_id, credit_limit) VALUES (?, ?)
+    ON CONFLICT (customer_id) DO UPDATE SET credit_limit = excluded.credit_limit
+    ''', (customer_id, credit_limit))
+
+def record_payment(conn, customer_id, on_date, amount, method=None, reference=None):
+    return conn.execute('INSERT INTO CustomerPayments (customer_id, date, amount, method, reference) VALUES (?, ?, ?, ?, ?)',
+                        (customer_id, on_date, amount, method, reference)).lastrowid
+
+def delete_payment(conn, payment_id):
+    conn.execute('DELETE FROM CustomerPayments WHERE id = ?', (payment_id,))
+
+# Ledger lines for one customer with a running balance, oldest first.
+# Sales moved to history by close_period are no longer in the ledger, so
+# the statement opens with the balance they left behind.
+def statement(conn, customer_id):
+    account = conn.execute('SELECT balance FROM CustomerAccounts WHERE customer_id = ?', (customer_id,)).fetchone()
+    balance = account[0] if account else 0.0
+    lines = conn.execute('''
+    SELECT date, kind, entry_id, amount,
+           SUM(amount) OVER (ORDER BY date, kind DESC, entry_id) AS running
+    FROM CustomerLedger WHERE customer_id = ?
+    ORDER BY date, kind DESC, entry_id
+    ''', (customer_id,)).fetchall()
+    opening = balance - (lines[-1][4] if lines else 0.0)
+    return opening, [(line_date, kind, entry_id, amount, opening + running)
+                     for line_date, kind, entry_id, amount, running in lines]
+
+# Sales about to leave the live database for history (Tiering.close_period)
+# stay on their customers' accounts: credit them back before the delete
+# takes them off.
+def keep_closed_sales(conn, where, params):
+    conn.execute(f'''
+    UPDATE CustomerAccounts SET balance = balance + moved.total, total_invoiced = total_invoiced + moved.total
+    FROM (SELECT customer_id, TOTAL(total_price) AS total FROM main.Sales WHERE {where} GROUP BY customer_id) AS moved
+    WHERE CustomerAccounts.customer_id = moved.customer_id
+    ''', params)
+
+def list_payments(conn, limit=100):
+    return conn.execute('''
+    SELECT p.id, p.date, p.customer_id, c.name AS customer, p.amount, p.method, p.reference
+    FROM CustomerPayments p LEFT JOIN Customers c ON p.customer_id = c.id
+    ORDER BY p.date DESC, p.id DESC LIMIT ?
+    ''', (limit,))
@@ -0,0 +1,139 @@
+import json
+import os
+import sqlite3
+import sys
+import Config
+
+# Tables exported for analytics, partitioned by month
+EXPORT_TABLES = ('Sales', 'Production', 'MilkCollection', 'Expenses')
+
+FORMATS = {'arrow': 'data.arrow', 'parquet': 'data.parquet'}
+
+# pyarrow is only needed for the export itself
+def _require_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise RuntimeError("Analytics export needs pyarrow: pip install pyarrow")
+    return pyarrow
+
+# A change counter per table and month, bumped by triggers on every insert,
+# update and delete, so any edit (text, references, a date moved within the
+# month) marks its partition for rewriting. Months with rows from before the
+# triggers existed start at version 1.
+def ensure_analytics_schema(conn):
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='AnalyticsPartitions'").fetchone()
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS AnalyticsPartitions (
+        table_name TEXT NOT NULL,
+        month TEXT NOT NULL,
+        version INTEGER NOT NULL,
+        PRIMARY KEY (table_name, month)
+    ) WITHOUT ROWID
+    ''')
+    # UPSERT rather than OR IGNORE/REPLACE: these triggers also fire from
+    # ON DELETE SET NULL actions, which override a statement's conflict clause
+    bump = '''
+        INSERT INTO AnalyticsPartitions (table_name, month, version) VALUES ('{table}', substr({ref}.date, 1, 7), 1)
+        ON CONFLICT (table_name, month) DO UPDATE SET version = version + 1;'''
+    for table in EXPORT_TABLES:
+        for event, refs in (('INSERT', ('NEW',)), ('UPDATE', ('OLD', 'NEW')), ('DELETE', ('OLD',))):
+            body = ''.join(bump.format(table=table, ref=ref) for ref in refs)
+            conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS analytics_{table}_{event.lower()} AFTER {event} ON {table}
+            BEGIN{body}
+            END
+            ''')
+        if not exists:
+            conn.execute(f'''
+            INSERT OR IGNORE INTO AnalyticsPartitions (table_name, month, version)
+            SELECT DISTINCT '{table}', substr(date, 1, 7), 1 FROM {table}
+            ''')
+
+# One row per month with rows: (month, row count, change counter)
+def partition_fingerprints(conn, table):
+    rows = conn.execute(f'''
+    SELECT t.month, t.rows, COALESCE(p.version, 0)
+    FROM (SELECT substr(date, 1, 7) AS month, COUNT(*) AS rows FROM {table} GROUP BY month) t
+    LEFT JOIN AnalyticsPartitions p ON p.table_name = ? AND p.month = t.month
+    ORDER BY t.month
+    ''', (table,)).fetchall()
+    return {month: [count, version] for month, count, version in rows}
+
+def _load_manifest(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def _write_partition(pa, conn, table, month, path, fmt):
+    cursor = conn.execute(f"SELECT * FROM {table} WHERE substr(date, 1, 7) = ? ORDER BY id", (month,))
+    names = [d[0] for d in cursor.description]
+    rows = cursor.fetchall()
+    columns = {name: pa.array([row[i] for row in rows]) for i, name in enumerate(names)}
+    data = pa.table(columns)
+    tmp_path = path + '.tmp'
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        pq.write_table(data, tmp_path)
+    else:
+        with pa.OSFile(tmp_path, 'wb') as sink:
+            with pa.ipc.new_file(sink, data.schema) as writer:
+                writer.write_table(data)
+    os.replace(tmp_path, path)
+    return len(rows)
+
+# Export each table into <out_dir>/<table>/month=YYYY-MM/data.<fmt>.
+# Only partitions whose fingerprint changed since the last run are rewritten;
+# partitions whose month no longer has rows are removed.
+def export_all(db_path='dairy.db', out_dir='analytics', fmt='arrow'):
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format {fmt!r}, expected one of {sorted(FORMATS)}")
+    pa = _require_pyarrow()
+    conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+    summary = {}
+    try:
+        for table in EXPORT_TABLES:
+            table_dir = os.path.join(out_dir, table)
+            os.makedirs(table_dir, exist_ok=True)
+            manifest_path = os.path.join(table_dir, '_manifest.json')
+            manifest = _load_manifest(manifest_path)
+            if manifest.get('format') != fmt:
+                manifest = {'format': fmt, 'partitions': {}}
+            current = partition_fingerprints(conn, table)
+            written = 0
+            for month, fingerprint in current.items():
+                part_dir = os.path.join(table_dir, f'month={month}')
+                path = os.path.join(part_dir, FORMATS[fmt])
+                if manifest['partitions'].get(month) == fingerprint and os.path.exists(path):
+                    continue
+                os.makedirs(part_dir, exist_ok=True)
+                _write_partition(pa, conn, table, month, path, fmt)
+                written += 1
+            for month in set(manifest['partitions']) - set(current):
+                path = os.path.join(table_dir, f'month={month}', FORMATS[fmt])
+                if os.path.exists(path):
+                    os.remove(path)
+            manifest['partitions'] = current
+            with open(manifest_path + '.tmp', 'w') as f:
+                json.dump(manifest, f, indent=1, sort_keys=True)
+            os.replace(manifest_path + '.tmp', manifest_path)
+            summary[table] = {'partitions': len(current), 'written': written}
+    finally:
+        conn.close()
+    return summary
+
+# Memory-map an Arrow IPC partition; columns are read without copying
+def read_partition(path):
+    pa = _require_pyarrow()
+    source = pa.memory_map(path, 'r')
+    return pa.ipc.open_file(source).read_all()
+
+# Usage: python Analytics_Export.py [OUT_DIR] [arrow|parquet]
+if __name__ == '__main__':
+    out_dir = sys.argv[1] if len(sys.argv) > 1 else 'analytics'
+    fmt = sys.argv[2] if len(sys.argv) > 2 else 'arrow'
+    summary = export_all(Config.load_config()['db_path'], out_dir, fmt)
+    for table, info in summary.items():
+        print(f"{table}: {info['written']} of {info['partitions']} partitions rewritten.")
@@ -0,0 +1,58 @@
+from flask import Response, g, jsonify, request, url_for
+import Idempotency
+import Search
+import Sync
+from Web import bp, get_db_connection, get_tenant, run_operation
+
+# Endpoints for scripts and devices rather than people: the navbar search
+# box, lock metrics and terminal sync.
+
+# Typeahead search over customers, suppliers, products and employees (see Search.py)
+SEARCH_EDIT_ENDPOINTS = {
+    'Customers': '.edit_customer',
+    'Suppliers': '.edit_supplier',
+    'Products': '.edit_product',
+    'Employees': '.edit_employee',
+}
+
+# Write contention counters for this database (see Contention.py)
+@bp.route('/metrics')
+def metrics():
+    tenant = get_tenant()
+    return jsonify({
+        'busy_timeout': tenant.config['busy_timeout'],
+        'write_retries': tenant.config['write_retries'],
+        'locks': tenant.lock_metrics.snapshot(),
+    })
+
+@bp.route('/search')
+def search():
+    text = request.args.get('q', '')
+    limit = min(request.args.get('limit', 10, type=int), 50)
+    conn = get_db_connection()
+    try:
+        rows = Search.search(conn, text, limit=limit, entity=request.args.get('entity'))
+    finally:
+        conn.close()
+    return jsonify([{
+        'entity': row['entity'],
+        'id': row['entity_id'],
+        'name': row['name'],
+        'contact': row['contact'],
+        'address': row['address'],
+        'url': url_for(SEARCH_EDIT_ENDPOINTS[row['entity']], id=row['entity_id']),
+    } for row in rows])
+
+# Terminal sync endpoint (see Sync.py); body and response are zlib-compressed
+# JSON. Terminals send an Idempotency-Key per upload: a retried upload is
+# not applied again, it just gets its download back.
+@bp.route('/sync', methods=['POST'])
+def sync():
+    upload = Sync.decode_payload(request.get_data())
+    try:
+        result = run_operation(Sync.apply_sync, upload)
+    except Idempotency.DuplicateRequest:
+        g.idempotency_claimed = True
+        result = run_operation(Sync.resend_download, upload)
+    return Response(Sync.encode_payload(result), mimetype='application/octet-stream')
+
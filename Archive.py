@@ -0,0 +1,148 @@
+from datetime import datetime
+
+# Soft delete: instead of leaving orphans behind (or being refused by a
+# RESTRICT foreign key), deleting a customer, shop, product, employee,
+# supplier or milk collection moves the row and all the history that
+# references it into <Table>_archive tables, in one transaction. Every
+# move is recorded as an ArchiveBatches row so it can be restored.
+#
+# Dependents are found from the foreign keys themselves: references with
+# ON DELETE SET NULL are left to SQLite, every other reference (including
+# CASCADE, so a restored product gets its stock row back) is archived
+# first. Each table in the dependency tree costs one INSERT ... SELECT and
+# one DELETE, however many rows it has.
+
+def ensure_archive_schema(conn):
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS ArchiveBatches (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        table_name TEXT,
+        row_id INTEGER,
+        label TEXT,
+        rows INTEGER NOT NULL DEFAULT 0,
+        archived_at TEXT NOT NULL
+    )
+    ''')
+
+# Cached per schema: {parent table: [(child table, child column, parent column), ...]}
+_dependents_cache = {}
+
+def _dependents(conn):
+    key = (conn.execute('PRAGMA database_list').fetchone()[2],
+           conn.execute('PRAGMA schema_version').fetchone()[0])
+    dependents = _dependents_cache.get(key)
+    if dependents is None:
+        dependents = {}
+        tables = [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' AND name NOT LIKE '%\\_archive' ESCAPE '\\'")]
+        for table in tables:
+            for fk in conn.execute(f'PRAGMA foreign_key_list({table})'):
+                parent, column, parent_column, on_delete = fk[2], fk[3], fk[4] or 'id', fk[6]
+                if on_delete != 'SET NULL':
+                    dependents.setdefault(parent, []).append((table, column, parent_column))
+        _dependents_cache.clear()
+        _dependents_cache[key] = dependents
+    return dependents
+
+def _columns(conn, table):
+    return [(row[1], row[2]) for row in conn.execute(f'PRAGMA table_info({table})')]
+
+# <Table>_archive has the table's columns without constraints, plus the batch
+def _ensure_archive_table(conn, table):
+    columns = _columns(conn, table)
+    archived = {name for name, _ in _columns(conn, f'{table}_archive')}
+    if not archived:
+        definitions = ', '.join(f'{name} {decl}' for name, decl in columns)
+        conn.execute(f'CREATE TABLE {table}_archive ({definitions}, archive_batch INTEGER NOT NULL)')
+        conn.execute(f'CREATE INDEX {table}_archive_batch ON {table}_archive (archive_batch)')
+    else:
+        for name, decl in columns:
+            if name not in archived:
+                conn.execute(f'ALTER TABLE {table}_archive ADD COLUMN {name} {decl}')
+    return [name for name, _ in columns]
+
+# Move the rows of `table` matching `where` (and, first, everything that
+# references them) into the archive. Returns the number of rows moved.
+def _archive_rows(conn, batch_id, table, where, params, dependents):
+    moved = 0
+    for child, column, parent_column in dependents.get(table, ()):
+        if child == table:
+            continue
+        moved += _archive_rows(conn, batch_id, child,
+                               f'{column} IN (SELECT {parent_column} FROM {table} WHERE {where})',
+                               params, dependents)
+    columns = ', '.join(_ensure_archive_table(conn, table))
+    moved += conn.execute(f'INSERT INTO {table}_archive ({columns}, archive_batch) '
+                          f'SELECT {columns}, ? FROM {table} WHERE {where}', (batch_id,) + tuple(params)).rowcount
+    conn.execute(f'DELETE FROM {table} WHERE {where}', params)
+    return moved
+
+def _new_batch(conn, table, row_id, label):
+    return conn.execute('INSERT INTO ArchiveBatches (table_name, row_id, label, archived_at) VALUES (?, ?, ?, ?)',
+                        (table, row_id, label, datetime.now().isoformat(timespec='seconds'))).lastrowid
+
+# Archive one row and its dependent history. Runs on the caller's
+# connection; the caller commits. Returns (batch id, rows moved).
+def archive_delete(conn, table, row_id, label=None):
+    batch_id = _new_batch(conn, table, row_id, label)
+    moved = _archive_rows(conn, batch_id, table, 'id = ?', (row_id,), _dependents(conn))
+    conn.execute('UPDATE ArchiveBatches SET rows = ? WHERE id = ?', (moved, batch_id))
+    return batch_id, moved
+
+# Tables of a batch in restore order: the archived row's table first, then
+# its dependents, so every restored row finds its parent already back
+def _restore_order(table, dependents, seen=None):
+    seen = seen if seen is not None else set()
+    if table in seen:
+        return []
+    seen.add(table)
+    order = [table]
+    for child, _, _ in dependents.get(table, ()):
+        order += _restore_order(child, dependents, seen)
+    return order
+
+# Put an archived batch back. References cleared by ON DELETE SET NULL
+# when it was archived stay cleared. Returns the number of rows restored.
+def restore_batch(conn, batch_id):
+    batch = conn.execute('SELECT table_name FROM ArchiveBatches WHERE id = ?', (batch_id,)).fetchone()
+    if batch is None:
+        return 0
+    archive_tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE '%\\_archive' ESCAPE '\\'")}
+    restored = 0
+    for table in _restore_order(batch[0], _dependents(conn)):
+        if f'{table}_archive' not in archive_tables:
+            continue
+        columns = ', '.join(name for name, _ in _columns(conn, table))
+        restored += conn.execute(f'INSERT INTO {table} ({columns}) SELECT {columns} FROM {table}_archive WHERE archive_batch = ?',
+                                 (batch_id,)).rowcount
+        conn.execute(f'DELETE FROM {table}_archive WHERE archive_batch = ?', (batch_id,))
+    conn.execute('DELETE FROM ArchiveBatches WHERE id = ?', (batch_id,))
+    return restored
+
+def list_batches(conn):
+    return conn.execute('SELECT * FROM ArchiveBatches ORDER BY id DESC')
+
+# Fix rows that break a foreign key (left by deletes made before keys were
+# enforced): optional references are cleared, anything else is archived in
+# a batch labelled 'orphaned rows'. Returns the number of rows fixed.
+def resolve_violations(conn):
+    fixed = 0
+    batch_id = None
+    while True:
+        violations = conn.execute('PRAGMA foreign_key_check').fetchall()
+        if not violations:
+            break
+        table, rowid, _, fk_id = violations[0]
+        fk = [row for row in conn.execute(f'PRAGMA foreign_key_list({table})') if row[0] == fk_id][0]
+        rowids = [v[1] for v in violations if v[0] == table and v[3] == fk_id]
+        placeholders = ', '.join('?' for _ in rowids)
+        if fk[6] == 'SET NULL':
+            conn.execute(f'UPDATE {table} SET {fk[3]} = NULL WHERE rowid IN ({placeholders})', rowids)
+            fixed += len(rowids)
+        else:
+            if batch_id is None:
+                batch_id = _new_batch(conn, None, None, 'orphaned rows')
+            fixed += _archive_rows(conn, batch_id, table, f'rowid IN ({placeholders})', rowids, _dependents(conn))
+    if batch_id is not None:
+        conn.execute('UPDATE ArchiveBatches SET rows = ? WHERE id = ?', (fixed, batch_id))
+    return fixed
@@ -0,0 +1,227 @@
+import json
+import os
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import date
+import Config
+
+# Audit trail. An AFTER UPDATE trigger on every table with an edit page
+# records which columns a change touched, as a compact JSON diff
+# {"column": [before, after], ...}; unchanged columns and no-op saves are
+# not recorded. Inserts need no entry (the row is its own record) and
+# deletes are recoverable from the archive (see Archive.py).
+#
+# The triggers append to AuditPending, a plain rowid table with no
+# secondary index (nor AUTOINCREMENT, which would dirty sqlite_sequence
+# too), so an audited write commits one extra page. Every FLUSH_ROWS
+# entries a trigger moves the batch into AuditLog in one statement, where
+# ids are assigned in order and the entity index is maintained in bulk.
+# AuditTrail is the union of both, numbering pending entries after the
+# log, so readers never wait for a flush. AuditLog refuses updates and
+# deletes.
+
+AUDITED_TABLES = ['Suppliers', 'MilkCollection', 'MilkSeparation', 'Products', 'Production', 'Employees',
+                  'Shops', 'Expenses', 'Salaries', 'Customers', 'Sales']
+
+FLUSH_ROWS = 256
+
+# Write latency overhead the audit triggers are allowed to add (see benchmark)
+OVERHEAD_BUDGET = 0.10
+
+# The diff is built by string concatenation, one CASE per column, so only
+# changed columns are serialised and the trigger runs no subquery or
+# aggregate: a JSON object of ',"column":[before,after]' members.
+def _trigger_sql(conn, table):
+    columns = [row[1] for row in conn.execute(f'PRAGMA table_info({table})')]
+    changed = ' OR '.join(f'OLD.{c} IS NOT NEW.{c}' for c in columns)
+    members = ' || '.join(f"""CASE WHEN OLD.{c} IS NOT NEW.{c} THEN ',"{c}":' || json_array(OLD.{c}, NEW.{c}) ELSE '' END"""
+                          for c in columns)
+    return f'''CREATE TRIGGER audit_{table} AFTER UPDATE ON {table}
+    WHEN {changed}
+    BEGIN
+        INSERT INTO AuditPending (entity, entity_id, at, changes)
+        VALUES ('{table}', OLD.id, CAST(strftime('%s', 'now') AS INTEGER), '{{' || substr({members}, 2) || '}}');
+    END'''
+
+# Create (or, when a table has gained columns, recreate) the audit triggers
+def install_triggers(conn):
+    for table in AUDITED_TABLES:
+        sql = _trigger_sql(conn, table)
+        current = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = ?",
+                               (f'audit_{table}',)).fetchone()
+        if current is None or current[0] != sql:
+            conn.execute(f'DROP TRIGGER IF EXISTS audit_{table}')
+            conn.execute(sql)
+
+def drop_triggers(conn):
+    for table in AUDITED_TABLES:
+        conn.execute(f'DROP TRIGGER IF EXISTS audit_{table}')
+
+def ensure_audit_schema(conn):
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS AuditPending (
+        id INTEGER PRIMARY KEY,
+        entity TEXT NOT NULL,
+        entity_id INTEGER,
+        at INTEGER NOT NULL,
+        changes TEXT NOT NULL
+    )
+    ''')
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS AuditLog (
+        id INTEGER PRIMARY KEY,
+        entity TEXT NOT NULL,
+        entity_id INTEGER,
+        at INTEGER NOT NULL,
+        changes TEXT NOT NULL
+    )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_audit_log_entity ON AuditLog (entity, entity_id)')
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS audit_log_no_update BEFORE UPDATE ON AuditLog
+    BEGIN SELECT RAISE(ABORT, 'AuditLog is append-only'); END
+    ''')
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS audit_log_no_delete BEFORE DELETE ON AuditLog
+    BEGIN SELECT RAISE(ABORT, 'AuditLog is append-only'); END
+    ''')
+    conn.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS audit_flush AFTER INSERT ON AuditPending
+    WHEN NEW.id % {FLUSH_ROWS} = 0
+    BEGIN
+        INSERT INTO AuditLog (entity, entity_id, at, changes)
+        SELECT entity, entity_id, at, changes FROM AuditPending ORDER BY id;
+        DELETE FROM AuditPending;
+    END
+    ''')
+    conn.execute('''
+    CREATE VIEW IF NOT EXISTS AuditTrail AS
+    SELECT id, entity, entity_id, at, changes FROM AuditLog
+    UNION ALL
+    SELECT (SELECT IFNULL(MAX(id), 0) FROM AuditLog) + id, entity, entity_id, at, changes FROM AuditPending
+    ''')
+    install_triggers(conn)
+
+# Move a partial batch into AuditLog (the maintenance pass does this so
+# quiet periods do not leave entries pending). Returns the number moved.
+def flush(conn):
+    with conn:
+        conn.execute('BEGIN IMMEDIATE')
+        moved = conn.execute('''
+        INSERT INTO AuditLog (entity, entity_id, at, changes)
+        SELECT entity, entity_id, at, changes FROM AuditPending ORDER BY id
+        ''').rowcount
+        conn.execute('DELETE FROM AuditPending')
+    return moved
+
+# Decode the JSON diffs of trail rows
+def decode(rows):
+    return [{'id': row[0], 'entity': row[1], 'entity_id': row[2], 'at': row[3],
+             'changes': json.loads(row[4])} for row in rows]
+
+_TRAIL = "SELECT id, entity, entity_id, datetime(at, 'unixepoch', 'localtime') AS at, changes FROM AuditTrail"
+
+# Changes to one row, oldest first
+def history(conn, entity, entity_id):
+    return decode(conn.execute(_TRAIL + ' WHERE entity = ? AND entity_id = ? ORDER BY id', (entity, entity_id)))
+
+# Undecoded entries, newest first: every change to one row when entity_id
+# is given, else the latest `limit`, optionally of one table
+def trail(conn, entity=None, entity_id=None, limit=100):
+    if entity and entity_id is not None:
+        return conn.execute(_TRAIL + ' WHERE entity = ? AND entity_id = ? ORDER BY id DESC', (entity, entity_id))
+    return conn.execute(_TRAIL + ' WHERE ? IS NULL OR entity = ? ORDER BY id DESC LIMIT ?', (entity, entity, limit))
+
+# Latest changes, optionally to one table, newest first
+def recent(conn, entity=None, limit=100):
+    return decode(trail(conn, entity, limit=limit))
+
+# Benchmark: median latency of edits with and without the audit triggers,
+# both as bare transactions and as edit_customer / edit_sale requests
+# through the web app. Two scratch copies of the configured database are
+# edited in turn, one audited and one not, so drift affects both alike.
+# The overhead is the median of the paired differences over the median
+# unaudited latency, which keeps it steady from run to run.
+# Returns {(case, level): (median ms without, median ms with, overhead)}.
+def benchmark(config=None, writes=500):
+    import Repositories
+    import UI
+    config = dict(config or Config.load_config())
+    scratch = tempfile.mkdtemp(prefix='dairy-audit-')
+    try:
+        source = sqlite3.connect(config['db_path'])
+        targets = {}
+        for audited in (False, True):
+            copy = dict(config, db_path=os.path.join(scratch, f'audit-{audited}.db'), replica_path=None)
+            dest = sqlite3.connect(copy['db_path'])
+            source.backup(dest)
+            dest.close()
+            conn = Config.connect(copy)
+            conn.isolation_level = None
+            client = UI.create_app(copy).test_client()
+            # The first request brings the schema (and the triggers) up to date
+            client.get('/')
+            if not audited:
+                drop_triggers(conn)
+            targets[audited] = _edits(conn, client, Repositories)
+        source.close()
+
+        timings = {case: {False: [], True: []} for case in targets[False][2]}
+        for n in range(writes):
+            # Alternate which copy goes first
+            for audited in ((False, True) if n % 2 else (True, False)):
+                conn, client, cases = targets[audited]
+                for case, write in cases.items():
+                    start = time.perf_counter()
+                    write(n)
+                    timings[case][audited].append((time.perf_counter() - start) * 1000)
+                    # No browser follows the redirect to show the flash, so
+                    # drop it before it grows the session cookie
+                    with client.session_transaction() as session:
+                        session.clear()
+        for conn, _, _ in targets.values():
+            conn.close()
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    results = {}
+    for case, samples in timings.items():
+        without, with_audit = statistics.median(samples[False]), statistics.median(samples[True])
+        added = statistics.median(a - b for a, b in zip(samples[True], samples[False]))
+        results[case] = (without, with_audit, added / without)
+    return results
+
+# The edits timed by benchmark. Each write(n) changes the row: values
+# alternate, the request a step behind the bare transaction.
+def _edits(conn, client, Repositories):
+    def transaction(statement):
+        def write(n):
+            conn.execute('BEGIN IMMEDIATE')
+            statement(n)
+            conn.execute('COMMIT')
+        return write
+
+    cases = {}
+    customer = conn.execute('SELECT id, name, contact, address FROM Customers ORDER BY id LIMIT 1').fetchone()
+    if customer:
+        customer_id, name, contact, address = customer
+        contacts = [contact or '', (contact or '') + ' ext. 1']
+        cases['edit customer', 'transaction'] = transaction(lambda n: conn.execute(
+            'UPDATE Customers SET contact = ? WHERE id = ?', (contacts[n % 2], customer_id)))
+        cases['edit customer', 'request'] = lambda n: client.post(f'/edit_customer/{customer_id}', data={
+            'name': name, 'contact': contacts[(n + 1) % 2], 'address': address or ''})
+    sale = conn.execute('''
+    SELECT id, date, customer_id, shop_id, product_id, quantity, total_price FROM Sales
+    WHERE quantity > 0 ORDER BY id LIMIT 1''').fetchone()
+    if sale:
+        sale_id, sale_date, customer_id, shop_id, product_id, quantity, total_price = sale
+        sizes = [quantity / 2, quantity]
+        prices = [round(total_price / quantity * size, 2) for size in sizes]
+        cases['edit sale', 'transaction'] = transaction(lambda n: Repositories.update_sale(
+            conn, sale_id, date.today(), customer_id, shop_id, product_id, sizes[n % 2], prices[n % 2]))
+        cases['edit sale', 'request'] = lambda n: client.post(f'/edit_sale/{sale_id}', data={
+            'date': sale_date, 'customer_id': customer_id, 'shop_id': shop_id, 'product_id': product_id,
+            'quantity': sizes[(n + 1) % 2], 'total_price': prices[(n + 1) % 2]})
+    return conn, client, cases
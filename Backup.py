@@ -0,0 +1,139 @@
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime
+import Config
+
+SNAPSHOT_PREFIX = 'dairy-'
+SNAPSHOT_SUFFIX = '.db'
+
+# Copy a live database with the SQLite online backup API.
+# The copy runs in steps of `pages` pages and sleeps between steps so that
+# writers on the source (e.g. the web handlers) get the lock between steps.
+def backup_database(source_path='dairy.db', dest_path=None, pages=256, step_sleep=0.005, verify=True):
+    if dest_path is None:
+        dest_path = os.path.join('backups', snapshot_name())
+    dest_dir = os.path.dirname(dest_path)
+    if dest_dir:
+        os.makedirs(dest_dir, exist_ok=True)
+
+    # Write to a temporary file first so a failed backup never leaves a
+    # partial file under the final name.
+    tmp_path = dest_path + '.partial'
+    start = time.perf_counter()
+    try:
+        source = sqlite3.connect(source_path)
+        dest = sqlite3.connect(tmp_path)
+
+        def progress(status, remaining, total):
+            if step_sleep:
+                time.sleep(step_sleep)
+
+        try:
+            source.backup(dest, pages=pages, progress=progress)
+            page_size = dest.execute('PRAGMA page_size').fetchone()[0]
+            page_count = dest.execute('PRAGMA page_count').fetchone()[0]
+        finally:
+            dest.close()
+            source.close()
+        elapsed = time.perf_counter() - start
+
+        if verify:
+            ok, message = verify_backup(tmp_path)
+            if not ok:
+                raise sqlite3.DatabaseError(f"Backup of {source_path} failed integrity check: {message}")
+        os.replace(tmp_path, dest_path)
+    except BaseException:
+        # Leave nothing of a failed backup behind
+        for path in (tmp_path, tmp_path + '-journal'):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        raise
+
+    size_bytes = page_size * page_count
+    mb_per_s = (size_bytes / (1024 * 1024)) / elapsed if elapsed > 0 else 0.0
+    return {
+        'path': dest_path,
+        'bytes': size_bytes,
+        'seconds': elapsed,
+        'mb_per_s': mb_per_s,
+    }
+
+# Run PRAGMA integrity_check on a backup file; returns (ok, message)
+def verify_backup(path):
+    conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    try:
+        rows = conn.execute('PRAGMA integrity_check').fetchall()
+    finally:
+        conn.close()
+    messages = [row[0] for row in rows]
+    return messages == ['ok'], '; '.join(messages)
+
+def snapshot_name(when=None):
+    when = when or datetime.now()
+    return f"{SNAPSHOT_PREFIX}{when.strftime('%Y%m%d-%H%M%S')}{SNAPSHOT_SUFFIX}"
+
+def list_snapshots(backup_dir='backups'):
+    if not os.path.isdir(backup_dir):
+        return []
+    names = [n for n in os.listdir(backup_dir)
+             if n.startswith(SNAPSHOT_PREFIX) and n.endswith(SNAPSHOT_SUFFIX)]
+    # Names embed a sortable timestamp, oldest first
+    return [os.path.join(backup_dir, n) for n in sorted(names)]
+
+# Delete the oldest snapshots so that at most `keep` remain
+def prune_snapshots(backup_dir='backups', keep=7):
+    snapshots = list_snapshots(backup_dir)
+    removed = snapshots[:-keep] if keep > 0 else snapshots
+    for path in removed:
+        os.remove(path)
+    return removed
+
+# Cheap fingerprint of the source database and its WAL file.
+# If it has not changed since the last snapshot there is nothing new to copy.
+def source_fingerprint(source_path='dairy.db'):
+    parts = []
+    for path in (source_path, source_path + '-wal'):
+        try:
+            st = os.stat(path)
+            parts.append((st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            parts.append(None)
+    return tuple(parts)
+
+# Take a snapshot only when the database changed since `last_fingerprint`,
+# then apply retention. Returns (result_or_None, fingerprint).
+def take_snapshot(source_path='dairy.db', backup_dir='backups', keep=7, last_fingerprint=None, pages=256):
+    fingerprint = source_fingerprint(source_path)
+    if last_fingerprint is not None and fingerprint == last_fingerprint:
+        return None, fingerprint
+    result = backup_database(source_path, os.path.join(backup_dir, snapshot_name()), pages=pages)
+    result['pruned'] = prune_snapshots(backup_dir, keep)
+    return result, fingerprint
+
+# Scheduled snapshot loop: every `interval_seconds`, snapshot if changed
+def run_snapshot_schedule(source_path='dairy.db', backup_dir='backups', interval_seconds=3600, keep=7, pages=256):
+    last_fingerprint = None
+    while True:
+        result, last_fingerprint = take_snapshot(source_path, backup_dir, keep, last_fingerprint, pages)
+        if result is None:
+            print("No changes since last snapshot, skipped.")
+        else:
+            print(f"Snapshot {result['path']}: {result['bytes']} bytes in "
+                  f"{result['seconds']:.2f}s ({result['mb_per_s']:.2f} MB/s), integrity ok.")
+        time.sleep(interval_seconds)
+
+# Usage: python Backup.py                -> one verified backup into backups/
+#        python Backup.py schedule 3600  -> snapshot hourly, keep last 7
+if __name__ == '__main__':
+    db_path = Config.load_config()['db_path']
+    if len(sys.argv) > 1 and sys.argv[1] == 'schedule':
+        interval = int(sys.argv[2]) if len(sys.argv) > 2 else 3600
+        run_snapshot_schedule(db_path, interval_seconds=interval)
+    else:
+        result = backup_database(db_path)
+        print(f"Backup written to {result['path']}: {result['bytes']} bytes in "
+              f"{result['seconds']:.2f}s ({result['mb_per_s']:.2f} MB/s), integrity ok.")
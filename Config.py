@@ -0,0 +1,145 @@
+import json
+import os
+import queue
+import sqlite3
+
+# Settings and their defaults. Each can be set in a JSON config file
+# (DAIRY_CONFIG) and overridden by the environment variable next to it.
+DEFAULTS = {
+    'db_path': 'dairy.db',
+    'secret_key': 'super_secret_key',
+    'pool_size': 5,
+    'busy_timeout': 5.0,
+    'write_retries': 3,
+    'retry_base_delay': 0.05,
+    'retry_max_delay': 1.0,
+    'idempotency_ttl': 86400.0,
+    'cache_size_kib': 16384,
+    'statement_cache': 256,
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'replica_path': None,
+    'replica_max_staleness': 30.0,
+    'replica_refresh': 10.0,
+    'maintenance_window': '01:00-05:00',
+    'maintenance_interval': 300.0,
+    'maintenance_step_seconds': 0.25,
+    'maintenance_check_seconds': 5.0,
+    'history_dir': None,
+    'template_bundle': None,
+}
+
+ENV_VARS = {
+    'db_path': 'DAIRY_DB',
+    'secret_key': 'DAIRY_SECRET_KEY',
+    'pool_size': 'DAIRY_POOL_SIZE',
+    'busy_timeout': 'DAIRY_BUSY_TIMEOUT',
+    'write_retries': 'DAIRY_WRITE_RETRIES',
+    'retry_base_delay': 'DAIRY_RETRY_BASE_DELAY',
+    'retry_max_delay': 'DAIRY_RETRY_MAX_DELAY',
+    'idempotency_ttl': 'DAIRY_IDEMPOTENCY_TTL',
+    'cache_size_kib': 'DAIRY_CACHE_SIZE_KIB',
+    'statement_cache': 'DAIRY_STATEMENT_CACHE',
+    'journal_mode': 'DAIRY_JOURNAL_MODE',
+    'synchronous': 'DAIRY_SYNCHRONOUS',
+    'replica_path': 'DAIRY_REPLICA',
+    'replica_max_staleness': 'DAIRY_REPLICA_MAX_STALENESS',
+    'replica_refresh': 'DAIRY_REPLICA_REFRESH',
+    'maintenance_window': 'DAIRY_MAINTENANCE_WINDOW',
+    'maintenance_interval': 'DAIRY_MAINTENANCE_INTERVAL',
+    'maintenance_step_seconds': 'DAIRY_MAINTENANCE_STEP_SECONDS',
+    'maintenance_check_seconds': 'DAIRY_MAINTENANCE_CHECK_SECONDS',
+    'history_dir': 'DAIRY_HISTORY_DIR',
+    'template_bundle': 'DAIRY_TEMPLATE_BUNDLE',
+}
+
+def _coerce(key, value):
+    default = DEFAULTS[key]
+    if value is None or default is None or isinstance(value, type(default)):
+        return value
+    return type(default)(value)
+
+def _read_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+# Defaults, then the config file, then environment variables, then overrides
+def load_config(path=None, **overrides):
+    config = dict(DEFAULTS)
+    path = path or os.environ.get('DAIRY_CONFIG')
+    if path:
+        file_config = _read_json(path)
+        config.update({k: v for k, v in file_config.items() if k in DEFAULTS})
+    for key, env_var in ENV_VARS.items():
+        if env_var in os.environ:
+            config[key] = os.environ[env_var]
+    config.update(overrides)
+    return {key: _coerce(key, value) for key, value in config.items()}
+
+# Tenants file: {"tenants": {"coop_a": {"db_path": "coop_a.db"}, ...}}
+# Each tenant's settings are layered over the shared config.
+def load_tenants(path=None):
+    path = path or os.environ.get('DAIRY_TENANTS')
+    if not path:
+        return {}
+    tenants = _read_json(path).get('tenants', {})
+    return {name: load_config(**settings) for name, settings in tenants.items()}
+
+# Open a connection with the configured tuning applied. statement_cache is
+# the number of prepared statements kept per connection (see Repositories.py).
+def connect(config, factory=sqlite3.Connection, check_same_thread=True):
+    conn = sqlite3.connect(config['db_path'], timeout=config['busy_timeout'],
+                           factory=factory, check_same_thread=check_same_thread,
+                           cached_statements=config['statement_cache'])
+    conn.execute(f"PRAGMA cache_size = -{int(config['cache_size_kib'])}")
+    conn.execute('PRAGMA foreign_keys = ON')
+    if config['journal_mode']:
+        conn.execute(f"PRAGMA journal_mode = {config['journal_mode']}")
+    if config['synchronous']:
+        conn.execute(f"PRAGMA synchronous = {config['synchronous']}")
+    return conn
+
+# A connection that goes back to its pool when closed
+class PooledConnection(sqlite3.Connection):
+    pool = None
+
+    def close(self):
+        if self.pool is None or not self.pool._release(self):
+            super().close()
+
+# Fixed-size pool of connections for one database. Connections are opened
+# lazily and handed out to any thread; close() returns them to the pool.
+class ConnectionPool:
+    def __init__(self, config):
+        self.config = config
+        self._idle = queue.LifoQueue(maxsize=config['pool_size'])
+        self._closed = False
+
+    def get(self):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = connect(self.config, factory=PooledConnection, check_same_thread=False)
+            conn.pool = self
+        conn.row_factory = None
+        return conn
+
+    def _release(self, conn):
+        if self._closed:
+            return False
+        if conn.in_transaction:
+            conn.rollback()
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            return False
+        return True
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            sqlite3.Connection.close(conn)
@@ -0,0 +1,290 @@
+import json
+import sqlite3
+import sys
+import Sync
+
+# Shared entities are matched across shops on a natural key so that the
+# same customer or product keeps a single id in the central database.
+# (table, natural key columns, foreign key columns -> referenced table)
+SHARED_TABLES = [
+    ('Shops', ('name',), {}),
+    ('Products', ('product_name',), {}),
+    ('Customers', ('name', 'contact'), {}),
+    ('Suppliers', ('name', 'contact'), {}),
+    ('ExpenseCategories', ('name',), {}),
+    ('Employees', ('name', 'shop_id'), {'shop_id': 'Shops'}),
+]
+
+# Fact tables are append-mostly history; every new shop row becomes a new
+# central row. Order matters: MilkSeparation references MilkCollection.
+FACT_TABLES = [
+    ('MilkCollection', {'supplier_id': 'Suppliers', 'collected_by_employee': 'Employees'}),
+    ('MilkSeparation', {'milk_collection_id': 'MilkCollection'}),
+    ('Production', {'product_id': 'Products', 'produced_by_employee': 'Employees'}),
+    ('Expenses', {'shop_id': 'Shops', 'category_id': 'ExpenseCategories'}),
+    ('Salaries', {'employee_id': 'Employees'}),
+    ('Sales', {'customer_id': 'Customers', 'shop_id': 'Shops', 'product_id': 'Products'}),
+]
+
+# Column definition for ALTER TABLE ADD COLUMN, from the shop's table_info
+# row and foreign key list (a column added later is always nullable or
+# has a default, or ALTER TABLE could not have added it to the shop)
+def _column_definition(column, foreign_keys):
+    _, name, decl_type, notnull, default, _ = column
+    definition = f'{name} {decl_type}'.strip()
+    if default is not None:
+        definition += f' DEFAULT {default}'
+        if notnull:
+            definition += ' NOT NULL'
+    for fk in foreign_keys:
+        if fk[3] == name:
+            definition += f' REFERENCES {fk[2]}({fk[4]})'
+            if fk[6] != 'NO ACTION':
+                definition += f' ON DELETE {fk[6]}'
+    return definition
+
+CONSOLIDATED_TABLES = [table for table, _, _ in SHARED_TABLES] + [table for table, _ in FACT_TABLES]
+
+# Name under which the central database reads a shop's ChangeLog. It keeps
+# its cursor in SyncTerminals like a terminal, so Sync.prune_changelog only
+# drops entries it has read.
+CONSUMER = 'consolidation'
+
+# Log writes to the consolidated tables in the shop's ChangeLog (see
+# Sync.py), so rows edited or deleted after they were merged are merged
+# again. Runs on a connection to the shop database.
+def track_changes(conn):
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    Sync.ensure_sync_schema(conn, [table for table in CONSOLIDATED_TABLES if table in existing])
+
+# Create the bookkeeping tables and copy the consolidated tables'
+# definitions from the shop when missing. Tables the central database
+# already has get the columns newer shops added since (e.g.
+# Expenses.category_id, Employees.join_date). Shop-local tables (logs,
+# queues, indexes, caches) are not consolidated and not copied.
+def ensure_central_schema(conn):
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS ShardIdMap (
+        shop_key TEXT NOT NULL,
+        table_name TEXT NOT NULL,
+        local_id INTEGER NOT NULL,
+        central_id INTEGER NOT NULL,
+        PRIMARY KEY (shop_key, table_name, local_id)
+    ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS ShardWatermark (
+        shop_key TEXT NOT NULL,
+        table_name TEXT NOT NULL,
+        last_id INTEGER NOT NULL,
+        PRIMARY KEY (shop_key, table_name)
+    ) WITHOUT ROWID
+    ''')
+    # Rows held back because a row they reference was not consolidated yet;
+    # they are retried on every run until it is
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS ShardPending (
+        shop_key TEXT NOT NULL,
+        table_name TEXT NOT NULL,
+        local_id INTEGER NOT NULL,
+        PRIMARY KEY (shop_key, table_name, local_id)
+    ) WITHOUT ROWID
+    ''')
+    existing = {row[0] for row in conn.execute("SELECT name FROM main.sqlite_master WHERE type='table'")}
+    shop_tables = dict(conn.execute("SELECT name, sql FROM shop.sqlite_master WHERE type='table'").fetchall())
+    for name in CONSOLIDATED_TABLES:
+        if name not in shop_tables:
+            continue
+        if name not in existing:
+            conn.execute(shop_tables[name])
+            continue
+        central_columns = {row[1] for row in conn.execute(f'PRAGMA main.table_info({name})')}
+        foreign_keys = conn.execute(f'PRAGMA shop.foreign_key_list({name})').fetchall()
+        for column in conn.execute(f'PRAGMA shop.table_info({name})').fetchall():
+            if column[1] not in central_columns:
+                conn.execute(f'ALTER TABLE main.{name} ADD COLUMN {_column_definition(column, foreign_keys)}')
+
+def _columns(conn, table):
+    return [row[1] for row in conn.execute(f'PRAGMA shop.table_info({table})') if row[1] != 'id']
+
+def _watermark(conn, shop_key, table, default=0):
+    row = conn.execute("SELECT last_id FROM ShardWatermark WHERE shop_key=? AND table_name=?", (shop_key, table)).fetchone()
+    return row[0] if row else default
+
+def _set_watermark(conn, shop_key, table, last_id):
+    conn.execute("INSERT OR REPLACE INTO ShardWatermark (shop_key, table_name, last_id) VALUES (?, ?, ?)",
+                 (shop_key, table, last_id))
+
+def _id_map(conn, shop_key, table):
+    return dict(conn.execute("SELECT local_id, central_id FROM ShardIdMap WHERE shop_key=? AND table_name=?",
+                             (shop_key, table)))
+
+def _pending(conn, shop_key, table):
+    return {row[0] for row in conn.execute("SELECT local_id FROM ShardPending WHERE shop_key=? AND table_name=?",
+                                           (shop_key, table))}
+
+# Row ids per table logged in the shop's ChangeLog since the last run, and
+# the sequence number read up to. The cursor is kept as the 'ChangeLog'
+# watermark. None instead of the ids means every merged row has to be
+# compared: the shop was consolidated before its changes were logged, or
+# the log was pruned past the cursor.
+def _changed_rows(conn, shop_key):
+    cursor = _watermark(conn, shop_key, 'ChangeLog', None)
+    upto = max(cursor or 0, conn.execute('SELECT COALESCE(MAX(seq), 0) FROM shop.ChangeLog').fetchone()[0])
+    pruned = conn.execute("SELECT value FROM shop.SyncState WHERE key = 'pruned_through'").fetchone()
+    if cursor is None or (pruned and int(pruned[0]) > cursor):
+        return None, upto
+    changed = {}
+    for table, row_id in conn.execute('SELECT DISTINCT table_name, row_id FROM shop.ChangeLog WHERE seq > ? AND seq <= ?',
+                                      (cursor, upto)):
+        changed.setdefault(table, set()).add(row_id)
+    return changed, upto
+
+def _set_cursor(conn, shop_key, upto):
+    _set_watermark(conn, shop_key, 'ChangeLog', upto)
+    conn.execute('''
+    INSERT INTO shop.SyncTerminals (terminal, cursor, synced_at) VALUES (?, ?, datetime('now'))
+    ON CONFLICT (terminal) DO UPDATE SET cursor = excluded.cursor, synced_at = excluded.synced_at
+    ''', (CONSUMER, upto))
+
+# Translate the foreign keys of one shop row to central ids.
+# Returns None when a referenced row was never consolidated (orphan).
+def _remap(values, columns, foreign_keys, maps):
+    values = list(values)
+    for i, col in enumerate(columns):
+        ref_table = foreign_keys.get(col)
+        if ref_table and values[i] is not None:
+            central_id = maps[ref_table].get(values[i])
+            if central_id is None:
+                return None
+            values[i] = central_id
+    return values
+
+# Merge one shop database into the central database: rows added since the
+# last run, rows held back last time, and rows the shop's ChangeLog shows
+# as edited or deleted since. All tables are merged in a single
+# transaction. The shop's log is then pruned of what every reader has seen,
+# unless the shop is a sync terminal, whose log also holds its pending uploads.
+def consolidate_shop(shop_db_path, shop_key, central_db_path='dairy_central.db'):
+    shop = sqlite3.connect(shop_db_path)
+    try:
+        with shop:
+            track_changes(shop)
+    finally:
+        shop.close()
+    conn = sqlite3.connect(central_db_path)
+    conn.execute('ATTACH DATABASE ? AS shop', (shop_db_path,))
+    stats = {}
+    try:
+        with conn:
+            ensure_central_schema(conn)
+            changed, upto = _changed_rows(conn, shop_key)
+            maps = {}
+            for table, natural_key, foreign_keys in SHARED_TABLES:
+                stats[table] = _merge_table(conn, shop_key, table, foreign_keys, maps,
+                                            None if changed is None else changed.get(table, set()), natural_key)
+            for table, foreign_keys in FACT_TABLES:
+                stats[table] = _merge_table(conn, shop_key, table, foreign_keys, maps,
+                                            None if changed is None else changed.get(table, set()))
+            _set_cursor(conn, shop_key, upto)
+    finally:
+        conn.close()
+    shop = sqlite3.connect(shop_db_path)
+    try:
+        with shop:
+            if Sync._get_state(shop, 'download_cursor') is None:
+                Sync.prune_changelog(shop)
+    finally:
+        shop.close()
+    return stats
+
+# Merge one table. `changed` is the set of local ids to compare again
+# (None: every merged row). Edited rows update their central row. A
+# deleted fact row is deleted centrally too; a deleted shared row only
+# loses its mapping, as other shops may use the central row.
+def _merge_table(conn, shop_key, table, foreign_keys, maps, changed, natural_key=None):
+    for ref_table in foreign_keys.values():
+        if ref_table not in maps:
+            maps[ref_table] = _id_map(conn, shop_key, ref_table)
+    table_map = maps.setdefault(table, _id_map(conn, shop_key, table))
+    stats = {'inserted': 0, 'matched': 0, 'updated': 0, 'deleted': 0, 'skipped': 0}
+
+    columns = _columns(conn, table)
+    if not columns:
+        # Shop database older than the table
+        return stats
+    col_list = ', '.join(columns)
+    placeholders = ', '.join('?' for _ in columns)
+    insert_sql = f'INSERT INTO main.{table} ({col_list}) VALUES ({placeholders})'
+    update_sql = f'UPDATE main.{table} SET {", ".join(c + " = ?" for c in columns)} WHERE id = ?'
+    if natural_key:
+        where = ' AND '.join(f'{col} IS ?' for col in natural_key)
+        lookup_sql = f'SELECT id FROM main.{table} WHERE {where} LIMIT 1'
+        key_positions = [columns.index(col) for col in natural_key]
+
+    last_id = _watermark(conn, shop_key, table)
+    pending = _pending(conn, shop_key, table)
+    revisit = pending | (set(table_map) if changed is None else changed)
+    rows = conn.execute(f'''
+    SELECT id, {col_list} FROM shop.{table}
+    WHERE id > ? OR id IN (SELECT value FROM json_each(?)) ORDER BY id
+    ''', (last_id, json.dumps(sorted(revisit))))
+    new_mappings, held, found_ids = [], [], set()
+    for row in rows.fetchall():
+        local_id = row[0]
+        found_ids.add(local_id)
+        last_id = max(last_id, local_id)
+        if local_id in table_map and local_id not in revisit:
+            continue
+        values = _remap(row[1:], columns, foreign_keys, maps)
+        if values is None:
+            stats['skipped'] += 1
+            held.append((shop_key, table, local_id))
+            continue
+        if local_id in table_map:
+            conn.execute(update_sql, values + [table_map[local_id]])
+            stats['updated'] += 1
+            continue
+        central_id = None
+        if natural_key:
+            found = conn.execute(lookup_sql, [values[i] for i in key_positions]).fetchone()
+            if found:
+                central_id = found[0]
+                stats['matched'] += 1
+        if central_id is None:
+            central_id = conn.execute(insert_sql, values).lastrowid
+            stats['inserted'] += 1
+        table_map[local_id] = central_id
+        new_mappings.append((shop_key, table, local_id, central_id))
+
+    gone = [local_id for local_id in revisit - found_ids if local_id in table_map]
+    if not natural_key:
+        conn.executemany(f'DELETE FROM main.{table} WHERE id = ?', [(table_map[local_id],) for local_id in gone])
+    conn.executemany('DELETE FROM ShardIdMap WHERE shop_key = ? AND table_name = ? AND local_id = ?',
+                     [(shop_key, table, local_id) for local_id in gone])
+    for local_id in gone:
+        del table_map[local_id]
+    stats['deleted'] = len(gone)
+
+    conn.executemany("INSERT OR REPLACE INTO ShardIdMap (shop_key, table_name, local_id, central_id) VALUES (?, ?, ?, ?)",
+                     new_mappings)
+    conn.execute('DELETE FROM ShardPending WHERE shop_key = ? AND table_name = ?', (shop_key, table))
+    conn.executemany('INSERT INTO ShardPending (shop_key, table_name, local_id) VALUES (?, ?, ?)', held)
+    _set_watermark(conn, shop_key, table, last_id)
+    return stats
+
+# Usage: python Consolidation.py central.db shop1=shop1.db shop2=shop2.db
+if __name__ == '__main__':
+    if len(sys.argv) < 3:
+        print("Usage: python Consolidation.py CENTRAL_DB SHOP_KEY=SHOP_DB [SHOP_KEY=SHOP_DB ...]")
+        sys.exit(1)
+    central = sys.argv[1]
+    for arg in sys.argv[2:]:
+        key, path = arg.split('=', 1)
+        stats = consolidate_shop(path, key, central)
+        new_rows = sum(s['inserted'] for s in stats.values())
+        updated = sum(s['updated'] for s in stats.values())
+        deleted = sum(s['deleted'] for s in stats.values())
+        orphans = sum(s['skipped'] for s in stats.values())
+        print(f"Consolidated {key}: {new_rows} new rows, {updated} updated, {deleted} deleted, "
+              f"{orphans} orphaned rows held back for the next run.")
@@ -0,0 +1,101 @@
+import random
+import sqlite3
+import threading
+import time
+
+# Write contention handling. SQLite allows one writer at a time; a writer
+# that cannot get the lock within the busy timeout (busy_timeout) fails with
+# 'database is locked'. run_transaction takes the write lock up front with
+# BEGIN IMMEDIATE, so a busy error always means nothing was written, and
+# retries the whole transaction after a jittered backoff. Only pass
+# operations that touch nothing but the database: they may run more than once.
+
+# A lock wait longer than this counts as slow in the metrics
+SLOW_WAIT = 0.1
+
+def is_busy(error):
+    return isinstance(error, sqlite3.OperationalError) and ('locked' in str(error) or 'busy' in str(error))
+
+# Thread-safe counters for one database, reported by /metrics
+class LockMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.transactions = 0
+        self.retries = 0
+        self.failures = 0
+        self.rejected = 0
+        self.lock_waits = 0
+        self.slow_lock_waits = 0
+        self.lock_wait_total = 0.0
+        self.lock_wait_max = 0.0
+
+    def lock_acquired(self, waited):
+        with self._lock:
+            self.lock_waits += 1
+            self.lock_wait_total += waited
+            self.lock_wait_max = max(self.lock_wait_max, waited)
+            if waited > SLOW_WAIT:
+                self.slow_lock_waits += 1
+
+    def count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'transactions': self.transactions,
+                'retries': self.retries,
+                'failures': self.failures,
+                'rejected': self.rejected,
+                'lock_waits': self.lock_waits,
+                'slow_lock_waits': self.slow_lock_waits,
+                'lock_wait_mean_ms': self.lock_wait_total / self.lock_waits * 1000 if self.lock_waits else 0.0,
+                'lock_wait_max_ms': self.lock_wait_max * 1000,
+            }
+
+# Backoff before retry `attempt` (1-based): uniform over [0, base * 2^(attempt-1)],
+# capped at max_delay, so contending writers spread out instead of colliding again
+def backoff(attempt, base_delay, max_delay):
+    return random.uniform(0, min(max_delay, base_delay * 2 ** (attempt - 1)))
+
+# Run operation(conn, *args) in one write transaction and return its result.
+# Busy errors roll back and retry up to `retries` times; after that the
+# error is raised. The connection's own busy timeout bounds each wait.
+def run_transaction(conn, operation, *args, retries=3, base_delay=0.05, max_delay=1.0, metrics=None):
+    attempt = 0
+    while True:
+        try:
+            start = time.perf_counter()
+            conn.execute('BEGIN IMMEDIATE')
+            if metrics:
+                metrics.lock_acquired(time.perf_counter() - start)
+            result = operation(conn, *args)
+            conn.commit()
+        except sqlite3.OperationalError as e:
+            if conn.in_transaction:
+                conn.rollback()
+            if not is_busy(e):
+                raise
+            attempt += 1
+            if attempt > retries:
+                if metrics:
+                    metrics.count('failures')
+                raise
+            if metrics:
+                metrics.count('retries')
+            time.sleep(backoff(attempt, base_delay, max_delay))
+            continue
+        except BaseException:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        if metrics:
+            metrics.count('transactions')
+        return result
+
+# run_transaction with the retry settings of a configuration
+def run_configured(config, conn, operation, *args, metrics=None):
+    return run_transaction(conn, operation, *args, retries=config['write_retries'],
+                           base_delay=config['retry_base_delay'], max_delay=config['retry_max_delay'],
+                           metrics=metrics)
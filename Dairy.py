@@ -1,158 +1,229 @@
-import sqlite3
+import Accounts
+import Analytics_Export
+import Archive
+import Audit
+import Config
+import Idempotency
+import Payroll
+import Pricing
+import Profitability
+import Search
+import Settlement
+import Stock_Alerts
+import Tiering
 
-# Connect to SQLite database (creates dairy.db if it doesn't exist)
-conn = sqlite3.connect('dairy.db')
-cursor = conn.cursor()
+# Increased when the base tables change in a way create_tables cannot apply
+# to an existing database; upgrade_schema migrates older files.
+# 1: foreign keys with ON DELETE actions
+SCHEMA_VERSION = 1
 
-# Create Suppliers table
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS Suppliers (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    name TEXT NOT NULL,
-    contact TEXT,
-    address TEXT
-)
-''')
+# Base tables: name -> column definitions. Foreign keys say what happens
+# when the referenced row is deleted: history (sales, collections, ...)
+# RESTRICTs the delete, so it has to be archived first (see Archive.py);
+# optional references are SET NULL; stock rows go with their product.
+TABLES = {
+    'Suppliers': '''
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        contact TEXT,
+        address TEXT
+    ''',
+    'MilkCollection': '''
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        date DATE NOT NULL,
+        source_type TEXT NOT NULL,
+        supplier_id INTEGER,
+        quantity_liters REAL NOT NULL,
+        fat_content REAL,
+        collected_by_employee INTEGER,
+        FOREIGN KEY (supplier_id) REFERENCES Suppliers(id) ON DELETE RESTRICT,
+        FOREIGN KEY (collected_by_employee) REFERENCES Employees(id) ON DELETE SET NULL
+    ''',
+    'MilkSeparation': '''
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        date DATE NOT NULL,
+        milk_collection_id INTEGER NOT NULL,
+        milk_used_liters REAL NOT NULL,
+        cream_liters REAL,
+        skimmed_milk_liters REAL,
+        whole_milk_liters REAL,
+        FOREIGN KEY (milk_collection_id) REFERENCES MilkCollection(id) ON DELETE RESTRICT
+    ''',
+    'Products': '''
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        product_name TEXT NOT NULL,
+        category TEXT,
+        ratio_to_milk REAL,
+        unit TEXT
+    ''',
+    'Production': '''
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        date DATE NOT NULL,
+        product_id INTEGER NOT NULL,
+        milk_used_liters REAL NOT NULL,
+        quantity_produced REAL NOT NULL,
+        produced_by_employee INTEGER,
+        FOREIGN KEY (product_id) REFERENCES Products(id) ON DELETE RESTRICT,
+        FOREIGN KEY (produced_by_employee) REFERENCES Employees(id) ON DELETE SET NULL
+    ''',
+    'Stock': '''
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        product_id INTEGER NOT NULL,
+        current_quantity REAL NOT NULL,
+        last_updated DATE NOT NULL,
+        FOREIGN KEY (product_id) REFERENCES Products(id) ON DELETE CASCADE
+    ''',
+    'Employees': '''
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        role TEXT,
+        position TEXT,
+        shop_id INTEGER,
+        monthly_salary REAL,
+        join_date DATE,
+        FOREIGN KEY (shop_id) REFERENCES Shops(id) ON DELETE SET NULL
+    ''',
+    'Shops': '''
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        type TEXT,
+        location TEXT
+    ''',
+    'ExpenseCategories': '''
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL UNIQUE
+    ''',
+    'Expenses': '''
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        date DATE NOT NULL,
+        shop_id INTEGER NOT NULL,
+        description TEXT,
+        amount REAL NOT NULL,
+        category_id INTEGER,
+        FOREIGN KEY (shop_id) REFERENCES Shops(id) ON DELETE RESTRICT,
+        FOREIGN KEY (category_id) REFERENCES ExpenseCategories(id) ON DELETE SET NULL
+    ''',
+    'Salaries': '''
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        employee_id INTEGER NOT NULL,
+        date DATE NOT NULL,
+        amount_paid REAL NOT NULL,
+        period TEXT,
+        FOREIGN KEY (employee_id) REFERENCES Employees(id) ON DELETE RESTRICT
+    ''',
+    'Customers': '''
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        contact TEXT,
+        address TEXT
+    ''',
+    'Sales': '''
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        date DATE NOT NULL,
+        customer_id INTEGER NOT NULL,
+        shop_id INTEGER NOT NULL,
+        product_id INTEGER NOT NULL,
+        quantity REAL NOT NULL,
+        total_price REAL NOT NULL,
+        FOREIGN KEY (customer_id) REFERENCES Customers(id) ON DELETE RESTRICT,
+        FOREIGN KEY (shop_id) REFERENCES Shops(id) ON DELETE RESTRICT,
+        FOREIGN KEY (product_id) REFERENCES Products(id) ON DELETE RESTRICT
+    ''',
+}
 
-# Create MilkCollection table
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS MilkCollection (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    date DATE NOT NULL,
-    source_type TEXT NOT NULL,
-    supplier_id INTEGER,
-    quantity_liters REAL NOT NULL,
-    fat_content REAL,
-    collected_by_employee INTEGER,
-    FOREIGN KEY (supplier_id) REFERENCES Suppliers(id),
-    FOREIGN KEY (collected_by_employee) REFERENCES Employees(id)
-)
-''')
+# Create all tables on an open connection (safe to run on an existing database)
+def create_tables(conn):
+    cursor = conn.cursor()
 
-# Create MilkSeparation table
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS MilkSeparation (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    date DATE NOT NULL,
-    milk_collection_id INTEGER NOT NULL,
-    milk_used_liters REAL NOT NULL,
-    cream_liters REAL,
-    skimmed_milk_liters REAL,
-    whole_milk_liters REAL,
-    FOREIGN KEY (milk_collection_id) REFERENCES MilkCollection(id)
-)
-''')
+    # New databases reclaim space from deletes in small steps (see
+    # Maintenance.py). The mode can only change while the file has no tables;
+    # the VACUUM applies it even if the header was already written.
+    if cursor.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()[0] == 0:
+        cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        cursor.execute('VACUUM')
+        cursor.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
 
-# Create Products table
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS Products (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    product_name TEXT NOT NULL,
-    category TEXT,
-    ratio_to_milk REAL,
-    unit TEXT
-)
-''')
+    for name, columns in TABLES.items():
+        cursor.execute(f'CREATE TABLE IF NOT EXISTS {name} ({columns})')
+    conn.commit()
 
-# Create Production table
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS Production (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    date DATE NOT NULL,
-    product_id INTEGER NOT NULL,
-    milk_used_liters REAL NOT NULL,
-    quantity_produced REAL NOT NULL,
-    produced_by_employee INTEGER,
-    FOREIGN KEY (product_id) REFERENCES Products(id),
-    FOREIGN KEY (produced_by_employee) REFERENCES Employees(id)
-)
-''')
+# Recreate a base table from TABLES, keeping its rows, its AUTOINCREMENT
+# high-water mark and the indexes and triggers other modules put on it.
+# Follows SQLite's table-rebuild procedure; foreign keys must be off.
+def _rebuild_table(conn, name):
+    old_columns = {row[1] for row in conn.execute(f'PRAGMA table_info({name})')}
+    extras = [row[0] for row in conn.execute(
+        "SELECT sql FROM sqlite_master WHERE tbl_name = ? AND type IN ('index', 'trigger') AND sql IS NOT NULL",
+        (name,))]
+    seq = conn.execute('SELECT seq FROM sqlite_sequence WHERE name = ?', (name,)).fetchone()
+    conn.execute(f'CREATE TABLE new_{name} ({TABLES[name]})')
+    columns = ', '.join(row[1] for row in conn.execute(f'PRAGMA table_info(new_{name})') if row[1] in old_columns)
+    conn.execute(f'INSERT INTO new_{name} ({columns}) SELECT {columns} FROM {name}')
+    conn.execute(f'DROP TABLE {name}')
+    conn.execute(f'ALTER TABLE new_{name} RENAME TO {name}')
+    if seq:
+        conn.execute('UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?', (seq[0], name))
+    for sql in extras:
+        conn.execute(sql)
 
-# Create Stock table
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS Stock (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    product_id INTEGER NOT NULL,
-    current_quantity REAL NOT NULL,
-    last_updated DATE NOT NULL,
-    FOREIGN KEY (product_id) REFERENCES Products(id)
-)
-''')
+# Version 1: rebuild every base table with its ON DELETE actions. Rows left
+# orphaned by earlier deletes are archived (or their optional reference
+# cleared) so the database passes foreign_key_check afterwards.
+def _add_foreign_key_actions(conn):
+    # legacy_alter_table stops the RENAME from re-checking triggers on other
+    # tables that name a table which is mid-rebuild
+    conn.execute('PRAGMA foreign_keys = OFF')
+    conn.execute('PRAGMA legacy_alter_table = ON')
+    try:
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            for name in TABLES:
+                _rebuild_table(conn, name)
+            Archive.resolve_violations(conn)
+            conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+    finally:
+        conn.execute('PRAGMA legacy_alter_table = OFF')
+        conn.execute('PRAGMA foreign_keys = ON')
 
-# Create Employees table
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS Employees (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    name TEXT NOT NULL,
-    role TEXT,
-    position TEXT,
-    shop_id INTEGER,
-    monthly_salary REAL,
-    FOREIGN KEY (shop_id) REFERENCES Shops(id)
-)
-''')
+DEFAULT_EXPENSE_CATEGORIES = ['Utilities', 'Rent', 'Transport', 'Supplies', 'Maintenance', 'Packaging', 'Other']
 
-# Create Shops table
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS Shops (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    name TEXT NOT NULL,
-    type TEXT,
-    location TEXT
-)
-''')
+# Expense categories came after version 1: add the table and column, and
+# file existing expenses whose description is exactly a category name
+def _add_expense_categories(conn):
+    conn.execute(f"CREATE TABLE IF NOT EXISTS ExpenseCategories ({TABLES['ExpenseCategories']})")
+    if 'category_id' not in {row[1] for row in conn.execute('PRAGMA table_info(Expenses)')}:
+        conn.execute('ALTER TABLE Expenses ADD COLUMN category_id INTEGER REFERENCES ExpenseCategories(id) ON DELETE SET NULL')
+    if conn.execute('SELECT COUNT(*) FROM ExpenseCategories').fetchone()[0] == 0:
+        conn.executemany('INSERT INTO ExpenseCategories (name) VALUES (?)', [(name,) for name in DEFAULT_EXPENSE_CATEGORIES])
+        conn.execute('''
+        UPDATE Expenses SET category_id = (SELECT id FROM ExpenseCategories WHERE name = TRIM(Expenses.description) COLLATE NOCASE)
+        WHERE category_id IS NULL
+        ''')
 
-# Create Expenses table
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS Expenses (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    date DATE NOT NULL,
-    shop_id INTEGER NOT NULL,
-    description TEXT,
-    amount REAL NOT NULL,
-    FOREIGN KEY (shop_id) REFERENCES Shops(id)
-)
-''')
+# Bring a database created by an older version up to date: columns, tables,
+# indexes and triggers added by the feature modules. Idempotent.
+def upgrade_schema(conn):
+    with conn:
+        _add_expense_categories(conn)
+        Payroll.ensure_payroll_schema(conn)
+        Search.ensure_search_schema(conn)
+        Settlement.ensure_settlement_schema(conn)
+        Stock_Alerts.ensure_alert_schema(conn)
+        Archive.ensure_archive_schema(conn)
+        Idempotency.ensure_idempotency_schema(conn)
+        Accounts.ensure_accounts_schema(conn)
+        Pricing.ensure_pricing_schema(conn)
+        Profitability.ensure_profit_schema(conn)
+        Audit.ensure_audit_schema(conn)
+        Tiering.ensure_tiering_schema(conn)
+        Analytics_Export.ensure_analytics_schema(conn)
+    if conn.execute('PRAGMA user_version').fetchone()[0] < 1:
+        _add_foreign_key_actions(conn)
 
-# Create Salaries table
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS Salaries (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    employee_id INTEGER NOT NULL,
-    date DATE NOT NULL,
-    amount_paid REAL NOT NULL,
-    FOREIGN KEY (employee_id) REFERENCES Employees(id)
-)
-''')
-
-# Create Customers table
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS Customers (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    name TEXT NOT NULL,
-    contact TEXT,
-    address TEXT
-)
-''')
-
-# Create Sales table
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS Sales (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    date DATE NOT NULL,
-    customer_id INTEGER NOT NULL,
-    shop_id INTEGER NOT NULL,
-    product_id INTEGER NOT NULL,
-    quantity REAL NOT NULL,
-    total_price REAL NOT NULL,
-    FOREIGN KEY (customer_id) REFERENCES Customers(id),
-    FOREIGN KEY (shop_id) REFERENCES Shops(id),
-    FOREIGN KEY (product_id) REFERENCES Products(id)
-)
-''')
-
-# Commit changes and close connection
-conn.commit()
-conn.close()
-
-print("Database created successfully with all tables.")
\ No newline at end of file
+# Usage: python Dairy.py  (database path from DAIRY_DB / DAIRY_CONFIG, default dairy.db)
+if __name__ == '__main__':
+    conn = Config.connect(Config.load_config())
+    create_tables(conn)
+    upgrade_schema(conn)
+    conn.close()
+    print("Database created successfully with all tables.")
@@ -0,0 +1,1144 @@
+from flask import request, redirect, url_for, flash
+from datetime import date
+import Accounts
+import Archive
+import Payroll
+import Pricing
+import Profitability
+import Repositories
+import Settlement
+from Web import (bp, archive_record, execute_query, execute_read_query, export_links, export_source,
+                 get_db_connection, get_record, idempotency_field, page_rows, render_page, run_operation,
+                 audit_history)
+
+# Data management pages: list, add, edit and delete for each table. Writes
+# go through Web.run_operation; list tables are registered export sources.
+
+# Suppliers
+@export_source('suppliers')
+def supplier_rows(conn, args):
+    return conn.execute("SELECT * FROM Suppliers")
+
+@bp.route('/suppliers', methods=['GET'])
+def list_suppliers():
+    suppliers = page_rows('suppliers')
+    content = '<h2 class="mt-4">Manage Suppliers</h2>' + export_links('suppliers') + '<table class="table table-striped table-hover"><thead><tr><th>ID</th><th>Name</th><th>Contact</th><th>Address</th><th>Actions</th></tr></thead><tbody>'
+    for sup in suppliers:
+        content += f'<tr><td>{sup["id"]}</td><td>{sup["name"]}</td><td>{sup["contact"]}</td><td>{sup["address"]}</td><td><a class="btn btn-sm btn-primary" href="{url_for(".edit_supplier", id=sup["id"])}">Edit</a> <a class="btn btn-sm btn-danger" href="{url_for(".delete_supplier", id=sup["id"])}">Delete</a></td></tr>'
+    content += '</tbody></table>'
+    content += f'''
+    <h3>Add Supplier</h3>
+    <form method="POST" action="{url_for(".add_supplier")}" class="row g-3">{idempotency_field()}
+        <div class="col-md-4"><label class="form-label">Name</label><input name="name" class="form-control" required></div>
+        <div class="col-md-4"><label class="form-label">Contact</label><input name="contact" class="form-control"></div>
+        <div class="col-md-4"><label class="form-label">Address</label><input name="address" class="form-control"></div>
+        <div class="col-12"><button type="submit" class="btn btn-primary">Add</button></div>
+    </form>
+    '''
+    return render_page(content)
+
+@bp.route('/add_supplier', methods=['POST'])
+def add_supplier():
+    name = request.form['name']
+    contact = request.form['contact']
+    address = request.form['address']
+    run_operation(Repositories.insert_record, 'Suppliers', {'name': name, 'contact': contact, 'address': address})
+    flash('Supplier added successfully')
+    return redirect(url_for('.list_suppliers'))
+
+@bp.route('/edit_supplier/<int:id>', methods=['GET', 'POST'])
+def edit_supplier(id):
+    if request.method == 'POST':
+        name = request.form['name']
+        contact = request.form['contact']
+        address = request.form['address']
+        run_operation(Repositories.update_record, 'Suppliers', id, {'name': name, 'contact': contact, 'address': address})
+        flash('Supplier updated successfully')
+        return redirect(url_for('.list_suppliers'))
+    supplier = get_record('Suppliers', id)
+    content = f'''
+    <h2 class="mt-4">Edit Supplier</h2>
+    <form method="POST" class="row g-3">{idempotency_field()}
+        <div class="col-md-4"><label class="form-label">Name</label><input name="name" class="form-control" value="{supplier['name']}" required></div>
+        <div class="col-md-4"><label class="form-label">Contact</label><input name="contact" class="form-control" value="{supplier['contact']}"></div>
+        <div class="col-md-4"><label class="form-label">Address</label><input name="address" class="form-control" value="{supplier['address']}"></div>
+        <div class="col-12"><button type="submit" class="btn btn-primary">Update</button></div>
+    </form>
+    '''
+    content += audit_history('Suppliers', id)
+    return render_page(content)
+
+@bp.route('/delete_supplier/<int:id>')
+def delete_supplier(id):
+    archive_record('Suppliers', id, 'Supplier')
+    return redirect(url_for('.list_suppliers'))
+
+# Milk Collections
+@export_source('milk_collections')
+def milk_collection_rows(conn, args):
+    return conn.execute("SELECT * FROM MilkCollection")
+
+@bp.route('/milk_collections', methods=['GET'])
+def list_milk_collections():
+    collections = page_rows('milk_collections')
+    content = '<h2 class="mt-4">Manage Milk Collections</h2>' + export_links('milk_collections') + '<table class="table table-striped table-hover"><thead><tr><th>ID</th><th>Date</th><th>Source Type</th><th>Supplier ID</th><th>Quantity (L)</th><th>Fat Content</th><th>Collected By</th><th>Actions</th></tr></thead><tbody>'
+    for col in collections:
+        content += f'<tr><td>{col["id"]}</td><td>{col["date"]}</td><td>{col["source_type"]}</td><td>{col["supplier_id"]}</td><td>{col["quantity_liters"]}</td><td>{col["fat_content"]}</td><td>{col["collected_by_employee"]}</td><td><a class="btn btn-sm btn-primary" href="{url_for(".edit_milk_collection", id=col["id"])}">Edit</a> <a class="btn btn-sm btn-danger" href="{url_for(".delete_milk_collection", id=col["id"])}">Delete</a></td></tr>'
+    content += '</tbody></table>'
+    employees = execute_read_query("SELECT id, name FROM Employees", fetchall=True)
+    suppliers = execute_read_query("SELECT id, name FROM Suppliers", fetchall=True)
+    emp_options = ''.join([f'<option value="{emp["id"]}">{emp["name"]}</option>' for emp in employees])
+    sup_options = ''.join([f'<option value="{sup["id"]}">{sup["name"]}</option>' for sup in suppliers])
+    content += f'''
+    <h3>Add Milk Collection</h3>
+    <form method="POST" action="{url_for(".add_milk_collection")}" class="row g-3">{idempotency_field()}
+        <div class="col-md-4"><label class="form-label">Date</label><input name="date" type="date" class="form-control" value="{date.today()}" required></div>
+        <div class="col-md-4"><label class="form-label">Source Type</label><select name="source_type" class="form-select"><option value="farm">Farm</option><option value="supplier">Supplier</option></select></div>
+        <div class="col-md-4"><label class="form-label">Supplier</label><select name="supplier_id" class="form-select"><option value="">None</option>{sup_options}</select></div>
+        <div class="col-md-4"><label class="form-label">Quantity (L)</label><input name="quantity_liters" type="number" class="form-control" required></div>
+        <div class="col-md-4"><label class="form-label">Fat Content</label><input name="fat_content" type="number" step="0.1" class="form-control"></div>
+        <div class="col-md-4"><label class="form-label">Collected By</label><select name="collected_by_employee" class="form-select">{emp_options}</select></div>
+        <div class="col-12"><button type="submit" class="btn btn-primary">Add</button></div>
+    </form>
+    '''
+    return render_page(content)
+
+@bp.route('/add_milk_collection', methods=['POST'])
+def add_milk_collection():
+    date_val = request.form['date']
+    source_type = request.form['source_type']
+    supplier_id = request.form['supplier_id'] or None
+    quantity_liters = request.form['quantity_liters']
+    fat_content = request.form['fat_content'] or None
+    collected_by = request.form['collected_by_employee']
+    run_operation(Repositories.insert_record, 'MilkCollection',
+                  {'date': date_val, 'source_type': source_type, 'supplier_id': supplier_id, 'quantity_liters': quantity_liters,
+                   'fat_content': fat_content, 'collected_by_employee': collected_by})
+    flash('Milk collection recorded')
+    return redirect(url_for('.list_milk_collections'))
+
+@bp.route('/edit_milk_collection/<int:id>', methods=['GET', 'POST'])
+def edit_milk_collection(id):
+    if request.method == 'POST':
+        date_val = request.form['date']
+        source_type = request.form['source_type']
+        supplier_id = request.form['supplier_id'] or None
+        quantity_liters = request.form['quantity_liters']
+        fat_content = request.form['fat_content'] or None
+        collected_by = request.form['collected_by_employee']
+        run_operation(Repositories.update_record, 'MilkCollection', id,
+                      {'date': date_val, 'source_type': source_type, 'supplier_id': supplier_id, 'quantity_liters': quantity_liters,
+                       'fat_content': fat_content, 'collected_by_employee': collected_by})
+        flash('Milk collection updated')
+        return redirect(url_for('.list_milk_collections'))
+    collection = get_record('MilkCollection', id)
+    employees = execute_query("SELECT id, name FROM Employees", fetchall=True)
+    suppliers = execute_query("SELECT id, name FROM Suppliers", fetchall=True)
+    emp_options = ''.join([f'<option value="{emp["id"]}" {"selected" if emp["id"] == collection["collected_by_employee"] else ""}>{emp["name"]}</option>' for emp in employees])
+    sup_options = ''.join([f'<option value="{sup["id"]}" {"selected" if sup["id"] == collection["supplier_id"] else ""}>{sup["name"]}</option>' for sup in suppliers])
+    content = f'''
+    <h2 class="mt-4">Edit Milk Collection</h2>
+    <form method="POST" class="row g-3">{idempotency_field()}
+        <div class="col-md-4"><label class="form-label">Date</label><input name="date" type="date" class="form-control" value="{collection["date"]}" required></div>
+        <div class="col-md-4"><label class="form-label">Source Type</label><select name="source_type" class="form-select"><option value="farm" {"selected" if collection["source_type"] == "farm" else ""}>Farm</option><option value="supplier" {"selected" if collection["source_type"] == "supplier" else ""}>Supplier</option></select></div>
+        <div class="col-md-4"><label class="form-label">Supplier</label><select name="supplier_id" class="form-select"><option value="">None</option>{sup_options}</select></div>
+        <div class="col-md-4"><label class="form-label">Quantity (L)</label><input name="quantity_liters" type="number" class="form-control" value="{collection["quantity_liters"]}" required></div>
+        <div class="col-md-4"><label class="form-label">Fat Content</label><input name="fat_content" type="number" step="0.1" class="form-control" value="{collection["fat_content"]}"></div>
+        <div class="col-md-4"><label class="form-label">Collected By</label><select name="collected_by_employee" class="form-select">{emp_options}</select></div>
+        <div class="col-12"><button type="submit" class="btn btn-primary">Update</button></div>
+    </form>
+    '''
+    content += audit_history('MilkCollection', id)
+    return render_page(content)
+
+@bp.route('/delete_milk_collection/<int:id>')
+def delete_milk_collection(id):
+    archive_record('MilkCollection', id, 'Milk collection')
+    return redirect(url_for('.list_milk_collections'))
+
+# Supplier Settlements
+@export_source('settlements')
+def settlement_rows(conn, args):
+    return Settlement.list_settlements(conn, args.get('period') or None)
+
+@bp.route('/settlements', methods=['GET'])
+def list_settlements():
+    period = request.args.get('period') or None
+    settlements = page_rows('settlements')
+    conn = get_db_connection()
+    try:
+        bands = Settlement.list_price_bands(conn)
+        dirty = [row[0] for row in conn.execute('SELECT period FROM SettlementDirtyPeriods ORDER BY period')]
+    finally:
+        conn.close()
+    content = f'''
+    <h2 class="mt-4">Supplier Settlements</h2>
+    <form method="GET" class="row g-3 mb-3">
+        <div class="col-md-4"><label class="form-label">Period</label><input name="period" type="month" class="form-control" value="{period or ''}"></div>
+        <div class="col-12"><button type="submit" class="btn btn-secondary">Filter</button></div>
+    </form>
+    '''
+    if dirty:
+        content += f'''
+        <form method="POST" action="{url_for(".run_settlement")}" class="mb-3">{idempotency_field()}
+            <span class="me-2">Periods with changed collections: {', '.join(dirty)}</span>
+            <button type="submit" class="btn btn-primary">Recompute</button>
+        </form>
+        '''
+    content += export_links('settlements')
+    content += '<table class="table table-striped table-hover"><thead><tr><th>Period</th><th>Supplier</th><th>Collections</th><th>Liters</th><th>Avg Fat</th><th>Amount</th><th>Unpriced Liters</th><th>Computed At</th></tr></thead><tbody>'
+    for st in settlements:
+        content += f'<tr><td>{st["period"]}</td><td>{st["supplier"]}</td><td>{st["collections"]}</td><td>{st["liters"]}</td><td>{st["avg_fat"]}</td><td>{st["amount"]:.2f}</td><td>{st["unpriced_liters"]}</td><td>{st["computed_at"]}</td></tr>'
+    content += '</tbody></table>'
+    content += '<h3>Fat Price Bands</h3><table class="table table-striped table-hover"><thead><tr><th>Effective From</th><th>Fat From</th><th>Fat Below</th><th>Price / L</th><th>Actions</th></tr></thead><tbody>'
+    for band in bands:
+        content += f'<tr><td>{band["effective_from"]}</td><td>{band["min_fat"]}</td><td>{band["max_fat"]}</td><td>{band["price_per_liter"]}</td><td><a class="btn btn-sm btn-danger" href="{url_for(".delete_price_band", id=band["id"])}">Delete</a></td></tr>'
+    content += '</tbody></table>'
+    content += f'''
+    <h3>Add Price Band</h3>
+    <form method="POST" action="{url_for(".add_price_band")}" class="row g-3">{idempotency_field()}
+        <div class="col-md-3"><label class="form-label">Effective From</label><input name="effective_from" type="date" class="form-control" value="{date.today()}" required></div>
+        <div class="col-md-3"><label class="form-label">Fat From (%)</label><input name="min_fat" type="number" step="0.1" class="form-control" required></div>
+        <div class="col-md-3"><label class="form-label">Fat Below (%)</label><input name="max_fat" type="number" step="0.1" class="form-control" required></div>
+        <div class="col-md-3"><label class="form-label">Price / L</label><input name="price_per_liter" type="number" step="0.01" class="form-control" required></div>
+        <div class="col-12"><button type="submit" class="btn btn-primary">Add</button></div>
+    </form>
+    '''
+    return render_page(content)
+
+@bp.route('/add_price_band', methods=['POST'])
+def add_price_band():
+    execute_query("INSERT INTO FatPriceBands (effective_from, min_fat, max_fat, price_per_liter) VALUES (?, ?, ?, ?)",
+                  (request.form['effective_from'], request.form['min_fat'], request.form['max_fat'], request.form['price_per_liter']))
+    flash('Price band added')
+    return redirect(url_for('.list_settlements'))
+
+@bp.route('/delete_price_band/<int:id>')
+def delete_price_band(id):
+    execute_query("DELETE FROM FatPriceBands WHERE id=?", (id,))
+    flash('Price band deleted')
+    return redirect(url_for('.list_settlements'))
+
+@bp.route('/run_settlement', methods=['POST'])
+def run_settlement():
+    periods = run_operation(Settlement.run_settlement)
+    flash(f'Settlements recomputed for {", ".join(periods) or "no periods"}')
+    return redirect(url_for('.list_settlements'))
+
+# Milk Separations
+@export_source('separations')
+def separation_rows(conn, args):
+    return conn.execute("SELECT * FROM MilkSeparation")
+
+@bp.route('/separations', methods=['GET'])
+def list_separations():
+    separations = page_rows('separations')
+    content = '<h2 class="mt-4">Manage Milk Separations</h2>' + export_links('separations') + '<table class="table table-striped table-hover"><thead><tr><th>ID</th><th>Date</th><th>Milk Collection ID</th><th>Milk Used (L)</th><th>Cream (L)</th><th>Skimmed (L)</th><th>Whole (L)</th><th>Actions</th></tr></thead><tbody>'
+    for sep in separations:
+        content += f'<tr><td>{sep["id"]}</td><td>{sep["date"]}</td><td>{sep["milk_collection_id"]}</td><td>{sep["milk_used_liters"]}</td><td>{sep["cream_liters"]}</td><td>{sep["skimmed_milk_liters"]}</td><td>{sep["whole_milk_liters"]}</td><td><a class="btn btn-sm btn-primary" href="{url_for(".edit_separation", id=sep["id"])}">Edit</a> <a class="btn btn-sm btn-danger" href="{url_for(".delete_separation", id=sep["id"])}">Delete</a></td></tr>'
+    content += '</tbody></table>'
+    collections = execute_read_query("SELECT id FROM MilkCollection", fetchall=True)
+    col_options = ''.join([f'<option value="{col["id"]}">{col["id"]}</option>' for col in collections])
+    content += f'''
+    <h3>Add Milk Separation</h3>
+    <form method="POST" action="{url_for(".add_separation")}" class="row g-3">{idempotency_field()}
+        <div class="col-md-4"><label class="form-label">Date</label><input name="date" type="date" class="form-control" value="{date.today()}" required></div>
+        <div class="col-md-4"><label class="form-label">Milk Collection ID</label><select name="milk_collection_id" class="form-select">{col_options}</select></div>
+        <div class="col-md-4"><label class="form-label">Milk Used (L)</label><input name="milk_used_liters" type="number" class="form-control" required></div>
+        <div class="col-md-4"><label class="form-label">Cream (L)</label><input name="cream_liters" type="number" class="form-control"></div>
+        <div class="col-md-4"><label class="form-label">Skimmed (L)</label><input name="skimmed_milk_liters" type="number" class="form-control"></div>
+        <div class="col-md-4"><label class="form-label">Whole (L)</label><input name="whole_milk_liters" type="number" class="form-control"></div>
+        <div class="col-12"><button type="submit" class="btn btn-primary">Add</button></div>
+    </form>
+    '''
+    return render_page(content)
+
+@bp.route('/add_separation', methods=['POST'])
+def add_separation():
+    date_val = request.form['date']
+    milk_collection_id = request.form['milk_collection_id']
+    milk_used = request.form['milk_used_liters']
+    cream = request.form['cream_liters']
+    skimmed = request.form['skimmed_milk_liters']
+    whole = request.form['whole_milk_liters']
+    run_operation(Repositories.insert_record, 'MilkSeparation',
+                  {'date': date_val, 'milk_collection_id': milk_collection_id, 'milk_used_liters': milk_used,
+                   'cream_liters': cream, 'skimmed_milk_liters': skimmed, 'whole_milk_liters': whole})
+    flash('Milk separation recorded')
+    return redirect(url_for('.list_separations'))
+
+@bp.route('/edit_separation/<int:id>', methods=['GET', 'POST'])
+def edit_separation(id):
+    if request.method == 'POST':
+        date_val = request.form['date']
+        milk_collection_id = request.form['milk_collection_id']
+        milk_used = request.form['milk_used_liters']
+        cream = request.form['cream_liters']
+        skimmed = request.form['skimmed_milk_liters']
+        whole = request.form['whole_milk_liters']
+        run_operation(Repositories.update_record, 'MilkSeparation', id,
+                      {'date': date_val, 'milk_collection_id': milk_collection_id, 'milk_used_liters': milk_used,
+                       'cream_liters': cream, 'skimmed_milk_liters': skimmed, 'whole_milk_liters': whole})
+        flash('Milk separation updated')
+        return redirect(url_for('.list_separations'))
+    separation = get_record('MilkSeparation', id)
+    collections = execute_query("SELECT id FROM MilkCollection", fetchall=True)
+    col_options = ''.join([f'<option value="{col["id"]}" {"selected" if col["id"] == separation["milk_collection_id"] else ""}>{col["id"]}</option>' for col in collections])
+    content = f'''
+    <h2 class="mt-4">Edit Milk Separation</h2>
+    <form method="POST" class="row g-3">{idempotency_field()}
+        <div class="col-md-4"><label class="form-label">Date</label><input name="date" type="date" class="form-control" value="{separation["date"]}" required></div>
+        <div class="col-md-4"><label class="form-label">Milk Collection ID</label><select name="milk_collection_id" class="form-select">{col_options}</select></div>
+        <div class="col-md-4"><label class="form-label">Milk Used (L)</label><input name="milk_used_liters" type="number" class="form-control" value="{separation["milk_used_liters"]}" required></div>
+        <div class="col-md-4"><label class="form-label">Cream (L)</label><input name="cream_liters" type="number" class="form-control" value="{separation["cream_liters"]}"></div>
+        <div class="col-md-4"><label class="form-label">Skimmed (L)</label><input name="skimmed_milk_liters" type="number" class="form-control" value="{separation["skimmed_milk_liters"]}"></div>
+        <div class="col-md-4"><label class="form-label">Whole (L)</label><input name="whole_milk_liters" type="number" class="form-control" value="{separation["whole_milk_liters"]}"></div>
+        <div class="col-12"><button type="submit" class="btn btn-primary">Update</button></div>
+    </form>
+    '''
+    content += audit_history('MilkSeparation', id)
+    return render_page(content)
+
+@bp.route('/delete_separation/<int:id>')
+def delete_separation(id):
+    run_operation(Repositories.delete_record, 'MilkSeparation', id)
+    flash('Milk separation deleted')
+    return redirect(url_for('.list_separations'))
+
+# Products
+@export_source('products')
+def product_rows(conn, args):
+    return conn.execute("SELECT * FROM Products")
+
+@bp.route('/products', methods=['GET'])
+def list_products():
+    products = page_rows('products')
+    content = '<h2 class="mt-4">Manage Products</h2>' + export_links('products') + '<table class="table table-striped table-hover"><thead><tr><th>ID</th><th>Name</th><th>Category</th><th>Ratio to Milk</th><th>Unit</th><th>Actions</th></tr></thead><tbody>'
+    for prod in products:
+        content += f'<tr><td>{prod["id"]}</td><td>{prod["product_name"]}</td><td>{prod["category"]}</td><td>{prod["ratio_to_milk"]}</td><td>{prod["unit"]}</td><td><a class="btn btn-sm btn-primary" href="{url_for(".edit_product", id=prod["id"])}">Edit</a> <a class="btn btn-sm btn-danger" href="{url_for(".delete_product", id=prod["id"])}">Delete</a></td></tr>'
+    content += '</tbody></table>'
+    content += f'''
+    <h3>Add Product</h3>
+    <form method="POST" action="{url_for(".add_product")}" class="row g-3">{idempotency_field()}
+        <div class="col-md-3"><label class="form-label">Name</label><input name="product_name" class="form-control" required></div>
+        <div class="col-md-3"><label class="form-label">Category</label><input name="category" class="form-control"></div>
+        <div class="col-md-3"><label class="form-label">Ratio to Milk</label><input name="ratio_to_milk" type="number" step="0.1" class="form-control"></div>
+        <div class="col-md-3"><label class="form-label">Unit</label><input name="unit" class="form-control"></div>
+        <div class="col-12"><button type="submit" class="btn btn-primary">Add</button></div>
+    </form>
+    '''
+    return render_page(content)
+
+@bp.route('/add_product', methods=['POST'])
+def add_product():
+    product_name = request.form['product_name']
+    category = request.form['category']
+    ratio_to_milk = request.form['ratio_to_milk'] or None
+    unit = request.form['unit']
+    run_operation(Repositories.add_product, product_name, category, ratio_to_milk, unit, date.today())
+    flash('Product added and stock initialized')
+    return redirect(url_for('.list_products'))
+
+@bp.route('/edit_product/<int:id>', methods=['GET', 'POST'])
+def edit_product(id):
+    if request.method == 'POST':
+        product_name = request.form['product_name']
+        category = request.form['category']
+        ratio_to_milk = request.form['ratio_to_milk'] or None
+        unit = request.form['unit']
+        run_operation(Repositories.update_record, 'Products', id,
+                      {'product_name': product_name, 'category': category, 'ratio_to_milk': ratio_to_milk, 'unit': unit})
+        flash('Product updated')
+        return redirect(url_for('.list_products'))
+    product = get_record('Products', id)
+    content = f'''
+    <h2 class="mt-4">Edit Product</h2>
+    <form method="POST" class="row g-3">{idempotency_field()}
+        <div class="col-md-3"><label class="form-label">Name</label><input name="product_name" class="form-control" value="{product["product_name"]}" required></div>
+        <div class="col-md-3"><label class="form-label">Category</label><input name="category" class="form-control" value="{product["category"]}"></div>
+        <div class="col-md-3"><label class="form-label">Ratio to Milk</label><input name="ratio_to_milk" type="number" step="0.1" class="form-control" value="{product["ratio_to_milk"]}"></div>
+        <div class="col-md-3"><label class="form-label">Unit</label><input name="unit" class="form-control" value="{product["unit"]}"></div>
+        <div class="col-12"><button type="submit" class="btn btn-primary">Update</button></div>
+    </form>
+    '''
+    content += audit_history('Products', id)
+    return render_page(content)
+
+@bp.route('/delete_product/<int:id>')
+def delete_product(id):
+    archive_record('Products', id, 'Product')
+    return redirect(url_for('.list_products'))
+
+# Productions
+@export_source('productions')
+def production_rows(conn, args):
+    return conn.execute("SELECT p.id, p.date, pr.product_name, p.milk_used_liters, p.quantity_produced, e.name AS employee FROM Production p JOIN Products pr ON p.product_id = pr.id LEFT JOIN Employees e ON p.produced_by_employee = e.id")
+
+@bp.route('/productions', methods=['GET'])
+def list_productions():
+    productions = page_rows('productions')
+    content = '<h2 class="mt-4">Manage Productions</h2>' + export_links('productions') + '<table class="table table-striped table-hover"><thead><tr><th>ID</th><th>Date</th><th>Product</th><th>Milk Used (L)</th><th>Quantity Produced</th><th>Produced By</th><th>Actions</th></tr></thead><tbody>'
+    for prod in productions:
+        content += f'<tr><td>{prod["id"]}</td><td>{prod["date"]}</td><td>{prod["product_name"]}</td><td>{prod["milk_used_liters"]}</td><td>{prod["quantity_produced"]}</td><td>{prod["employee"]}</td><td><a class="btn btn-sm btn-primary" href="{url_for(".edit_production", id=prod["id"])}">Edit</a> <a class="btn btn-sm btn-danger" href="{url_for(".delete_production", id=prod["id"])}">Delete</a></td></tr>'
+    content += '</tbody></table>'
+    products = execute_read_query("SELECT id, product_name FROM Products", fetchall=True)
+    employees = execute_read_query("SELECT id, name FROM Employees", fetchall=True)
+    prod_options = ''.join([f'<option value="{p["id"]}">{p["product_name"]}</option>' for p in products])
+    emp_options = ''.join([f'<option value="{e["id"]}">{e["name"]}</option>' for e in employees])
+    content += f'''
+    <h3>Add Production</h3>
+    <form method="POST" action="{url_for(".add_production")}" class="row g-3">{idempotency_field()}
+        <div class="col-md-4"><label class="form-label">Date</label><input name="date" type="date" class="form-control" value="{date.today()}" required></div>
+        <div class="col-md-4"><label class="form-label">Product</label><select name="product_id" class="form-select">{prod_options}</select></div>
+        <div class="col-md-4"><label class="form-label">Milk Used (L)</label><input name="milk_used_liters" type="number" class="form-control" required></div>
+        <div class="col-md-4"><label class="form-label">Produced By</label><select name="produced_by_employee" class="form-select">{emp_options}</select></div>
+        <div class="col-12"><button type="submit" class="btn btn-primary">Add</button></div>
+    </form>
+    '''
+    return render_page(content)
+
+@bp.route('/add_production', methods=['POST'])
+def add_production():
+    date_val = request.form['date']
+    product_id = request.form['product_id']
+    milk_used = float(request.form['milk_used_liters'])
+    produced_by = request.form['produced_by_employee']
+    run_operation(Repositories.record_production, date_val, product_id, milk_used, produced_by)
+    flash('Production recorded and stock updated')
+    return redirect(url_for('.list_productions'))
+
+@bp.route('/edit_production/<int:id>', methods=['GET', 'POST'])
+def edit_production(id):
+    if request.method == 'POST':
+        date_val = request.form['date']
+        product_id = request.form['product_id']
+        milk_used = float(request.form['milk_used_liters'])
+        produced_by = request.form['produced_by_employee']
+        run_operation(Repositories.update_production, id, date_val, product_id, milk_used, produced_by)
+        flash('Production updated and stock adjusted')
+        return redirect(url_for('.list_productions'))
+    production = get_record('Production', id)
+    products = execute_query("SELECT id, product_name FROM Products", fetchall=True)
+    employees = execute_query("SELECT id, name FROM Employees", fetchall=True)
+    prod_options = ''.join([f'<option value="{p["id"]}" {"selected" if p["id"] == production["product_id"] else ""}>{p["product_name"]}</option>' for p in products])
+    emp_options = ''.join([f'<option value="{e["id"]}" {"selected" if e["id"] == production["produced_by_employee"] else ""}>{e["name"]}</option>' for e in employees])
+    content = f'''
+    <h2 class="mt-4">Edit Production</h2>
+    <form method="POST" class="row g-3">{idempotency_field()}
+        <div class="col-md-4"><label class="form-label">Date</label><input name="date" type="date" class="form-control" value="{production["date"]}" required></div>
+        <div class="col-md-4"><label class="form-label">Product</label><select name="product_id" class="form-select">{prod_options}</select></div>
+        <div class="col-md-4"><label class="form-label">Milk Used (L)</label><input name="milk_used_liters" type="number" class="form-control" value="{production["milk_used_liters"]}" required></div>
+        <div class="col-md-4"><label class="form-label">Produced By</label><select name="produced_by_employee" class="form-select">{emp_options}</select></div>
+        <div class="col-12"><button type="submit" class="btn btn-primary">Update</button></div>
+    </form>
+    '''
+    content += audit_history('Production', id)
+    return render_page(content)
+
+@bp.route('/delete_production/<int:id>')
+def delete_production(id):
+    run_operation(Repositories.delete_production, id, date.today())
+    flash('Production deleted and stock updated')
+    return redirect(url_for('.list_productions'))
+
+# Employees
+@export_source('employees')
+def employee_rows(conn, args):
+    return conn.execute("SELECT * FROM Employees")
+
+@bp.route('/employees/list', methods=['GET'])
+def list_employees():
+    employees = page_rows('employees')
+    content = '<h2 class="mt-4">Manage Employees</h2>' + export_links('employees') + '<table class="table table-striped table-hover"><thead><tr><th>ID</th><th>Name</th><th>Role</th><th>Position</th><th>Shop ID</th><th>Monthly Salary</th><th>Join Date</th><th>Actions</th></tr></thead><tbody>'
+    for emp in employees:
+        content += f'<tr><td>{emp["id"]}</td><td>{emp["name"]}</td><td>{emp["role"]}</td><td>{emp["position"]}</td><td>{emp["shop_id"]}</td><td>{emp["monthly_salary"]}</td><td>{emp["join_date"]}</td><td><a class="btn btn-sm btn-primary" href="{url_for(".edit_employee", id=emp["id"])}">Edit</a> <a class="btn btn-sm btn-danger" href="{url_for(".delete_employee", id=emp["id"])}">Delete</a></td></tr>'
+    content += '</tbody></table>'
+    shops = execute_read_query("SELECT id, name FROM Shops", fetchall=True)
+    shop_options = ''.join([f'<option value="{s["id"]}">{s["name"]}</option>' for s in shops])
+    content += f'''
+    <h3>Add Employee</h3>
+    <form method="POST" action="{url_for(".add_employee")}" class="row g-3">{idempotency_field()}
+        <div class="col-md-3"><label class="form-label">Name</label><input name="name" class="form-control" required></div>
+        <div class="col-md-3"><label class="form-label">Role</label><input name="role" class="form-control"></div>
+        <div class="col-md-3"><label class="form-label">Position</label><input name="position" class="form-control"></div>
+        <div class="col-md-3"><label class="form-label">Shop</label><select name="shop_id" class="form-select"><option value="">None</option>{shop_options}</select></div>
+        <div class="col-md-3"><label class="form-label">Monthly Salary</label><input name="monthly_salary" type="number" class="form-control"></div>
+        <div class="col-md-3"><label class="form-label">Join Date</label><input name="join_date" type="date" class="form-control" value="{date.today()}"></div>
+        <div class="col-12"><button type="submit" class="btn btn-primary">Add</button></div>
+    </form>
+    '''
+    return render_page(content)
+
+@bp.route('/add_employee', methods=['POST'])
+def add_employee():
+    name = request.form['name']
+    role = request.form['role']
+    position = request.form['position']
+    shop_id = request.form['shop_id'] or None
+    monthly_salary = request.form['monthly_salary'] or None
+    join_date = request.form.get('join_date') or None
+    run_operation(Repositories.insert_record, 'Employees',
+                  {'name': name, 'role': role, 'position': position, 'shop_id': shop_id,
+                   'monthly_salary': monthly_salary, 'join_date': join_date})
+    flash('Employee added')
+    return redirect(url_for('.list_employees'))
+
+@bp.route('/edit_employee/<int:id>', methods=['GET', 'POST'])
+def edit_employee(id):
+    if request.method == 'POST':
+        name = request.form['name']
+        role = request.form['role']
+        position = request.form['position']
+        shop_id = request.form['shop_id'] or None
+        monthly_salary = request.form['monthly_salary'] or None
+        join_date = request.form.get('join_date') or None
+        run_operation(Repositories.update_record, 'Employees', id,
+                      {'name': name, 'role': role, 'position': position, 'shop_id': shop_id,
+                       'monthly_salary': monthly_salary, 'join_date': join_date})
+        flash('Employee updated')
+        return redirect(url_for('.list_employees'))
+    employee = get_record('Employees', id)
+    shops = execute_query("SELECT id, name FROM Shops", fetchall=True)
+    shop_options = ''.join([f'<option value="{s["id"]}" {"selected" if s["id"] == employee["shop_id"] else ""}>{s["name"]}</option>' for s in shops])
+    content = f'''
+    <h2 class="mt-4">Edit Employee</h2>
+    <form method="POST" class="row g-3">{idempotency_field()}
+        <div class="col-md-3"><label class="form-label">Name</label><input name="name" class="form-control" value="{employee["name"]}" required></div>
+        <div class="col-md-3"><label class="form-label">Role</label><input name="role" class="form-control" value="{employee["role"]}"></div>
+        <div class="col-md-3"><label class="form-label">Position</label><input name="position" class="form-control" value="{employee["position"]}"></div>
+        <div class="col-md-3"><label class="form-label">Shop</label><select name="shop_id" class="form-select"><option value="">None</option>{shop_options}</select></div>
+        <div class="col-md-3"><label class="form-label">Monthly Salary</label><input name="monthly_salary" type="number" class="form-control" value="{employee["monthly_salary"]}"></div>
+        <div class="col-md-3"><label class="form-label">Join Date</label><input name="join_date" type="date" class="form-control" value="{employee["join_date"] or ""}"></div>
+        <div class="col-12"><button type="submit" class="btn btn-primary">Update</button></div>
+    </form>
+    '''
+    content += audit_history('Employees', id)
+    return render_page(content)
+
+@bp.route('/delete_employee/<int:id>')
+def delete_employee(id):
+    archive_record('Employees', id, 'Employee')
+    return redirect(url_for('.list_employees'))
+
+# Shops
+@export_source('shops')
+def shop_rows(conn, args):
+    return conn.execute("SELECT * FROM Shops")
+
+@bp.route('/shops/list', methods=['GET'])
+def list_shops():
+    shops = page_rows('shops')
+    content = '<h2 class="mt-4">Manage Shops</h2>' + export_links('shops') + '<table class="table table-striped table-hover"><thead><tr><th>ID</th><th>Name</th><th>Type</th><th>Location</th><th>Actions</th></tr></thead><tbody>'
+    for shop in shops:
+        content += f'<tr><td>{shop["id"]}</td><td>{shop["name"]}</td><td>{shop["type"]}</td><td>{shop["location"]}</td><td><a class="btn btn-sm btn-primary" href="{url_for(".edit_shop", id=shop["id"])}">Edit</a> <a class="btn btn-sm btn-danger" href="{url_for(".delete_shop", id=shop["id"])}">Delete</a></td></tr>'
+    content += '</tbody></table>'
+    content += f'''
+    <h3>Add Shop</h3>
+    <form method="POST" action="{url_for(".add_shop")}" class="row g-3">{idempotency_field()}
+        <div class="col-md-4"><label class="form-label">Name</label><input name="name" class="form-control" required></div>
+        <div class="col-md-4"><label class="form-label">Type</label><select name="type" class="form-select"><option value="general">General</option><option value="milk_focused">Milk Focused</option></select></div>
+        <div class="col-md-4"><label class="form-label">Location</label><input name="location" class="form-control"></div>
+        <div class="col-12"><button type="submit" class="btn btn-primary">Add</button></div>
+    </form>
+    '''
+    return render_page(content)
+
+@bp.route('/add_shop', methods=['POST'])
+def add_shop():
+    name = request.form['name']
+    type_ = request.form['type']
+    location = request.form['location']
+    run_operation(Repositories.insert_record, 'Shops', {'name': name, 'type': type_, 'location': location})
+    flash('Shop added')
+    return redirect(url_for('.list_shops'))
+
+@bp.route('/edit_shop/<int:id>', methods=['GET', 'POST'])
+def edit_shop(id):
+    if request.method == 'POST':
+        name = request.form['name']
+        type_ = request.form['type']
+        location = request.form['location']
+        run_operation(Repositories.update_record, 'Shops', id, {'name': name, 'type': type_, 'location': location})
+        flash('Shop updated')
+        return redirect(url_for('.list_shops'))
+    shop = get_record('Shops', id)
+    content = f'''
+    <h2 class="mt-4">Edit Shop</h2>
+    <form method="POST" class="row g-3">{idempotency_field()}
+        <div class="col-md-4"><label class="form-label">Name</label><input name="name" class="form-control" value="{shop["name"]}" required></div>
+        <div class="col-md-4"><label class="form-label">Type</label><select name="type" class="form-select"><option value="general" {"selected" if shop["type"] == "general" else ""}>General</option><option value="milk_focused" {"selected" if shop["type"] == "milk_focused" else ""}>Milk Focused</option></select></div>
+        <div class="col-md-4"><label class="form-label">Location</label><input name="location" class="form-control" value="{shop["location"]}"></div>
+        <div class="col-12"><button type="submit" class="btn btn-primary">Update</button></div>
+    </form>
+    '''
+    content += audit_history('Shops', id)
+    return render_page(content)
+
+@bp.route('/delete_shop/<int:id>')
+def delete_shop(id):
+    archive_record('Shops', id, 'Shop')
+    return redirect(url_for('.list_shops'))
+
+# Expenses
+@export_source('expenses')
+def expense_rows(conn, args):
+    return conn.execute("SELECT e.id, e.date, s.name AS shop, c.name AS category, e.description, e.amount FROM Expenses e JOIN Shops s ON e.shop_id = s.id LEFT JOIN ExpenseCategories c ON e.category_id = c.id")
+
+@bp.route('/expenses', methods=['GET'])
+def list_expenses():
+    expenses = page_rows('expenses')
+    content = '<h2 class="mt-4">Manage Expenses</h2>' + export_links('expenses') + '<table class="table table-striped table-hover"><thead><tr><th>ID</th><th>Date</th><th>Shop</th><th>Category</th><th>Description</th><th>Amount</th><th>Actions</th></tr></thead><tbody>'
+    for exp in expenses:
+        content += f'<tr><td>{exp["id"]}</td><td>{exp["date"]}</td><td>{exp["shop"]}</td><td>{exp["category"] or Profitability.UNCATEGORIZED}</td><td>{exp["description"]}</td><td>{exp["amount"]}</td><td><a class="btn btn-sm btn-primary" href="{url_for(".edit_expense", id=exp["id"])}">Edit</a> <a class="btn btn-sm btn-danger" href="{url_for(".delete_expense", id=exp["id"])}">Delete</a></td></tr>'
+    content += '</tbody></table>'
+    shops = execute_read_query("SELECT id, name FROM Shops", fetchall=True)
+    shop_options = ''.join([f'<option value="{s["id"]}">{s["name"]}</option>' for s in shops])
+    categories = execute_read_query("SELECT id, name FROM ExpenseCategories ORDER BY name", fetchall=True)
+    category_options = '<option value="">Uncategorized</option>' + ''.join([f'<option value="{c["id"]}">{c["name"]}</option>' for c in categories])
+    content += f'''
+    <h3>Add Expense</h3>
+    <form method="POST" action="{url_for(".add_expense")}" class="row g-3">{idempotency_field()}
+        <div class="col-md-4"><label class="form-label">Date</label><input name="date" type="date" class="form-control" value="{date.today()}" required></div>
+        <div class="col-md-4"><label class="form-label">Shop</label><select name="shop_id" class="form-select">{shop_options}</select></div>
+        <div class="col-md-4"><label class="form-label">Category</label><select name="category_id" class="form-select">{category_options}</select></div>
+        <div class="col-md-4"><label class="form-label">Description</label><input name="description" class="form-control"></div>
+        <div class="col-md-4"><label class="form-label">Amount</label><input name="amount" type="number" step="0.01" class="form-control" required></div>
+        <div class="col-12"><button type="submit" class="btn btn-primary">Add</button></div>
+    </form>
+    <h3 class="mt-4">Add Category</h3>
+    <form method="POST" action="{url_for(".add_expense_category")}" class="d-flex gap-2">{idempotency_field()}
+        <input name="name" class="form-control" style="max-width: 20rem" required>
+        <button type="submit" class="btn btn-secondary">Add</button>
+    </form>
+    '''
+    return render_page(content)
+
+@bp.route('/add_expense', methods=['POST'])
+def add_expense():
+    date_val = request.form['date']
+    shop_id = request.form['shop_id']
+    description = request.form['description']
+    amount = request.form['amount']
+    category_id = request.form.get('category_id') or None
+    run_operation(Repositories.insert_record, 'Expenses',
+                  {'date': date_val, 'shop_id': shop_id, 'description': description, 'amount': amount, 'category_id': category_id})
+    flash('Expense recorded')
+    return redirect(url_for('.list_expenses'))
+
+@bp.route('/add_expense_category', methods=['POST'])
+def add_expense_category():
+    execute_query("INSERT OR IGNORE INTO ExpenseCategories (name) VALUES (?)", (request.form['name'].strip(),))
+    flash('Expense category added')
+    return redirect(url_for('.list_expenses'))
+
+@bp.route('/edit_expense/<int:id>', methods=['GET', 'POST'])
+def edit_expense(id):
+    if request.method == 'POST':
+        date_val = request.form['date']
+        shop_id = request.form['shop_id']
+        description = request.form['description']
+        amount = request.form['amount']
+        category_id = request.form.get('category_id') or None
+        run_operation(Repositories.update_record, 'Expenses', id,
+                      {'date': date_val, 'shop_id': shop_id, 'description': description, 'amount': amount, 'category_id': category_id})
+        flash('Expense updated')
+        return redirect(url_for('.list_expenses'))
+    expense = get_record('Expenses', id)
+    shops = execute_query("SELECT id, name FROM Shops", fetchall=True)
+    shop_options = ''.join([f'<option value="{s["id"]}" {"selected" if s["id"] == expense["shop_id"] else ""}>{s["name"]}</option>' for s in shops])
+    categories = execute_query("SELECT id, name FROM ExpenseCategories ORDER BY name", fetchall=True)
+    category_options = '<option value="">Uncategorized</option>' + ''.join([f'<option value="{c["id"]}" {"selected" if c["id"] == expense["category_id"] else ""}>{c["name"]}</option>' for c in categories])
+    content = f'''
+    <h2 class="mt-4">Edit Expense</h2>
+    <form method="POST" class="row g-3">{idempotency_field()}
+        <div class="col-md-4"><label class="form-label">Date</label><input name="date" type="date" class="form-control" value="{expense["date"]}" required></div>
+        <div class="col-md-4"><label class="form-label">Shop</label><select name="shop_id" class="form-select">{shop_options}</select></div>
+        <div class="col-md-4"><label class="form-label">Category</label><select name="category_id" class="form-select">{category_options}</select></div>
+        <div class="col-md-4"><label class="form-label">Description</label><input name="description" class="form-control" value="{expense["description"]}"></div>
+        <div class="col-md-4"><label class="form-label">Amount</label><input name="amount" type="number" step="0.01" class="form-control" value="{expense["amount"]}" required></div>
+        <div class="col-12"><button type="submit" class="btn btn-primary">Update</button></div>
+    </form>
+    '''
+    content += audit_history('Expenses', id)
+    return render_page(content)
+
+@bp.route('/delete_expense/<int:id>')
+def delete_expense(id):
+    run_operation(Repositories.delete_record, 'Expenses', id)
+    flash('Expense deleted')
+    return redirect(url_for('.list_expenses'))
+
+# Salaries
+@export_source('salaries')
+def salary_rows(conn, args):
+    return conn.execute("SELECT s.id, s.date, s.period, e.name AS employee, s.amount_paid FROM Salaries s JOIN Employees e ON s.employee_id = e.id")
+
+@bp.route('/salaries', methods=['GET'])
+def list_salaries():
+    salaries = page_rows('salaries')
+    content = '<h2 class="mt-4">Manage Salaries</h2>' + export_links('salaries') + '<table class="table table-striped table-hover"><thead><tr><th>ID</th><th>Date</th><th>For Period</th><th>Employee</th><th>Amount Paid</th><th>Actions</th></tr></thead><tbody>'
+    for sal in salaries:
+        content += f'<tr><td>{sal["id"]}</td><td>{sal["date"]}</td><td>{sal["period"] or ""}</td><td>{sal["employee"]}</td><td>{sal["amount_paid"]}</td><td><a class="btn btn-sm btn-primary" href="{url_for(".edit_salary", id=sal["id"])}">Edit</a> <a class="btn btn-sm btn-danger" href="{url_for(".delete_salary", id=sal["id"])}">Delete</a></td></tr>'
+    content += '</tbody></table>'
+    employees = execute_read_query("SELECT id, name FROM Employees", fetchall=True)
+    emp_options = ''.join([f'<option value="{e["id"]}">{e["name"]}</option>' for e in employees])
+    content += f'''
+    <h3>Add Salary</h3>
+    <form method="POST" action="{url_for(".add_salary")}" class="row g-3">{idempotency_field()}
+        <div class="col-md-3"><label class="form-label">Date</label><input name="date" type="date" class="form-control" value="{date.today()}" required></div>
+        <div class="col-md-3"><label class="form-label">For Period</label><input name="period" type="month" class="form-control" placeholder="month of the date"></div>
+        <div class="col-md-3"><label class="form-label">Employee</label><select name="employee_id" class="form-select">{emp_options}</select></div>
+        <div class="col-md-3"><label class="form-label">Amount Paid</label><input name="amount_paid" type="number" step="0.01" class="form-control" required></div>
+        <div class="col-12"><button type="submit" class="btn btn-primary">Add</button></div>
+    </form>
+    '''
+    return render_page(content)
+
+@bp.route('/add_salary', methods=['POST'])
+def add_salary():
+    date_val = request.form['date']
+    employee_id = request.form['employee_id']
+    amount_paid = request.form['amount_paid']
+    period = request.form.get('period') or None
+    run_operation(Repositories.insert_record, 'Salaries',
+                  {'date': date_val, 'employee_id': employee_id, 'amount_paid': amount_paid, 'period': period})
+    flash('Salary recorded')
+    return redirect(url_for('.list_salaries'))
+
+@bp.route('/edit_salary/<int:id>', methods=['GET', 'POST'])
+def edit_salary(id):
+    if request.method == 'POST':
+        date_val = request.form['date']
+        employee_id = request.form['employee_id']
+        amount_paid = request.form['amount_paid']
+        period = request.form.get('period') or None
+        run_operation(Repositories.update_record, 'Salaries', id,
+                      {'date': date_val, 'employee_id': employee_id, 'amount_paid': amount_paid, 'period': period})
+        flash('Salary updated')
+        return redirect(url_for('.list_salaries'))
+    salary = get_record('Salaries', id)
+    employees = execute_query("SELECT id, name FROM Employees", fetchall=True)
+    emp_options = ''.join([f'<option value="{e["id"]}" {"selected" if e["id"] == salary["employee_id"] else ""}>{e["name"]}</option>' for e in employees])
+    content = f'''
+    <h2 class="mt-4">Edit Salary</h2>
+    <form method="POST" class="row g-3">{idempotency_field()}
+        <div class="col-md-3"><label class="form-label">Date</label><input name="date" type="date" class="form-control" value="{salary["date"]}" required></div>
+        <div class="col-md-3"><label class="form-label">For Period</label><input name="period" type="month" class="form-control" value="{salary["period"] or ""}"></div>
+        <div class="col-md-3"><label class="form-label">Employee</label><select name="employee_id" class="form-select">{emp_options}</select></div>
+        <div class="col-md-3"><label class="form-label">Amount Paid</label><input name="amount_paid" type="number" step="0.01" class="form-control" value="{salary["amount_paid"]}" required></div>
+        <div class="col-12"><button type="submit" class="btn btn-primary">Update</button></div>
+    </form>
+    '''
+    content += audit_history('Salaries', id)
+    return render_page(content)
+
+@bp.route('/delete_salary/<int:id>')
+def delete_salary(id):
+    run_operation(Repositories.delete_record, 'Salaries', id)
+    flash('Salary deleted')
+    return redirect(url_for('.list_salaries'))
+
+# Payroll
+def payroll_period(args):
+    return args.get('period') or date.today().strftime('%Y-%m')
+
+@export_source('payroll')
+def payroll_rows(conn, args):
+    return Payroll.preview_payroll(conn, payroll_period(args))
+
+@bp.route('/payroll', methods=['GET'])
+def payroll():
+    period = payroll_period(request.args)
+    rows = page_rows('payroll')
+    conn = get_db_connection()
+    try:
+        run = Payroll.get_payroll_run(conn, period)
+    finally:
+        conn.close()
+    content = f'''
+    <h2 class="mt-4">Payroll</h2>
+    <form method="GET" class="row g-3 mb-3">
+        <div class="col-md-4"><label class="form-label">Period</label><input name="period" type="month" class="form-control" value="{period}" required></div>
+        <div class="col-12"><button type="submit" class="btn btn-secondary">Preview</button></div>
+    </form>
+    '''
+    if run:
+        content += f'<div class="alert alert-success">Payroll for {period} was run on {run["run_at"]}: {run["employees"]} payments, total {run["total"]}.</div>'
+    content += export_links('payroll')
+    content += '<table class="table table-striped table-hover"><thead><tr><th>Employee</th><th>Monthly Salary</th><th>Days Worked</th><th>Pro-rated</th><th>Already Paid</th><th>Due</th></tr></thead><tbody>'
+    for row in rows:
+        content += f'<tr><td>{row["name"]}</td><td>{row["monthly_salary"]}</td><td>{row["days_worked"]}/{row["days_in_month"]}</td><td>{row["prorated"]}</td><td>{row["already_paid"]}</td><td>{row["due"]}</td></tr>'
+    content += '</tbody></table>'
+    total_due = sum(row['due'] for row in rows)
+    if not run:
+        content += f'''
+        <form method="POST" action="{url_for(".run_payroll")}">{idempotency_field()}
+            <input type="hidden" name="period" value="{period}">
+            <button type="submit" class="btn btn-primary">Pay {total_due} for {period}</button>
+        </form>
+        '''
+    return render_page(content)
+
+@bp.route('/run_payroll', methods=['POST'])
+def run_payroll():
+    period = request.form['period']
+    created, run = run_operation(Payroll.run_payroll, period)
+    if created:
+        flash(f'Payroll for {period} recorded: {run["employees"]} payments, total {run["total"]}')
+    else:
+        flash(f'Payroll for {period} was already run on {run["run_at"]}')
+    return redirect(url_for('.payroll', period=period))
+
+# Archive: records deleted together with their history, restorable
+@export_source('archive')
+def archive_rows(conn, args):
+    return Archive.list_batches(conn)
+
+@bp.route('/archive', methods=['GET'])
+def list_archive():
+    batches = page_rows('archive')
+    content = '<h2 class="mt-4">Archive</h2>'
+    if not batches:
+        content += '<p>Nothing has been archived.</p>'
+        return render_page(content)
+    content += export_links('archive')
+    content += '<table class="table table-striped table-hover"><thead><tr><th>Archived At</th><th>Record</th><th>Rows</th><th>Actions</th></tr></thead><tbody>'
+    for batch in batches:
+        action = ''
+        if batch['table_name']:
+            action = f'<form method="POST" action="{url_for(".restore_archive", id=batch["id"])}">{idempotency_field()}<button type="submit" class="btn btn-sm btn-secondary">Restore</button></form>'
+        content += f'<tr><td>{batch["archived_at"]}</td><td>{batch["label"]}</td><td>{batch["rows"]}</td><td>{action}</td></tr>'
+    content += '</tbody></table>'
+    return render_page(content)
+
+@bp.route('/restore_archive/<int:id>', methods=['POST'])
+def restore_archive(id):
+    restored = run_operation(Archive.restore_batch, id)
+    flash(f'Restored {restored} records')
+    return redirect(url_for('.list_archive'))
+
+# Customers
+@export_source('customers')
+def customer_rows(conn, args):
+    return conn.execute("SELECT c.*, IFNULL(a.balance, 0) AS balance, a.credit_limit FROM Customers c LEFT JOIN CustomerAccounts a ON a.customer_id = c.id")
+
+@bp.route('/customers/list', methods=['GET'])
+def list_customers():
+    customers = page_rows('customers')
+    content = '<h2 class="mt-4">Manage Customers</h2>' + export_links('customers') + '<table class="table table-striped table-hover"><thead><tr><th>ID</th><th>Name</th><th>Contact</th><th>Address</th><th>Balance</th><th>Credit Limit</th><th>Actions</th></tr></thead><tbody>'
+    for cust in customers:
+        credit_limit = cust["credit_limit"] if cust["credit_limit"] is not None else ''
+        content += f'<tr><td>{cust["id"]}</td><td>{cust["name"]}</td><td>{cust["contact"]}</td><td>{cust["address"]}</td><td>{cust["balance"]:.2f}</td><td>{credit_limit}</td><td><a class="btn btn-sm btn-secondary" href="{url_for(".customer_account", id=cust["id"])}">Account</a> <a class="btn btn-sm btn-primary" href="{url_for(".edit_customer", id=cust["id"])}">Edit</a> <a class="btn btn-sm btn-danger" href="{url_for(".delete_customer", id=cust["id"])}">Delete</a></td></tr>'
+    content += '</tbody></table>'
+    content += f'''
+    <h3>Add Customer</h3>
+    <form method="POST" action="{url_for(".add_customer")}" class="row g-3">{idempotency_field()}
+        <div class="col-md-4"><label class="form-label">Name</label><input name="name" class="form-control" required></div>
+        <div class="col-md-4"><label class="form-label">Contact</label><input name="contact" class="form-control"></div>
+        <div class="col-md-4"><label class="form-label">Address</label><input name="address" class="form-control"></div>
+        <div class="col-12"><button type="submit" class="btn btn-primary">Add</button></div>
+    </form>
+    '''
+    return render_page(content)
+
+@bp.route('/add_customer', methods=['POST'])
+def add_customer():
+    name = request.form['name']
+    contact = request.form['contact']
+    address = request.form['address']
+    run_operation(Repositories.insert_record, 'Customers', {'name': name, 'contact': contact, 'address': address})
+    flash('Customer added')
+    return redirect(url_for('.list_customers'))
+
+@bp.route('/edit_customer/<int:id>', methods=['GET', 'POST'])
+def edit_customer(id):
+    if request.method == 'POST':
+        name = request.form['name']
+        contact = request.form['contact']
+        address = request.form['address']
+        run_operation(Repositories.update_record, 'Customers', id, {'name': name, 'contact': contact, 'address': address})
+        flash('Customer updated')
+        return redirect(url_for('.list_customers'))
+    customer = get_record('Customers', id)
+    content = f'''
+    <h2 class="mt-4">Edit Customer</h2>
+    <form method="POST" class="row g-3">{idempotency_field()}
+        <div class="col-md-4"><label class="form-label">Name</label><input name="name" class="form-control" value="{customer["name"]}" required></div>
+        <div class="col-md-4"><label class="form-label">Contact</label><input name="contact" class="form-control" value="{customer["contact"]}"></div>
+        <div class="col-md-4"><label class="form-label">Address</label><input name="address" class="form-control" value="{customer["address"]}"></div>
+        <div class="col-12"><button type="submit" class="btn btn-primary">Update</button></div>
+    </form>
+    '''
+    content += audit_history('Customers', id)
+    return render_page(content)
+
+@bp.route('/delete_customer/<int:id>')
+def delete_customer(id):
+    archive_record('Customers', id, 'Customer')
+    return redirect(url_for('.list_customers'))
+
+# Customer accounts: statement, credit limit and payments (see Accounts.py)
+# The statement as rows, opening balance first
+@export_source('statement')
+def statement_rows(conn, args):
+    opening, lines = Accounts.statement(conn, args.get('id', type=int))
+    rows = [{'date': None, 'entry': 'Brought forward', 'amount': None, 'balance': opening}]
+    rows += [{'date': line_date, 'entry': f'{kind.capitalize()} #{entry_id}', 'amount': amount, 'balance': running}
+             for line_date, kind, entry_id, amount, running in lines]
+    return rows
+
+@bp.route('/customer_account/<int:id>')
+def customer_account(id):
+    customer = get_record('Customers', id)
+    account = execute_query("SELECT * FROM CustomerAccounts WHERE customer_id=?", (id,), fetchone=True)
+    conn = get_db_connection()
+    try:
+        opening, lines = Accounts.statement(conn, id)
+    finally:
+        conn.close()
+    balance = account["balance"] if account else 0.0
+    credit_limit = account["credit_limit"] if account and account["credit_limit"] is not None else ''
+    content = f'''
+    <h2 class="mt-4">Account: {customer["name"]}</h2>
+    <p>Balance owed: <strong>{balance:.2f}</strong>{f" of {credit_limit:.2f} credit" if credit_limit != '' else ""}</p>
+    <form method="POST" action="{url_for(".set_credit_limit", id=id)}" class="d-flex gap-2 mb-3">{idempotency_field()}
+        <input name="credit_limit" type="number" step="0.01" class="form-control" style="max-width: 12rem" value="{credit_limit}" placeholder="No limit">
+        <button type="submit" class="btn btn-sm btn-primary">Set credit limit</button>
+    </form>
+    {export_links('statement', id=id)}
+    <table class="table table-striped table-hover">
+        <thead><tr><th>Date</th><th>Entry</th><th>Amount</th><th>Balance</th></tr></thead>
+        <tbody>
+        <tr><td></td><td>Brought forward</td><td></td><td>{opening:.2f}</td></tr>
+    '''
+    for line_date, kind, entry_id, amount, running in lines:
+        content += f'<tr><td>{line_date}</td><td>{kind.capitalize()} #{entry_id}</td><td>{amount:.2f}</td><td>{running:.2f}</td></tr>'
+    content += '</tbody></table>'
+    return render_page(content)
+
+@bp.route('/set_credit_limit/<int:id>', methods=['POST'])
+def set_credit_limit(id):
+    credit_limit = request.form['credit_limit']
+    run_operation(Accounts.set_credit_limit, id, float(credit_limit) if credit_limit else None)
+    flash('Credit limit saved')
+    return redirect(url_for('.customer_account', id=id))
+
+@export_source('payments')
+def payment_rows(conn, args):
+    return Accounts.list_payments(conn)
+
+@bp.route('/payments')
+def list_payments():
+    payments = page_rows('payments')
+    content = '<h2 class="mt-4">Customer Payments</h2>' + export_links('payments') + '<table class="table table-striped table-hover"><thead><tr><th>ID</th><th>Date</th><th>Customer</th><th>Amount</th><th>Method</th><th>Reference</th><th>Actions</th></tr></thead><tbody>'
+    for payment in payments:
+        content += f'<tr><td>{payment[0]}</td><td>{payment[1]}</td><td><a href="{url_for(".customer_account", id=payment[2])}">{payment[3]}</a></td><td>{payment[4]:.2f}</td><td>{payment[5] or ""}</td><td>{payment[6] or ""}</td><td><a class="btn btn-sm btn-danger" href="{url_for(".delete_payment", id=payment[0])}">Delete</a></td></tr>'
+    content += '</tbody></table>'
+    customers = execute_read_query("SELECT c.id, c.name, IFNULL(a.balance, 0) AS balance FROM Customers c LEFT JOIN CustomerAccounts a ON a.customer_id = c.id", fetchall=True)
+    cust_options = ''.join([f'<option value="{c["id"]}">{c["name"]} (owes {c["balance"]:.2f})</option>' for c in customers])
+    content += f'''
+    <h3>Record Payment</h3>
+    <form method="POST" action="{url_for(".add_payment")}" class="row g-3">{idempotency_field()}
+        <div class="col-md-2"><label class="form-label">Date</label><input name="date" type="date" class="form-control" value="{date.today()}" required></div>
+        <div class="col-md-4"><label class="form-label">Customer</label><select name="customer_id" class="form-select">{cust_options}</select></div>
+        <div class="col-md-2"><label class="form-label">Amount</label><input name="amount" type="number" step="0.01" class="form-control" required></div>
+        <div class="col-md-2"><label class="form-label">Method</label><select name="method" class="form-select"><option>Cash</option><option>Bank transfer</option><option>Mobile money</option><option>Cheque</option></select></div>
+        <div class="col-md-2"><label class="form-label">Reference</label><input name="reference" class="form-control"></div>
+        <div class="col-12"><button type="submit" class="btn btn-primary">Record</button></div>
+    </form>
+    '''
+    return render_page(content)
+
+@bp.route('/add_payment', methods=['POST'])
+def add_payment():
+    run_operation(Accounts.record_payment, request.form['customer_id'], request.form['date'],
+                  float(request.form['amount']), request.form.get('method'), request.form.get('reference') or None)
+    flash('Payment recorded')
+    return redirect(url_for('.list_payments'))
+
+@bp.route('/delete_payment/<int:id>')
+def delete_payment(id):
+    run_operation(Accounts.delete_payment, id)
+    flash('Payment deleted')
+    return redirect(url_for('.list_payments'))
+
+# Price list (see Pricing.py)
+def price_date(args):
+    return args.get('date') or date.today().isoformat()
+
+@export_source('prices')
+def price_rows(conn, args):
+    return Pricing.current_prices(conn, price_date(args))
+
+@bp.route('/prices')
+def list_prices():
+    on_date = price_date(request.args)
+    prices = page_rows('prices')
+    conn = get_db_connection()
+    try:
+        upcoming = conn.execute("SELECT COUNT(*) FROM PriceList WHERE effective_from > ?", (on_date,)).fetchone()[0]
+    finally:
+        conn.close()
+    content = f'''
+    <h2 class="mt-4">Price List</h2>
+    <form method="GET" class="d-flex gap-2 mb-3">
+        <input name="date" type="date" class="form-control" style="max-width: 12rem" value="{on_date}">
+        <button type="submit" class="btn btn-sm btn-secondary">Prices on date</button>
+    </form>
+    <p>{len(prices)} prices in force on {on_date}; {upcoming} scheduled after it.</p>
+    {export_links('prices')}
+    <table class="table table-striped table-hover"><thead><tr><th>Product</th><th>Shop</th><th>Customer</th><th>Unit Price</th><th>Effective From</th><th>Actions</th></tr></thead><tbody>
+    '''
+    for price in prices:
+        content += f'<tr><td>{price["product_name"]}</td><td>{price["shop"] or "All shops"}</td><td>{price["customer"] or "All customers"}</td><td>{price["unit_price"]:.2f}</td><td>{price["effective_from"]}</td><td><a class="btn btn-sm btn-danger" href="{url_for(".delete_price", id=price["id"])}">Delete</a></td></tr>'
+    content += '</tbody></table>'
+    products = execute_read_query("SELECT id, product_name, category FROM Products", fetchall=True)
+    shops = execute_read_query("SELECT id, name FROM Shops", fetchall=True)
+    customers = execute_read_query("SELECT id, name FROM Customers", fetchall=True)
+    prod_options = ''.join([f'<option value="{p["id"]}">{p["product_name"]}</option>' for p in products])
+    shop_options = '<option value="">All shops</option>' + ''.join([f'<option value="{s["id"]}">{s["name"]}</option>' for s in shops])
+    cust_options = '<option value="">All customers</option>' + ''.join([f'<option value="{c["id"]}">{c["name"]}</option>' for c in customers])
+    categories = sorted({p["category"] for p in products if p["category"]})
+    category_options = '<option value="">All categories</option>' + ''.join([f'<option>{c}</option>' for c in categories])
+    content += f'''
+    <h3>Set Price</h3>
+    <form method="POST" action="{url_for(".add_price")}" class="row g-3">{idempotency_field()}
+        <div class="col-md-3"><label class="form-label">Product</label><select name="product_id" class="form-select">{prod_options}</select></div>
+        <div class="col-md-2"><label class="form-label">Shop</label><select name="shop_id" class="form-select">{shop_options}</select></div>
+        <div class="col-md-3"><label class="form-label">Customer</label><select name="customer_id" class="form-select">{cust_options}</select></div>
+        <div class="col-md-2"><label class="form-label">Effective From</label><input name="effective_from" type="date" class="form-control" value="{date.today()}" required></div>
+        <div class="col-md-2"><label class="form-label">Unit Price</label><input name="unit_price" type="number" step="0.01" class="form-control" required></div>
+        <div class="col-12"><button type="submit" class="btn btn-primary">Save</button></div>
+    </form>
+    <h3 class="mt-4">Reprice</h3>
+    <form method="POST" action="{url_for(".reprice")}" class="row g-3">{idempotency_field()}
+        <div class="col-md-2"><label class="form-label">Effective From</label><input name="effective_from" type="date" class="form-control" value="{date.today()}" required></div>
+        <div class="col-md-2"><label class="form-label">Change %</label><input name="percent" type="number" step="0.01" class="form-control" value="0"></div>
+        <div class="col-md-2"><label class="form-label">Change Amount</label><input name="amount" type="number" step="0.01" class="form-control" value="0"></div>
+        <div class="col-md-3"><label class="form-label">Category</label><select name="category" class="form-select">{category_options}</select></div>
+        <div class="col-md-3"><label class="form-label">Shop</label><select name="shop_id" class="form-select">{shop_options}</select></div>
+        <div class="col-12"><button type="submit" class="btn btn-warning">Reprice</button></div>
+    </form>
+    '''
+    return render_page(content)
+
+@bp.route('/add_price', methods=['POST'])
+def add_price():
+    run_operation(Pricing.set_price, request.form['product_id'], request.form['effective_from'],
+                  float(request.form['unit_price']), request.form.get('shop_id'), request.form.get('customer_id'))
+    flash('Price saved')
+    return redirect(url_for('.list_prices'))
+
+@bp.route('/reprice', methods=['POST'])
+def reprice():
+    changed = run_operation(Pricing.bulk_reprice, request.form['effective_from'],
+                            float(request.form.get('percent') or 0), float(request.form.get('amount') or 0),
+                            None, request.form.get('shop_id') or None, request.form.get('category') or None)
+    flash(f'{changed} prices updated from {request.form["effective_from"]}')
+    return redirect(url_for('.list_prices', date=request.form['effective_from']))
+
+@bp.route('/delete_price/<int:id>')
+def delete_price(id):
+    run_operation(Pricing.delete_price, id)
+    flash('Price deleted')
+    return redirect(url_for('.list_prices'))
+
+# Sales
+@export_source('sales')
+def sale_rows(conn, args):
+    return conn.execute("SELECT s.id, s.date, c.name AS customer, sh.name AS shop, p.product_name, s.quantity, s.total_price FROM Sales s LEFT JOIN Customers c ON s.customer_id = c.id LEFT JOIN Shops sh ON s.shop_id = sh.id LEFT JOIN Products p ON s.product_id = p.id")
+
+@bp.route('/sales/list', methods=['GET'])
+def list_sales():
+    sales = page_rows('sales')
+    content = '<h2 class="mt-4">Manage Sales</h2>' + export_links('sales') + '<table class="table table-striped table-hover"><thead><tr><th>ID</th><th>Date</th><th>Customer</th><th>Shop</th><th>Product</th><th>Quantity</th><th>Total Price</th><th>Actions</th></tr></thead><tbody>'
+    for sale in sales:
+        content += f'<tr><td>{sale["id"]}</td><td>{sale["date"]}</td><td>{sale["customer"]}</td><td>{sale["shop"]}</td><td>{sale["product_name"]}</td><td>{sale["quantity"]}</td><td>{sale["total_price"]}</td><td><a class="btn btn-sm btn-primary" href="{url_for(".edit_sale", id=sale["id"])}">Edit</a> <a class="btn btn-sm btn-danger" href="{url_for(".delete_sale", id=sale["id"])}">Delete</a></td></tr>'
+    content += '</tbody></table>'
+    customers = execute_read_query("SELECT id, name FROM Customers", fetchall=True)
+    shops = execute_read_query("SELECT id, name FROM Shops", fetchall=True)
+    products = execute_read_query("SELECT id, product_name FROM Products", fetchall=True)
+    cust_options = ''.join([f'<option value="{c["id"]}">{c["name"]}</option>' for c in customers])
+    shop_options = ''.join([f'<option value="{s["id"]}">{s["name"]}</option>' for s in shops])
+    prod_options = ''.join([f'<option value="{p["id"]}">{p["product_name"]}</option>' for p in products])
+    content += f'''
+    <h3>Add Sale</h3>
+    <form method="POST" action="{url_for(".add_sale")}" class="row g-3">{idempotency_field()}
+        <div class="col-md-3"><label class="form-label">Date</label><input name="date" type="date" class="form-control" value="{date.today()}" required></div>
+        <div class="col-md-3"><label class="form-label">Customer</label><select name="customer_id" class="form-select">{cust_options}</select></div>
+        <div class="col-md-3"><label class="form-label">Shop</label><select name="shop_id" class="form-select">{shop_options}</select></div>
+        <div class="col-md-3"><label class="form-label">Product</label><select name="product_id" class="form-select">{prod_options}</select></div>
+        <div class="col-md-3"><label class="form-label">Quantity</label><input name="quantity" type="number" step="0.01" class="form-control" required></div>
+        <div class="col-md-3"><label class="form-label">Total Price</label><input name="total_price" type="number" step="0.01" class="form-control" placeholder="From price list"></div>
+        <div class="col-12"><button type="submit" class="btn btn-primary">Add</button></div>
+    </form>
+    '''
+    return render_page(content)
+
+@bp.route('/add_sale', methods=['POST'])
+def add_sale():
+    date_val = request.form['date']
+    customer_id = request.form['customer_id']
+    shop_id = request.form['shop_id']
+    product_id = request.form['product_id']
+    quantity = float(request.form['quantity'])
+    total_price = float(request.form['total_price']) if request.form.get('total_price') else None
+    try:
+        sale_id = run_operation(Repositories.record_sale, date_val, customer_id, shop_id, product_id, quantity, total_price)
+    except (Accounts.CreditLimitExceeded, Pricing.PriceNotFound) as e:
+        flash(str(e))
+        return redirect(url_for('.list_sales'))
+    if sale_id is None:
+        flash('Insufficient stock!')
+        return redirect(url_for('.list_sales'))
+    flash('Sale recorded and stock updated')
+    return redirect(url_for('.list_sales'))
+
+@bp.route('/edit_sale/<int:id>', methods=['GET', 'POST'])
+def edit_sale(id):
+    if request.method == 'POST':
+        date_val = request.form['date']
+        customer_id = request.form['customer_id']
+        shop_id = request.form['shop_id']
+        product_id = request.form['product_id']
+        quantity = float(request.form['quantity'])
+        total_price = float(request.form['total_price']) if request.form.get('total_price') else None
+        try:
+            updated = run_operation(Repositories.update_sale, id, date_val, customer_id, shop_id, product_id, quantity, total_price)
+        except (Accounts.CreditLimitExceeded, Pricing.PriceNotFound) as e:
+            flash(str(e))
+            return redirect(url_for('.list_sales'))
+        if not updated:
+            flash('Insufficient stock for update!')
+            return redirect(url_for('.list_sales'))
+        flash('Sale updated and stock adjusted')
+        return redirect(url_for('.list_sales'))
+    # The total is left blank so a changed quantity, product, customer or
+    # date is repriced; a total is only kept when it is entered again
+    sale = get_record('Sales', id)
+    customers = execute_query("SELECT id, name FROM Customers", fetchall=True)
+    shops = execute_query("SELECT id, name FROM Shops", fetchall=True)
+    products = execute_query("SELECT id, product_name FROM Products", fetchall=True)
+    cust_options = ''.join([f'<option value="{c["id"]}" {"selected" if c["id"] == sale["customer_id"] else ""}>{c["name"]}</option>' for c in customers])
+    shop_options = ''.join([f'<option value="{s["id"]}" {"selected" if s["id"] == sale["shop_id"] else ""}>{s["name"]}</option>' for s in shops])
+    prod_options = ''.join([f'<option value="{p["id"]}" {"selected" if p["id"] == sale["product_id"] else ""}>{p["product_name"]}</option>' for p in products])
+    content = f'''
+    <h2 class="mt-4">Edit Sale</h2>
+    <form method="POST" class="row g-3">{idempotency_field()}
+        <div class="col-md-3"><label class="form-label">Date</label><input name="date" type="date" class="form-control" value="{sale["date"]}" required></div>
+        <div class="col-md-3"><label class="form-label">Customer</label><select name="customer_id" class="form-select">{cust_options}</select></div>
+        <div class="col-md-3"><label class="form-label">Shop</label><select name="shop_id" class="form-select">{shop_options}</select></div>
+        <div class="col-md-3"><label class="form-label">Product</label><select name="product_id" class="form-select">{prod_options}</select></div>
+        <div class="col-md-3"><label class="form-label">Quantity</label><input name="quantity" type="number" step="0.01" class="form-control" value="{sale["quantity"]}" required></div>
+        <div class="col-md-3"><label class="form-label">Total Price</label><input name="total_price" type="number" step="0.01" class="form-control" placeholder="From price list (was {sale["total_price"]})"></div>
+        <div class="col-12"><button type="submit" class="btn btn-primary">Update</button></div>
+    </form>
+    '''
+    content += audit_history('Sales', id)
+    return render_page(content)
+@bp.route('/delete_sale/<int:id>')
+def delete_sale(id):
+    run_operation(Repositories.delete_sale, id, date.today())
+    flash('Sale deleted and stock updated')
+    return redirect(url_for('.list_sales'))
+
@@ -0,0 +1,131 @@
+import csv
+import io
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+# Streamed CSV and XLSX downloads. Rows are written as they come off the
+# cursor, BATCH_ROWS at a time, so an export holds one batch in memory
+# however many rows it has. XLSX is built with zipfile on an unseekable
+# sink: the sheet uses inline strings (no shared string table to
+# collect first) and is deflated as it is written.
+
+BATCH_ROWS = 1000
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+# Column names and rows of a cursor, or of a list of sqlite3.Row / dict rows
+def table(result):
+    if hasattr(result, 'description'):
+        return [d[0] for d in result.description], result
+    rows = list(result)
+    return (list(rows[0].keys()) if rows else []), rows
+
+def _values(row, columns):
+    if isinstance(row, dict):
+        return [row.get(column) for column in columns]
+    return row
+
+def csv_chunks(columns, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    count = 0
+    for row in rows:
+        writer.writerow(_values(row, columns))
+        count += 1
+        if count % BATCH_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+# Receives the zip as it is written; drained after every batch
+class _Sink:
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+_CONTENT_TYPES = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>
+<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>
+</Types>'''
+
+_RELS = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>
+</Relationships>'''
+
+_WORKBOOK = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">
+<sheets><sheet name="{name}" sheetId="1" r:id="rId1"/></sheets>
+</workbook>'''
+
+_WORKBOOK_RELS = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>
+</Relationships>'''
+
+# Characters XML 1.0 does not allow, even escaped
+_INVALID_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+def _cell(value):
+    if value is None:
+        return '<c/>'
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f'<c><v>{value!r}</v></c>'
+    if isinstance(value, bytes):
+        value = value.hex()
+    text = escape(_INVALID_XML.sub('', str(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+def _row(values):
+    return '<row>' + ''.join(_cell(value) for value in values) + '</row>'
+
+def _sheet_name(name):
+    return re.sub(r'[\[\]:*?/\\]', ' ', name)[:31] or 'Sheet1'
+
+def xlsx_chunks(columns, rows, sheet='Sheet1'):
+    sink = _Sink()
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED) as book:
+        book.writestr('[Content_Types].xml', _CONTENT_TYPES)
+        book.writestr('_rels/.rels', _RELS)
+        book.writestr('xl/workbook.xml', _WORKBOOK.format(name=escape(_sheet_name(sheet), {'"': '&quot;'})))
+        book.writestr('xl/_rels/workbook.xml.rels', _WORKBOOK_RELS)
+        with book.open('xl/worksheets/sheet1.xml', 'w') as part:
+            part.write(b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                       b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>')
+            part.write(_row(columns).encode())
+            batch = []
+            for row in rows:
+                batch.append(_row(_values(row, columns)))
+                if len(batch) == BATCH_ROWS:
+                    part.write(''.join(batch).encode())
+                    batch = []
+                    yield sink.drain()
+            part.write(''.join(batch).encode())
+            part.write(b'</sheetData></worksheet>')
+    yield sink.drain()
+
+# Chunks (str for CSV, bytes for XLSX) of one export
+def chunks(fmt, columns, rows, title='Sheet1'):
+    if fmt == 'xlsx':
+        return xlsx_chunks(columns, rows, title)
+    return csv_chunks(columns, rows)
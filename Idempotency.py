@@ -0,0 +1,65 @@
+import time
+
+# Idempotency keys for write requests. Each form carries a one-time key
+# (clients can send an Idempotency-Key header instead); the key is claimed
+# inside the write transaction, so a resubmitted or retried request finds
+# it already taken and writes nothing. Keys expire after idempotency_ttl
+# seconds and are purged by the maintenance pass.
+
+# Longest key accepted; a UUID is 32 hex digits
+MAX_KEY_LENGTH = 64
+
+class DuplicateRequest(Exception):
+    pass
+
+# Raised by a claimed operation that changed nothing (e.g. a sale refused
+# for lack of stock), so the transaction rolls the claim back and the same
+# key can be submitted again once the problem is fixed. `result` is what
+# the operation returned.
+class NothingWritten(Exception):
+    def __init__(self, result):
+        super().__init__(result)
+        self.result = result
+
+def ensure_idempotency_schema(conn):
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS IdempotencyKeys (
+        key TEXT PRIMARY KEY,
+        expires_at REAL NOT NULL
+    ) WITHOUT ROWID
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_idempotency_expires ON IdempotencyKeys (expires_at)')
+
+# Claim `key` on the caller's write transaction. Returns False when it was
+# already claimed and has not expired; an expired key can be claimed again.
+def claim(conn, key, ttl, now=None):
+    now = now if now is not None else time.time()
+    return conn.execute('''
+    INSERT INTO IdempotencyKeys (key, expires_at) VALUES (?, ?)
+    ON CONFLICT (key) DO UPDATE SET expires_at = excluded.expires_at WHERE expires_at < ?
+    ''', (key, now + ttl, now)).rowcount == 1
+
+# Run operation(conn, *args) only if `key` is unclaimed; raises
+# DuplicateRequest (before writing anything) otherwise. Meant to be run
+# inside Contention.run_transaction, which rolls the claim back on failure.
+# A key is only kept when the operation wrote something: otherwise
+# NothingWritten is raised to roll the claim back.
+def claimed(key, ttl, operation):
+    def run(conn, *args):
+        if not claim(conn, key, ttl):
+            raise DuplicateRequest(key)
+        before = conn.total_changes
+        result = operation(conn, *args)
+        if conn.total_changes == before:
+            raise NothingWritten(result)
+        return result
+    return run
+
+# Delete up to `limit` expired keys. Returns the number deleted.
+def purge_expired(conn, now=None, limit=5000):
+    now = now if now is not None else time.time()
+    with conn:
+        return conn.execute('''
+        DELETE FROM IdempotencyKeys WHERE key IN (
+            SELECT key FROM IdempotencyKeys WHERE expires_at < ? LIMIT ?)
+        ''', (now, limit)).rowcount
@@ -0,0 +1,226 @@
+import http.client
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from datetime import date
+from urllib.parse import urlencode, urlsplit
+import Config
+
+# Load generator for the web UI. Simulated actors run on threads for a fixed
+# duration:
+#   till       - bursts of sales (1..burst back to back), then a pause
+#   collector  - a milk collection entry every few seconds
+#   dashboard  - polls /stock and /shops
+# Requests go through Flask's test client (in process) or to a running
+# server over HTTP. Each request is timed; the report gives p50/p95/p99
+# latency, throughput and error rates per operation.
+
+# Result of one request: (operation, seconds, ok, locked)
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = []
+
+    def add(self, op, seconds, ok, locked=False):
+        with self._lock:
+            self.samples.append((op, seconds, ok, locked))
+
+# Ids the actors pick from, read from the database being tested
+def load_ids(db_path):
+    conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+    try:
+        ids = {table: [row[0] for row in conn.execute(f'SELECT id FROM {table}')]
+               for table in ('Customers', 'Shops', 'Products', 'Employees', 'Suppliers')}
+    finally:
+        conn.close()
+    for table in ('Customers', 'Shops', 'Products'):
+        if not ids[table]:
+            raise ValueError(f"{db_path} has no {table}; load sample data first")
+    return ids
+
+# A write the server gave up on after its retries comes back as 503 (see
+# Contention.py and Web.database_busy)
+LOCKED_STATUS = 503
+
+# In-process transport: one Flask test client per actor. Exceptions are
+# propagated so they are counted rather than hidden behind a 500 page.
+class ClientTransport:
+    def __init__(self, app):
+        app.config['PROPAGATE_EXCEPTIONS'] = True
+        self.client = app.test_client()
+
+    def request(self, method, path, data=None, headers=None):
+        try:
+            response = self.client.open(path, method=method, data=data, headers=headers)
+        except sqlite3.OperationalError as e:
+            return False, 'locked' in str(e)
+        return response.status_code < 400, response.status_code == LOCKED_STATUS
+
+# HTTP transport: one keep-alive connection per actor
+class HttpTransport:
+    def __init__(self, base_url):
+        parts = urlsplit(base_url)
+        self.prefix = parts.path.rstrip('/')
+        self.conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+
+    def request(self, method, path, data=None, headers=None):
+        body = urlencode(data) if data is not None else None
+        headers = dict(headers or {})
+        if body:
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        try:
+            self.conn.request(method, self.prefix + path, body=body, headers=headers)
+            response = self.conn.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            return False, False
+        return response.status < 400, response.status == LOCKED_STATUS
+
+# Writes carry an Idempotency-Key, as a till retrying a sale would
+def _timed(recorder, transport, op, method, path, data=None):
+    headers = {'Idempotency-Key': uuid.uuid4().hex} if method == 'POST' else None
+    start = time.perf_counter()
+    ok, locked = transport.request(method, path, data, headers)
+    recorder.add(op, time.perf_counter() - start, ok, locked)
+
+def _till(transport, recorder, ids, stop, rng, burst, pause):
+    while not stop.is_set():
+        for _ in range(rng.randint(1, burst)):
+            quantity = rng.choice((0.5, 1, 1, 2, 5))
+            _timed(recorder, transport, 'sale', 'POST', '/add_sale', {
+                'date': date.today().isoformat(),
+                'customer_id': rng.choice(ids['Customers']),
+                'shop_id': rng.choice(ids['Shops']),
+                'product_id': rng.choice(ids['Products']),
+                'quantity': quantity,
+                'total_price': quantity * 10,
+            })
+        stop.wait(rng.uniform(0.5, 1.5) * pause)
+
+def _collector(transport, recorder, ids, stop, rng, interval):
+    while not stop.is_set():
+        from_supplier = bool(ids['Suppliers']) and rng.random() < 0.7
+        _timed(recorder, transport, 'collection', 'POST', '/add_milk_collection', {
+            'date': date.today().isoformat(),
+            'source_type': 'supplier' if from_supplier else 'farm',
+            'supplier_id': rng.choice(ids['Suppliers']) if from_supplier else '',
+            'quantity_liters': rng.randint(50, 500),
+            'fat_content': round(rng.uniform(3.0, 6.0), 1),
+            'collected_by_employee': rng.choice(ids['Employees']) if ids['Employees'] else '',
+        })
+        # Keep products in stock so tills are not refused for lack of it
+        if ids['Employees'] and rng.random() < 0.5:
+            _timed(recorder, transport, 'production', 'POST', '/add_production', {
+                'date': date.today().isoformat(),
+                'product_id': rng.choice(ids['Products']),
+                'milk_used_liters': rng.randint(100, 1000),
+                'produced_by_employee': rng.choice(ids['Employees']),
+            })
+        stop.wait(rng.uniform(0.5, 1.5) * interval)
+
+def _dashboard(transport, recorder, ids, stop, rng, interval):
+    while not stop.is_set():
+        _timed(recorder, transport, 'stock', 'GET', '/stock')
+        _timed(recorder, transport, 'shops', 'GET', '/shops')
+        stop.wait(rng.uniform(0.5, 1.5) * interval)
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(p / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+def summarize(samples, elapsed):
+    by_op = {}
+    for op, seconds, ok, locked in samples:
+        by_op.setdefault(op, []).append((seconds, ok, locked))
+    by_op['all'] = [(s, ok, locked) for _, s, ok, locked in samples]
+    summary = {}
+    for op, rows in by_op.items():
+        latencies = sorted(s * 1000 for s, _, _ in rows)
+        summary[op] = {
+            'requests': len(rows),
+            'per_second': len(rows) / elapsed if elapsed else 0.0,
+            'errors': sum(1 for _, ok, _ in rows if not ok),
+            'locked': sum(1 for _, _, locked in rows if locked),
+            'p50_ms': percentile(latencies, 50),
+            'p95_ms': percentile(latencies, 95),
+            'p99_ms': percentile(latencies, 99),
+        }
+    return summary
+
+# Run the load test. With base_url=None the app is created in process
+# against a scratch copy of the configured database (or the database itself
+# when in_place=True); with base_url the running server is loaded and its
+# database (db_path) is only read for ids.
+def run_load_test(config=None, tills=8, collectors=2, dashboards=2, duration=30.0,
+                  burst=5, till_pause=1.0, collect_interval=3.0, poll_interval=2.0,
+                  base_url=None, in_place=False, seed=None):
+    config = dict(config or Config.load_config())
+    scratch = None
+    if base_url is None and not in_place:
+        scratch = tempfile.mkdtemp(prefix='dairy-load-')
+        source = sqlite3.connect(config['db_path'])
+        dest = sqlite3.connect(os.path.join(scratch, 'load.db'))
+        source.backup(dest)
+        dest.close()
+        source.close()
+        config['db_path'] = os.path.join(scratch, 'load.db')
+        config['replica_path'] = None
+    try:
+        ids = load_ids(config['db_path'])
+        if base_url is None:
+            import UI
+            app = UI.create_app(config)
+            make_transport = lambda: ClientTransport(app)
+            # The first request brings the schema up to date; keep it out of the timings
+            make_transport().request('GET', '/')
+        else:
+            make_transport = lambda: HttpTransport(base_url)
+
+        recorder = Recorder()
+        stop = threading.Event()
+        master = random.Random(seed)
+        actors = ([(_till, (burst, till_pause))] * tills +
+                  [(_collector, (collect_interval,))] * collectors +
+                  [(_dashboard, (poll_interval,))] * dashboards)
+        threads = [threading.Thread(target=actor, args=(make_transport(), recorder, ids, stop,
+                                                        random.Random(master.random())) + extra,
+                                    daemon=True)
+                   for actor, extra in actors]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        stop.wait(duration)
+        stop.set()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+        return summarize(recorder.samples, elapsed)
+    finally:
+        if scratch:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+def format_report(summary):
+    lines = [f"{'operation':<12} {'requests':>9} {'req/s':>8} {'errors':>7} {'locked':>7} "
+             f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"]
+    for op in sorted(summary, key=lambda op: (op == 'all', op)):
+        s = summary[op]
+        lines.append(f"{op:<12} {s['requests']:>9} {s['per_second']:>8.1f} {s['errors']:>7} {s['locked']:>7} "
+                     f"{s['p50_ms']:>8.1f} {s['p95_ms']:>8.1f} {s['p99_ms']:>8.1f}")
+    total = summary.get('all', {'requests': 0, 'errors': 0, 'locked': 0})
+    if total['requests']:
+        lines.append(f"error rate {total['errors'] / total['requests']:.2%}, "
+                     f"locked rate {total['locked'] / total['requests']:.2%}")
+    return '\n'.join(lines)
+
+# Usage: python Load_Test.py  -> 30 s in process against a copy of the database
+#        (python dairy_cli.py loadtest --help for all options)
+if __name__ == '__main__':
+    print(format_report(run_load_test()))
@@ -0,0 +1,153 @@
+import sqlite3
+import threading
+import time
+from datetime import date, datetime
+import Audit
+import Config
+import Idempotency
+
+# Routine upkeep of the database file: planner statistics (PRAGMA optimize),
+# returning free pages to the filesystem (incremental vacuum) and integrity
+# checks. Every step is bounded in time and uses a short busy timeout, so
+# maintenance gives way to live traffic instead of holding the write lock.
+
+AUTO_VACUUM_INCREMENTAL = 2
+
+# New databases are created with auto_vacuum = INCREMENTAL (see
+# Dairy.create_tables). An existing database needs one full VACUUM to
+# switch; returns True when the mode was changed.
+def enable_incremental_vacuum(conn):
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] == AUTO_VACUUM_INCREMENTAL:
+        return False
+    conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+    conn.execute('VACUUM')
+    return True
+
+# Let SQLite refresh statistics for the tables whose queries need them.
+# analysis_limit caps the rows ANALYZE samples per index.
+def optimize(conn, analysis_limit=400):
+    conn.execute(f'PRAGMA analysis_limit = {int(analysis_limit)}')
+    conn.execute('PRAGMA optimize')
+
+# Free up to `max_seconds` worth of pages, `pages_per_step` per write
+# transaction. Returns the number of pages released.
+def incremental_vacuum(conn, max_seconds=0.5, pages_per_step=128):
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != AUTO_VACUUM_INCREMENTAL:
+        return 0
+    deadline = time.monotonic() + max_seconds
+    freed = 0
+    while time.monotonic() < deadline:
+        free = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        if free == 0:
+            break
+        try:
+            conn.execute(f'PRAGMA incremental_vacuum({min(free, int(pages_per_step))})').fetchall()
+        except sqlite3.OperationalError as e:
+            if 'locked' in str(e) or 'busy' in str(e):
+                break
+            raise
+        freed += free - conn.execute('PRAGMA freelist_count').fetchone()[0]
+    return freed
+
+# PRAGMA quick_check, abandoned once `max_seconds` have passed.
+# Returns (ok, messages); ok is None when the check ran out of time.
+def quick_check(conn, max_seconds=2.0, max_errors=10):
+    deadline = time.monotonic() + max_seconds
+    conn.set_progress_handler(lambda: time.monotonic() > deadline, 1000)
+    try:
+        messages = [row[0] for row in conn.execute(f'PRAGMA quick_check({int(max_errors)})')]
+    except sqlite3.OperationalError as e:
+        if 'interrupted' not in str(e):
+            raise
+        return None, ['time budget exhausted']
+    finally:
+        conn.set_progress_handler(None, 0)
+    return messages == ['ok'], messages
+
+# Parse 'HH:MM-HH:MM'; the window may wrap past midnight
+def parse_window(window):
+    start, end = window.split('-')
+    return (datetime.strptime(start.strip(), '%H:%M').time(),
+            datetime.strptime(end.strip(), '%H:%M').time())
+
+def in_window(window, now=None):
+    start, end = parse_window(window)
+    now = (now or datetime.now()).time()
+    if start <= end:
+        return start <= now < end
+    return now >= start or now < end
+
+# Open a maintenance connection: busy timeout of one step, so a step that
+# cannot get the lock quickly is skipped rather than queued behind writers
+def connect(config):
+    return Config.connect(dict(config, busy_timeout=config['maintenance_step_seconds']))
+
+# One maintenance pass: statistics, expired idempotency keys, pending audit
+# entries, free pages.
+# The integrity check runs at most once per day (tracked by the caller
+# through `last_check`). Returns a summary dict.
+def run_maintenance(config, last_check=None, check=True):
+    step = config['maintenance_step_seconds']
+    conn = connect(config)
+    summary = {'optimized': False, 'keys_purged': 0, 'audit_flushed': 0, 'pages_freed': 0, 'check': None}
+    try:
+        try:
+            optimize(conn)
+            summary['optimized'] = True
+        except sqlite3.OperationalError as e:
+            if 'locked' not in str(e) and 'busy' not in str(e):
+                raise
+        try:
+            summary['keys_purged'] = Idempotency.purge_expired(conn)
+        except sqlite3.OperationalError as e:
+            if 'locked' not in str(e) and 'busy' not in str(e) and 'no such table' not in str(e):
+                raise
+        try:
+            summary['audit_flushed'] = Audit.flush(conn)
+        except sqlite3.OperationalError as e:
+            if 'locked' not in str(e) and 'busy' not in str(e) and 'no such table' not in str(e):
+                raise
+        summary['pages_freed'] = incremental_vacuum(conn, max_seconds=step)
+        if check and last_check != date.today():
+            ok, messages = quick_check(conn, max_seconds=config['maintenance_check_seconds'])
+            summary['check'] = ok
+            summary['messages'] = messages
+    finally:
+        conn.close()
+    return summary
+
+# Runs maintenance passes on a daemon thread, only inside the configured
+# off-peak window (maintenance_window, e.g. '01:00-05:00').
+class MaintenanceScheduler:
+    def __init__(self, config):
+        self.config = config
+        self.last_check = None
+        self.last_summary = None
+        self._thread = None
+
+    def run_once(self):
+        summary = run_maintenance(self.config, self.last_check)
+        if summary['check'] is not None:
+            self.last_check = date.today()
+            if not summary['check']:
+                print(f"Integrity check failed for {self.config['db_path']}: {'; '.join(summary['messages'])}")
+        self.last_summary = summary
+        return summary
+
+    def start(self):
+        if self._thread is not None or not self.config['maintenance_window']:
+            return
+        def loop():
+            while True:
+                if in_window(self.config['maintenance_window']):
+                    try:
+                        self.run_once()
+                    except sqlite3.Error as e:
+                        print(f"Maintenance failed: {e}")
+                time.sleep(self.config['maintenance_interval'])
+        self._thread = threading.Thread(target=loop, name='db-maintenance', daemon=True)
+        self._thread.start()
+
+# Usage: python Maintenance.py  -> one pass now, ignoring the window
+if __name__ == '__main__':
+    print(MaintenanceScheduler(Config.load_config()).run_once())
@@ -0,0 +1,81 @@
+from datetime import date, datetime
+
+# Add the join_date column to databases created before it existed, the
+# period a salary payment is for, and the table that records which periods
+# have been paid.
+def ensure_payroll_schema(conn):
+    columns = [row[1] for row in conn.execute('PRAGMA table_info(Employees)')]
+    if 'join_date' not in columns:
+        conn.execute('ALTER TABLE Employees ADD COLUMN join_date DATE')
+    columns = [row[1] for row in conn.execute('PRAGMA table_info(Salaries)')]
+    if 'period' not in columns:
+        conn.execute('ALTER TABLE Salaries ADD COLUMN period TEXT')
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS PayrollRuns (
+        period TEXT PRIMARY KEY,
+        run_at TEXT NOT NULL,
+        pay_date DATE NOT NULL,
+        employees INTEGER NOT NULL,
+        total REAL NOT NULL
+    )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_salaries_employee_date ON Salaries (employee_id, date)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_salaries_period ON Salaries (period, employee_id)')
+
+# First and last day of a 'YYYY-MM' period
+def period_bounds(period):
+    start = datetime.strptime(period, '%Y-%m').date()
+    end_month = date(start.year + start.month // 12, start.month % 12 + 1, 1)
+    return start, date.fromordinal(end_month.toordinal() - 1)
+
+# Due salary per employee for the period, computed in one grouped query:
+# monthly_salary pro-rated by the days since join_date, minus what was
+# already paid for the period. A payment counts for its period whatever
+# day it was paid; one without a period counts for the month it is dated in.
+PAYROLL_QUERY = '''
+SELECT e.id AS employee_id, e.name, e.monthly_salary, days_worked, days_in_month,
+       ROUND(e.monthly_salary * days_worked / days_in_month, 2) AS prorated,
+       COALESCE(p.paid, 0) AS already_paid,
+       MAX(ROUND(e.monthly_salary * days_worked / days_in_month, 2) - COALESCE(p.paid, 0), 0) AS due
+FROM (
+    SELECT e.*,
+           CAST(julianday(:end) - julianday(MAX(COALESCE(e.join_date, :start), :start)) + 1 AS INTEGER) AS days_worked,
+           CAST(strftime('%d', :end) AS INTEGER) AS days_in_month
+    FROM Employees e
+    WHERE e.monthly_salary IS NOT NULL AND (e.join_date IS NULL OR e.join_date <= :end)
+) e
+LEFT JOIN (
+    SELECT employee_id, SUM(amount_paid) AS paid
+    FROM Salaries WHERE period = :period OR (period IS NULL AND date BETWEEN :start AND :end)
+    GROUP BY employee_id
+) p ON p.employee_id = e.id
+ORDER BY e.id
+'''
+
+# Dry run: what run_payroll would pay, without writing anything
+def preview_payroll(conn, period):
+    start, end = period_bounds(period)
+    return conn.execute(PAYROLL_QUERY, {'period': period, 'start': start.isoformat(), 'end': end.isoformat()})
+
+def get_payroll_run(conn, period):
+    return conn.execute("SELECT * FROM PayrollRuns WHERE period=?", (period,)).fetchone()
+
+# Write all due salaries for the period. Runs on the caller's write
+# transaction (the web UI uses Web.run_operation) and leaves committing to it.
+# A period is paid at most once: re-running it returns (False, existing run).
+def run_payroll(conn, period, pay_date=None):
+    start, end = period_bounds(period)
+    pay_date = pay_date or end.isoformat()
+    params = {'period': period, 'start': start.isoformat(), 'end': end.isoformat(), 'pay_date': pay_date}
+    existing = get_payroll_run(conn, period)
+    if existing is not None:
+        return False, existing
+    employees, total = conn.execute(f'SELECT COUNT(*), TOTAL(due) FROM ({PAYROLL_QUERY}) WHERE due > 0',
+                                    params).fetchone()
+    conn.execute(f'''
+    INSERT INTO Salaries (employee_id, date, amount_paid, period)
+    SELECT employee_id, :pay_date, due, :period FROM ({PAYROLL_QUERY}) WHERE due > 0
+    ''', params)
+    conn.execute("INSERT INTO PayrollRuns (period, run_at, pay_date, employees, total) VALUES (?, ?, ?, ?, ?)",
+                 (period, datetime.now().isoformat(timespec='seconds'), pay_date, employees, total))
+    return True, get_payroll_run(conn, period)
@@ -0,0 +1,97 @@
+from datetime import date
+
+# Per-product, per-shop demand over the planning horizon, in one query.
+# For each day in the horizon the forecast blends the average sales on
+# that weekday (seasonality) with the plain moving average over the
+# history window; :seasonality is the weight given to the weekday average.
+FORECAST_QUERY = '''
+WITH RECURSIVE horizon(d) AS (
+    SELECT date(:as_of, '+1 day')
+    UNION ALL
+    SELECT date(d, '+1 day') FROM horizon WHERE d < date(:as_of, '+' || :horizon || ' days')
+),
+hist AS (
+    SELECT product_id, shop_id, CAST(strftime('%w', date) AS INTEGER) AS weekday, SUM(quantity) AS qty
+    FROM Sales
+    WHERE date > date(:as_of, '-' || :history || ' days') AND date <= :as_of
+    GROUP BY product_id, shop_id, weekday
+),
+base AS (
+    SELECT product_id, shop_id, SUM(qty) * 1.0 / :history AS daily
+    FROM hist GROUP BY product_id, shop_id
+)
+SELECT b.product_id, p.product_name, b.shop_id, sh.name AS shop, b.daily AS moving_average,
+       SUM(:seasonality * COALESCE(h.qty, 0) / :weeks + (1 - :seasonality) * b.daily) AS demand
+FROM base b
+CROSS JOIN horizon hz
+LEFT JOIN hist h ON h.product_id = b.product_id AND h.shop_id = b.shop_id
+                AND h.weekday = CAST(strftime('%w', hz.d) AS INTEGER)
+JOIN Products p ON p.id = b.product_id
+LEFT JOIN Shops sh ON sh.id = b.shop_id
+GROUP BY b.product_id, b.shop_id
+ORDER BY p.product_name, sh.name
+'''
+
+# Demand per product across shops, stock on hand and the milk each unit needs
+PLAN_QUERY = f'''
+WITH forecast AS ({FORECAST_QUERY})
+SELECT f.product_id, f.product_name, p.unit, p.ratio_to_milk,
+       SUM(f.demand) AS demand,
+       COALESCE((SELECT SUM(s.current_quantity) FROM Stock s WHERE s.product_id = f.product_id), 0) AS stock
+FROM forecast f JOIN Products p ON p.id = f.product_id
+GROUP BY f.product_id
+ORDER BY f.product_name
+'''
+
+EXPECTED_MILK_QUERY = '''
+SELECT COALESCE(SUM(quantity_liters), 0) * 1.0 / :history * :horizon
+FROM MilkCollection
+WHERE date > date(:as_of, '-' || :history || ' days') AND date <= :as_of
+'''
+
+def _params(as_of, horizon_days, history_weeks, seasonality):
+    return {
+        'as_of': str(as_of or date.today()),
+        'horizon': horizon_days,
+        'history': history_weeks * 7,
+        'weeks': history_weeks,
+        'seasonality': seasonality,
+    }
+
+def forecast_demand(conn, as_of=None, horizon_days=1, history_weeks=4, seasonality=0.7):
+    return conn.execute(FORECAST_QUERY, _params(as_of, horizon_days, history_weeks, seasonality)).fetchall()
+
+# Recommended production per product for the horizon: forecast demand minus
+# stock on hand, converted to milk with ratio_to_milk. If the milk needed is
+# more than the expected collection (average daily collection over the
+# history window), every product is scaled down by the same factor.
+def production_plan(conn, as_of=None, horizon_days=1, history_weeks=4, seasonality=0.7):
+    params = _params(as_of, horizon_days, history_weeks, seasonality)
+    rows = conn.execute(PLAN_QUERY, params).fetchall()
+    expected_milk = conn.execute(EXPECTED_MILK_QUERY, params).fetchone()[0]
+
+    plan = []
+    for product_id, product_name, unit, ratio, demand, stock in rows:
+        ratio = ratio or 1.0
+        to_produce = max(demand - stock, 0.0)
+        plan.append({
+            'product_id': product_id,
+            'product_name': product_name,
+            'unit': unit,
+            'demand': demand,
+            'stock': stock,
+            'to_produce': to_produce,
+            'milk_liters': to_produce * ratio,
+            'ratio': ratio,
+        })
+    milk_needed = sum(item['milk_liters'] for item in plan)
+    scale = min(1.0, expected_milk / milk_needed) if milk_needed else 1.0
+    for item in plan:
+        item['milk_liters'] *= scale
+        item['to_produce'] = item['milk_liters'] / item['ratio']
+    return {
+        'plan': plan,
+        'expected_milk': expected_milk,
+        'milk_needed': milk_needed,
+        'scale': scale,
+    }
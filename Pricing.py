@@ -0,0 +1,176 @@
+import threading
+from bisect import bisect_right
+
+# Price lists. A PriceList row sets a product's unit price from a date on,
+# for every shop or one shop, and for every customer or one customer (an
+# override). A price stays in force until the next row for the same scope
+# takes effect. The most specific scope with a price on the sale date
+# wins: customer at this shop, customer anywhere, this shop, everywhere.
+#
+# Lookups at the till use PriceIndex, an in-memory copy of the whole price
+# list: a dict of scopes, each a sorted list of effective dates searched
+# with bisect. Triggers bump PriceListVersion on every change, so checking
+# that the index is current is a one-row read.
+
+class PriceNotFound(Exception):
+    def __init__(self, product_id, on_date):
+        super().__init__(f"No price for product {product_id} on {on_date}; add one to the price list or enter the total")
+        self.product_id = product_id
+        self.on_date = on_date
+
+def ensure_pricing_schema(conn):
+    new = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'PriceList'").fetchone() is None
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS PriceList (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        product_id INTEGER NOT NULL,
+        shop_id INTEGER,
+        customer_id INTEGER,
+        effective_from DATE NOT NULL,
+        unit_price REAL NOT NULL,
+        FOREIGN KEY (product_id) REFERENCES Products(id) ON DELETE CASCADE,
+        FOREIGN KEY (shop_id) REFERENCES Shops(id) ON DELETE CASCADE,
+        FOREIGN KEY (customer_id) REFERENCES Customers(id) ON DELETE CASCADE
+    )
+    ''')
+    # One price per scope and date; NULL (any shop/customer) counts as a value
+    conn.execute('''
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_price_list_scope
+    ON PriceList (product_id, IFNULL(shop_id, 0), IFNULL(customer_id, 0), effective_from)
+    ''')
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS PriceListVersion (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL
+    )
+    ''')
+    conn.execute('INSERT OR IGNORE INTO PriceListVersion (id, version) VALUES (1, 0)')
+    for event in ('INSERT', 'UPDATE', 'DELETE'):
+        conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS price_list_version_{event.lower()} AFTER {event} ON PriceList
+        BEGIN
+            UPDATE PriceListVersion SET version = version + 1 WHERE id = 1;
+        END
+        ''')
+
+    # Start the list from what was charged: each product's unit price on its
+    # latest sale, effective from that sale's date
+    if new:
+        conn.execute('''
+        INSERT INTO PriceList (product_id, effective_from, unit_price)
+        SELECT product_id, date, ROUND(total_price / quantity, 2) FROM (
+            SELECT product_id, date, total_price, quantity,
+                   ROW_NUMBER() OVER (PARTITION BY product_id ORDER BY date DESC, id DESC) AS latest
+            FROM Sales WHERE quantity > 0)
+        WHERE latest = 1
+        ''')
+
+def _scope(product_id, shop_id, customer_id):
+    return (int(product_id),
+            int(shop_id) if shop_id not in (None, '') else None,
+            int(customer_id) if customer_id not in (None, '') else None)
+
+class PriceIndex:
+    def __init__(self, version, rows):
+        self.version = version
+        # {(product, shop, customer): ([effective_from, ...], [unit_price, ...])}
+        self.scopes = {}
+        for product_id, shop_id, customer_id, effective_from, unit_price in rows:
+            dates, prices = self.scopes.setdefault((product_id, shop_id, customer_id), ([], []))
+            dates.append(effective_from)
+            prices.append(unit_price)
+
+    @classmethod
+    def load(cls, conn):
+        version = conn.execute('SELECT version FROM PriceListVersion WHERE id = 1').fetchone()[0]
+        rows = conn.execute('''
+        SELECT product_id, shop_id, customer_id, effective_from, unit_price FROM PriceList
+        ORDER BY product_id, shop_id, customer_id, effective_from
+        ''').fetchall()
+        return cls(version, rows)
+
+    def unit_price(self, product_id, shop_id, customer_id, on_date):
+        product_id, shop_id, customer_id = _scope(product_id, shop_id, customer_id)
+        on_date = str(on_date)
+        for scope in ((product_id, shop_id, customer_id), (product_id, None, customer_id),
+                      (product_id, shop_id, None), (product_id, None, None)):
+            entry = self.scopes.get(scope)
+            if entry is None:
+                continue
+            i = bisect_right(entry[0], on_date)
+            if i:
+                return entry[1][i - 1]
+        return None
+
+# One index per database file, rebuilt when PriceListVersion moves
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def price_index(conn):
+    key = conn.execute('PRAGMA database_list').fetchone()[2]
+    version = conn.execute('SELECT version FROM PriceListVersion WHERE id = 1').fetchone()[0]
+    index = _indexes.get(key)
+    if index is None or index.version != version:
+        index = PriceIndex.load(conn)
+        with _indexes_lock:
+            _indexes[key] = index
+    return index
+
+def unit_price(conn, product_id, shop_id, customer_id, on_date):
+    return price_index(conn).unit_price(product_id, shop_id, customer_id, on_date)
+
+# Total for a sale line from the price list; raises PriceNotFound
+def quote(conn, product_id, shop_id, customer_id, on_date, quantity):
+    price = unit_price(conn, product_id, shop_id, customer_id, on_date)
+    if price is None:
+        raise PriceNotFound(product_id, on_date)
+    return round(price * float(quantity), 2)
+
+def set_price(conn, product_id, effective_from, unit_price, shop_id=None, customer_id=None):
+    product_id, shop_id, customer_id = _scope(product_id, shop_id, customer_id)
+    conn.execute('''
+    INSERT INTO PriceList (product_id, shop_id, customer_id, effective_from, unit_price) VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (product_id, IFNULL(shop_id, 0), IFNULL(customer_id, 0), effective_from)
+    DO UPDATE SET unit_price = excluded.unit_price
+    ''', (product_id, shop_id, customer_id, effective_from, unit_price))
+
+def delete_price(conn, price_id):
+    conn.execute('DELETE FROM PriceList WHERE id = ?', (price_id,))
+
+# Prices in force on a date: the latest row per scope on or before it
+CURRENT_PRICES = '''
+SELECT pl.*, p.product_name, p.category, sh.name AS shop, c.name AS customer
+FROM PriceList pl
+JOIN Products p ON p.id = pl.product_id
+LEFT JOIN Shops sh ON sh.id = pl.shop_id
+LEFT JOIN Customers c ON c.id = pl.customer_id
+WHERE pl.effective_from = (
+    SELECT MAX(effective_from) FROM PriceList x
+    WHERE x.product_id = pl.product_id AND x.shop_id IS pl.shop_id AND x.customer_id IS pl.customer_id
+      AND x.effective_from <= :on_date)
+'''
+
+def current_prices(conn, on_date):
+    return conn.execute(CURRENT_PRICES + ' ORDER BY p.product_name, sh.name, c.name', {'on_date': str(on_date)})
+
+# Reprice every scope in force on `effective_from` (optionally only one
+# product, shop or product category) by `percent` and/or `amount`, effective
+# from that date, with one INSERT ... SELECT. Customer overrides are
+# repriced too unless include_overrides is False. Run inside the caller's
+# transaction. Returns the number of price rows written.
+def bulk_reprice(conn, effective_from, percent=0.0, amount=0.0, product_id=None, shop_id=None,
+                 category=None, include_overrides=True):
+    return conn.execute(f'''
+    INSERT INTO PriceList (product_id, shop_id, customer_id, effective_from, unit_price)
+    SELECT product_id, shop_id, customer_id, :on_date,
+           ROUND(unit_price * (1 + :percent / 100.0) + :amount, 2)
+    FROM ({CURRENT_PRICES}) AS pl
+    WHERE (:product_id IS NULL OR product_id = :product_id)
+      AND (:shop_id IS NULL OR shop_id = :shop_id)
+      AND (:category IS NULL OR category = :category)
+      AND (:overrides OR customer_id IS NULL)
+    ON CONFLICT (product_id, IFNULL(shop_id, 0), IFNULL(customer_id, 0), effective_from)
+    DO UPDATE SET unit_price = excluded.unit_price
+    ''', {'on_date': str(effective_from), 'percent': float(percent or 0), 'amount': float(amount or 0),
+          'product_id': product_id, 'shop_id': shop_id, 'category': category,
+          'overrides': 1 if include_overrides else 0}).rowcount
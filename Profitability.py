@@ -0,0 +1,169 @@
+# Profitability cube: sales, expenses and salaries summed per shop, month
+# and category, so any slice of shop x category x month is a scan of a few
+# hundred rows instead of the raw tables.
+#
+#   source   category
+#   sale     product category
+#   expense  expense category
+#   salary   'Salaries' (charged to the employee's shop)
+#
+# Triggers mark the (shop, month, source) cells a write touches in
+# ProfitDirty; refresh_cube recomputes only those cells. Rows without a
+# shop (salaries of employees not assigned to one) use shop_id 0.
+
+UNCATEGORIZED = 'Uncategorized'
+
+def _mark(shop, month, source):
+    return f'''
+        INSERT INTO ProfitDirty (shop_id, month, source) VALUES (IFNULL({shop}, 0), substr({month}, 1, 7), '{source}')
+        ON CONFLICT DO NOTHING;'''
+
+# Shop a salary is charged to
+def _salary_shop(employee):
+    return f'(SELECT shop_id FROM Employees WHERE id = {employee})'
+
+def ensure_profit_schema(conn):
+    new = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'ProfitCube'").fetchone() is None
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS ProfitCube (
+        shop_id INTEGER NOT NULL,
+        month TEXT NOT NULL,
+        source TEXT NOT NULL,
+        category TEXT NOT NULL,
+        amount REAL NOT NULL,
+        entries INTEGER NOT NULL,
+        PRIMARY KEY (shop_id, month, source, category)
+    ) WITHOUT ROWID
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_profit_cube_month ON ProfitCube (month)')
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS ProfitDirty (
+        shop_id INTEGER NOT NULL,
+        month TEXT NOT NULL,
+        source TEXT NOT NULL,
+        PRIMARY KEY (shop_id, month, source)
+    ) WITHOUT ROWID
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_sales_shop_date ON Sales (shop_id, date)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_expenses_shop_date ON Expenses (shop_id, date)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_salaries_employee_date ON Salaries (employee_id, date)')
+
+    # Upserts rather than OR IGNORE: these triggers also fire from foreign
+    # key actions (a shop deleted under its employees), where OR IGNORE is
+    # not honoured
+    for name, event, body in (
+        ('profit_sale_insert', 'AFTER INSERT ON Sales', _mark('NEW.shop_id', 'NEW.date', 'sale')),
+        ('profit_sale_delete', 'AFTER DELETE ON Sales', _mark('OLD.shop_id', 'OLD.date', 'sale')),
+        ('profit_sale_update', 'AFTER UPDATE OF date, shop_id, product_id, total_price ON Sales',
+         _mark('OLD.shop_id', 'OLD.date', 'sale') + _mark('NEW.shop_id', 'NEW.date', 'sale')),
+        ('profit_expense_insert', 'AFTER INSERT ON Expenses', _mark('NEW.shop_id', 'NEW.date', 'expense')),
+        ('profit_expense_delete', 'AFTER DELETE ON Expenses', _mark('OLD.shop_id', 'OLD.date', 'expense')),
+        ('profit_expense_update', 'AFTER UPDATE OF date, shop_id, category_id, amount ON Expenses',
+         _mark('OLD.shop_id', 'OLD.date', 'expense') + _mark('NEW.shop_id', 'NEW.date', 'expense')),
+        ('profit_salary_insert', 'AFTER INSERT ON Salaries',
+         _mark(_salary_shop('NEW.employee_id'), 'NEW.date', 'salary')),
+        ('profit_salary_delete', 'AFTER DELETE ON Salaries',
+         _mark(_salary_shop('OLD.employee_id'), 'OLD.date', 'salary')),
+        ('profit_salary_update', 'AFTER UPDATE OF employee_id, date, amount_paid ON Salaries',
+         _mark(_salary_shop('OLD.employee_id'), 'OLD.date', 'salary') + _mark(_salary_shop('NEW.employee_id'), 'NEW.date', 'salary')),
+        # Re-filing a dimension moves every cell it touches
+        ('profit_employee_shop', 'AFTER UPDATE OF shop_id ON Employees', '''
+         INSERT INTO ProfitDirty (shop_id, month, source)
+         SELECT shop, substr(s.date, 1, 7), 'salary' FROM Salaries s, (SELECT IFNULL(OLD.shop_id, 0) AS shop UNION SELECT IFNULL(NEW.shop_id, 0))
+         WHERE s.employee_id = NEW.id
+         ON CONFLICT DO NOTHING;'''),
+        ('profit_product_category', 'AFTER UPDATE OF category ON Products', '''
+         INSERT INTO ProfitDirty (shop_id, month, source)
+         SELECT DISTINCT shop_id, substr(date, 1, 7), 'sale' FROM Sales WHERE product_id = NEW.id
+         ON CONFLICT DO NOTHING;'''),
+        ('profit_expense_category', 'AFTER UPDATE OF name ON ExpenseCategories', '''
+         INSERT INTO ProfitDirty (shop_id, month, source)
+         SELECT DISTINCT shop_id, substr(date, 1, 7), 'expense' FROM Expenses WHERE category_id = NEW.id
+         ON CONFLICT DO NOTHING;'''),
+    ):
+        conn.execute(f'CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN {body} END')
+
+    # Build the cube for the rows already on file on the next refresh
+    if new:
+        conn.execute('''
+        INSERT OR IGNORE INTO ProfitDirty (shop_id, month, source)
+        SELECT shop_id, substr(date, 1, 7), 'sale' FROM Sales
+        UNION SELECT shop_id, substr(date, 1, 7), 'expense' FROM Expenses
+        UNION SELECT IFNULL(e.shop_id, 0), substr(s.date, 1, 7), 'salary' FROM Salaries s JOIN Employees e ON e.id = s.employee_id
+        ''')
+
+def pending(conn):
+    return conn.execute('SELECT COUNT(*) FROM ProfitDirty').fetchone()[0]
+
+# Recompute the dirty cells. Run inside the caller's write transaction.
+# Returns the number of (shop, month, source) cells refreshed.
+def refresh_cube(conn):
+    cells = pending(conn)
+    if not cells:
+        return 0
+    conn.execute('''
+    DELETE FROM ProfitCube WHERE EXISTS (
+        SELECT 1 FROM ProfitDirty d
+        WHERE d.shop_id = ProfitCube.shop_id AND d.month = ProfitCube.month AND d.source = ProfitCube.source)
+    ''')
+    conn.execute(f'''
+    INSERT INTO ProfitCube (shop_id, month, source, category, amount, entries)
+    SELECT d.shop_id, d.month, 'sale', IFNULL(p.category, '{UNCATEGORIZED}'), TOTAL(s.total_price), COUNT(*)
+    FROM ProfitDirty d
+    JOIN Sales s ON s.shop_id = d.shop_id AND s.date >= d.month || '-01' AND s.date < d.month || '-32'
+    LEFT JOIN Products p ON p.id = s.product_id
+    WHERE d.source = 'sale'
+    GROUP BY d.shop_id, d.month, 4
+    ''')
+    conn.execute(f'''
+    INSERT INTO ProfitCube (shop_id, month, source, category, amount, entries)
+    SELECT d.shop_id, d.month, 'expense', IFNULL(c.name, '{UNCATEGORIZED}'), TOTAL(x.amount), COUNT(*)
+    FROM ProfitDirty d
+    JOIN Expenses x ON x.shop_id = d.shop_id AND x.date >= d.month || '-01' AND x.date < d.month || '-32'
+    LEFT JOIN ExpenseCategories c ON c.id = x.category_id
+    WHERE d.source = 'expense'
+    GROUP BY d.shop_id, d.month, 4
+    ''')
+    conn.execute('''
+    INSERT INTO ProfitCube (shop_id, month, source, category, amount, entries)
+    SELECT d.shop_id, d.month, 'salary', 'Salaries', TOTAL(s.amount_paid), COUNT(*)
+    FROM ProfitDirty d
+    JOIN Employees e ON IFNULL(e.shop_id, 0) = d.shop_id
+    JOIN Salaries s ON s.employee_id = e.id AND s.date >= d.month || '-01' AND s.date < d.month || '-32'
+    WHERE d.source = 'salary'
+    GROUP BY d.shop_id, d.month
+    ''')
+    conn.execute('DELETE FROM ProfitDirty')
+    return cells
+
+# Dimensions a slice can be grouped by
+DIMENSIONS = {
+    'shop': "IFNULL(sh.name, 'No shop')",
+    'month': 'c.month',
+    'category': 'c.category',
+}
+
+# Sales, expenses, salaries and profit for one slice of the cube, grouped
+# by any of DIMENSIONS. Months are 'YYYY-MM'; filters left as None match all.
+# Returns the cursor, so a long slice can be streamed.
+def profitability(conn, group_by=('shop',), shop_id=None, start=None, end=None, category=None):
+    dims = [d for d in group_by if d in DIMENSIONS]
+    select = ''.join(f'{DIMENSIONS[d]} AS {d}, ' for d in dims)
+    group = ('GROUP BY ' + ', '.join(DIMENSIONS[d] for d in dims)) if dims else ''
+    order = ('ORDER BY ' + ', '.join(DIMENSIONS[d] for d in dims)) if dims else ''
+    return conn.execute(f'''
+    SELECT {select}
+           TOTAL(CASE WHEN c.source = 'sale' THEN c.amount END) AS sales,
+           TOTAL(CASE WHEN c.source = 'expense' THEN c.amount END) AS expenses,
+           TOTAL(CASE WHEN c.source = 'salary' THEN c.amount END) AS salaries,
+           TOTAL(CASE WHEN c.source = 'sale' THEN c.amount ELSE -c.amount END) AS profit
+    FROM ProfitCube c LEFT JOIN Shops sh ON sh.id = c.shop_id
+    WHERE (:shop_id IS NULL OR c.shop_id = :shop_id)
+      AND (:start IS NULL OR c.month >= :start)
+      AND (:end IS NULL OR c.month <= :end)
+      AND (:category IS NULL OR c.category = :category)
+    {group} {order}
+    ''', {'shop_id': shop_id, 'start': start, 'end': end, 'category': category})
+
+def categories(conn):
+    return [row[0] for row in conn.execute('SELECT DISTINCT category FROM ProfitCube ORDER BY category')]
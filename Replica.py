@@ -0,0 +1,71 @@
+import os
+import sqlite3
+import threading
+import time
+
+# Read-only replica of the primary database for report and list queries.
+#
+# The replica file is never written in place: each refresh copies the
+# primary with the online backup API into a temporary file and swaps it in
+# with os.replace. Readers that already hold the old file keep reading it,
+# new readers open the new one, so connections can use immutable=1 and
+# skip all locking.
+class ReadReplica:
+    def __init__(self, primary_path, replica_path=None, max_staleness=30.0):
+        self.primary_path = primary_path
+        self.replica_path = replica_path or primary_path + '.replica'
+        self.max_staleness = max_staleness
+        self._lock = threading.Lock()
+        self._thread = None
+
+    # Copy the primary into a fresh replica file and swap it in
+    def refresh(self, pages=512):
+        with self._lock:
+            tmp_path = self.replica_path + '.tmp'
+            started = time.time()
+            source = sqlite3.connect(self.primary_path)
+            dest = sqlite3.connect(tmp_path)
+            try:
+                source.backup(dest, pages=pages)
+            finally:
+                dest.close()
+                source.close()
+            # The replica is as fresh as the moment the copy started
+            os.utime(tmp_path, (started, started))
+            os.replace(tmp_path, self.replica_path)
+
+    # Time the current replica was taken, or None if there is none yet.
+    # Kept in the file's mtime so every worker process agrees on it.
+    def refreshed_at(self):
+        try:
+            return os.stat(self.replica_path).st_mtime
+        except FileNotFoundError:
+            return None
+
+    def is_fresh(self, since=None):
+        taken = self.refreshed_at()
+        if taken is None or time.time() - taken > self.max_staleness:
+            return False
+        # Read-your-writes: a client that wrote after the copy must not read it
+        return since is None or taken >= since
+
+    # Open the replica read-only, or return None when it is missing or
+    # staler than allowed so the caller can fall back to the primary.
+    def connect(self, since=None):
+        if not self.is_fresh(since):
+            return None
+        return sqlite3.connect(f'file:{self.replica_path}?mode=ro&immutable=1', uri=True)
+
+    # Refresh every `interval` seconds on a daemon thread
+    def start(self, interval=10.0):
+        if self._thread is not None:
+            return
+        def loop():
+            while True:
+                try:
+                    self.refresh()
+                except sqlite3.Error as e:
+                    print(f"Replica refresh failed: {e}")
+                time.sleep(interval)
+        self._thread = threading.Thread(target=loop, name='replica-refresh', daemon=True)
+        self._thread.start()
@@ -0,0 +1,358 @@
+from flask import request, redirect, url_for, flash
+import sqlite3
+from datetime import date
+import Audit
+import Planning
+import Profitability
+import Stock_Alerts
+from Web import (bp, execute_read_query, export_links, export_source, get_db_connection, idempotency_field,
+                 page_rows, read_connection, render_page, run_operation, audit_rows)
+
+# Report pages. Each page's table comes from a source registered with
+# Web.export_source, which also serves its CSV/XLSX download.
+
+# Home route
+@bp.route('/')
+def index():
+    content = '''
+    <h1 class="mt-4">Welcome to Dairy Management System</h1>
+    <p>Use the navigation bar above to view reports or manage data.</p>
+    '''
+    return render_page(content)
+
+# --- Reports ---
+@export_source('stock')
+def stock_rows(conn, args):
+    return conn.execute('''
+    SELECT p.product_name, s.current_quantity, p.unit, s.last_updated
+    FROM Stock s JOIN Products p ON s.product_id = p.id
+    ORDER BY s.current_quantity ASC
+    ''')
+
+@bp.route('/stock')
+def view_stock():
+    stocks = page_rows('stock')
+    content = '<h2 class="mt-4">Stock Levels</h2>' + export_links('stock')
+    if not stocks:
+        content += '<p>No stock data available.</p>'
+    else:
+        content += '''
+        <table class="table table-striped table-hover">
+            <thead><tr><th>Product</th><th>Quantity</th><th>Unit</th><th>Last Updated</th></tr></thead>
+            <tbody>
+        '''
+        for stock in stocks:
+            content += f'''
+            <tr>
+                <td>{stock['product_name']}</td>
+                <td>{stock['current_quantity']}</td>
+                <td>{stock['unit']}</td>
+                <td>{stock['last_updated']}</td>
+            </tr>
+            '''
+        content += '</tbody></table>'
+    return render_page(content)
+
+@export_source('alerts')
+def alert_rows(conn, args):
+    return Stock_Alerts.list_open_alerts(conn)
+
+@bp.route('/alerts')
+def view_alerts():
+    alerts = page_rows('alerts')
+    conn = get_db_connection()
+    conn.row_factory = sqlite3.Row
+    try:
+        levels = conn.execute('''
+        SELECT p.id, p.product_name, p.unit, r.threshold,
+               (SELECT SUM(current_quantity) FROM Stock s WHERE s.product_id = p.id) AS current_quantity
+        FROM Products p LEFT JOIN ReorderLevels r ON r.product_id = p.id
+        ORDER BY p.product_name
+        ''').fetchall()
+    finally:
+        conn.close()
+    content = '<h2 class="mt-4">Stock Alerts</h2>' + export_links('alerts')
+    if not alerts:
+        content += '<p>All products are above their reorder levels.</p>'
+    else:
+        content += '<table class="table table-striped table-hover"><thead><tr><th>Product</th><th>Quantity at Alert</th><th>Current Quantity</th><th>Reorder Level</th><th>Raised At</th><th>Actions</th></tr></thead><tbody>'
+        for alert in alerts:
+            content += f'<tr class="table-danger"><td>{alert["product_name"]}</td><td>{alert["quantity"]} {alert["unit"]}</td><td>{alert["current_quantity"]}</td><td>{alert["threshold"]}</td><td>{alert["raised_at"]}</td><td><a class="btn btn-sm btn-secondary" href="{url_for(".dismiss_alert", id=alert["id"])}">Dismiss</a></td></tr>'
+        content += '</tbody></table>'
+    content += '<h3>Reorder Levels</h3><table class="table table-striped table-hover"><thead><tr><th>Product</th><th>Current Quantity</th><th>Reorder Level</th></tr></thead><tbody>'
+    for level in levels:
+        threshold = level['threshold'] if level['threshold'] is not None else ''
+        content += f'''<tr><td>{level["product_name"]}</td><td>{level["current_quantity"]} {level["unit"]}</td><td>
+            <form method="POST" action="{url_for(".set_reorder_level", product_id=level["id"])}" class="d-flex gap-2">{idempotency_field()}
+                <input name="threshold" type="number" step="0.01" class="form-control form-control-sm" value="{threshold}" placeholder="None">
+                <button type="submit" class="btn btn-sm btn-primary">Save</button>
+            </form></td></tr>'''
+    content += '</tbody></table>'
+    return render_page(content)
+
+@bp.route('/set_reorder_level/<int:product_id>', methods=['POST'])
+def set_reorder_level(product_id):
+    threshold = request.form['threshold'] or None
+    run_operation(Stock_Alerts.set_reorder_level, product_id, threshold)
+    flash('Reorder level saved')
+    return redirect(url_for('.view_alerts'))
+
+@bp.route('/dismiss_alert/<int:id>')
+def dismiss_alert(id):
+    run_operation(Stock_Alerts.dismiss_alert, id)
+    flash('Alert dismissed')
+    return redirect(url_for('.view_alerts'))
+
+@export_source('recent_sales')
+def recent_sale_rows(conn, args):
+    return conn.execute('''
+    SELECT s.date, c.name AS customer, sh.name AS shop, p.product_name, s.quantity, s.total_price
+    FROM Sales s JOIN Customers c ON s.customer_id = c.id
+    JOIN Shops sh ON s.shop_id = sh.id JOIN Products p ON s.product_id = p.id
+    ORDER BY s.date DESC LIMIT 10
+    ''')
+
+@bp.route('/sales')
+def view_sales():
+    sales = page_rows('recent_sales')
+    content = '<h2 class="mt-4">Recent Sales (Last 10)</h2>' + export_links('recent_sales')
+    if not sales:
+        content += '<p>No sales data available.</p>'
+    else:
+        content += '''
+        <table class="table table-striped table-hover">
+            <thead><tr><th>Date</th><th>Customer</th><th>Shop</th><th>Product</th><th>Quantity</th><th>Price</th></tr></thead>
+            <tbody>
+        '''
+        for sale in sales:
+            content += f'''
+            <tr>
+                <td>{sale['date']}</td>
+                <td>{sale['customer']}</td>
+                <td>{sale['shop']}</td>
+                <td>{sale['product_name']}</td>
+                <td>{sale['quantity']}</td>
+                <td>{sale['total_price']}</td>
+            </tr>
+            '''
+        content += '</tbody></table>'
+    return render_page(content)
+
+@export_source('top_customers', history=True)
+def top_customer_rows(conn, args):
+    return conn.execute('''
+    SELECT c.name, SUM(s.quantity) AS total_volume, a.total_invoiced AS total_spent, a.balance
+    FROM Sales_all s JOIN Customers c ON s.customer_id = c.id
+    LEFT JOIN CustomerAccounts a ON a.customer_id = c.id
+    GROUP BY c.id ORDER BY total_volume DESC LIMIT 5
+    ''')
+
+@bp.route('/customers')
+def view_customers():
+    customers = page_rows('top_customers')
+    content = '<h2 class="mt-4">Top Customers by Volume</h2>' + export_links('top_customers')
+    if not customers:
+        content += '<p>No customer data available.</p>'
+    else:
+        content += '''
+        <table class="table table-striped table-hover">
+            <thead><tr><th>Customer</th><th>Total Volume</th><th>Total Spent</th><th>Balance Owed</th></tr></thead>
+            <tbody>
+        '''
+        for customer in customers:
+            content += f'''
+            <tr>
+                <td>{customer['name']}</td>
+                <td>{customer['total_volume']}</td>
+                <td>{customer['total_spent']}</td>
+                <td>{customer['balance']}</td>
+            </tr>
+            '''
+        content += '</tbody></table>'
+    return render_page(content)
+
+@export_source('audit')
+def audit_trail_rows(conn, args):
+    return Audit.trail(conn, args.get('entity') or None, args.get('entity_id', type=int))
+
+@bp.route('/audit')
+def view_audit():
+    entity = request.args.get('entity') or None
+    entity_id = request.args.get('entity_id', type=int)
+    entries = Audit.decode(page_rows('audit'))
+    entity_options = '<option value="">All</option>' + ''.join(
+        f'<option {"selected" if t == entity else ""}>{t}</option>' for t in Audit.AUDITED_TABLES)
+    content = f'''
+    <h2 class="mt-4">Audit Trail</h2>
+    <form method="GET" class="row g-3 mb-3">
+        <div class="col-md-3"><label class="form-label">Record type</label><select name="entity" class="form-select">{entity_options}</select></div>
+        <div class="col-md-2"><label class="form-label">ID</label><input name="entity_id" type="number" class="form-control" value="{entity_id if entity_id is not None else ''}"></div>
+        <div class="col-12"><button type="submit" class="btn btn-primary btn-sm">Show</button></div>
+    </form>
+    {export_links('audit')}
+    <table class="table table-striped table-hover"><thead><tr><th>When</th><th>Record</th><th>Changes</th></tr></thead><tbody>
+    {audit_rows(entries, show_entity=True)}
+    </tbody></table>
+    '''
+    return render_page(content)
+
+# Slices of the profitability cube (see Profitability.py); cells touched
+# since the last visit are recomputed first
+def refresh_profitability():
+    conn = get_db_connection()
+    try:
+        dirty = Profitability.pending(conn)
+    finally:
+        conn.close()
+    if dirty:
+        run_operation(Profitability.refresh_cube)
+
+def profitability_filters(args):
+    return (args.getlist('group') or ['shop'], args.get('shop_id', type=int),
+            args.get('start') or None, args.get('end') or None, args.get('category') or None)
+
+@export_source('profitability', prepare=refresh_profitability)
+def profitability_rows(conn, args):
+    return Profitability.profitability(conn, *profitability_filters(args))
+
+@bp.route('/profitability')
+def view_profitability():
+    rows = page_rows('profitability')
+    group_by, shop_id, start, end, category = profitability_filters(request.args)
+    conn = read_connection()
+    try:
+        categories = Profitability.categories(conn)
+    finally:
+        conn.close()
+    shops = execute_read_query("SELECT id, name FROM Shops", fetchall=True)
+    shop_options = '<option value="">All shops</option>' + ''.join([f'<option value="{s["id"]}" {"selected" if s["id"] == shop_id else ""}>{s["name"]}</option>' for s in shops])
+    category_options = '<option value="">All categories</option>' + ''.join([f'<option {"selected" if c == category else ""}>{c}</option>' for c in categories])
+    group_checks = ''.join([f'<div class="form-check form-check-inline"><input class="form-check-input" type="checkbox" name="group" value="{d}" id="group-{d}" {"checked" if d in group_by else ""}><label class="form-check-label" for="group-{d}">By {d}</label></div>' for d in Profitability.DIMENSIONS])
+    content = f'''
+    <h2 class="mt-4">Profitability</h2>
+    <form method="GET" class="row g-3 mb-3">
+        <div class="col-md-3"><label class="form-label">Shop</label><select name="shop_id" class="form-select">{shop_options}</select></div>
+        <div class="col-md-2"><label class="form-label">From</label><input name="start" type="month" class="form-control" value="{start or ''}"></div>
+        <div class="col-md-2"><label class="form-label">To</label><input name="end" type="month" class="form-control" value="{end or ''}"></div>
+        <div class="col-md-3"><label class="form-label">Category</label><select name="category" class="form-select">{category_options}</select></div>
+        <div class="col-12">{group_checks}<button type="submit" class="btn btn-primary btn-sm ms-2">Show</button></div>
+    </form>
+    {export_links('profitability')}
+    '''
+    dims = [d for d in group_by if d in Profitability.DIMENSIONS]
+    content += '<table class="table table-striped table-hover"><thead><tr>' + ''.join(f'<th>{d.capitalize()}</th>' for d in dims)
+    content += '<th>Sales</th><th>Expenses</th><th>Salaries</th><th>Profit</th><th>Margin</th></tr></thead><tbody>'
+    for row in rows:
+        margin = f'{row["profit"] / row["sales"]:.1%}' if row["sales"] else ''
+        content += '<tr>' + ''.join(f'<td>{row[d]}</td>' for d in dims)
+        content += f'<td>{row["sales"]:.2f}</td><td>{row["expenses"]:.2f}</td><td>{row["salaries"]:.2f}</td><td>{row["profit"]:.2f}</td><td>{margin}</td></tr>'
+    content += '</tbody></table>'
+    return render_page(content)
+
+@export_source('productivity', history=True)
+def productivity_rows(conn, args):
+    return conn.execute('''
+    SELECT e.name, SUM(p.quantity_produced) AS total_produced
+    FROM Production_all p JOIN Employees e ON p.produced_by_employee = e.id
+    GROUP BY e.id ORDER BY total_produced DESC
+    ''')
+
+@bp.route('/employees')
+def view_employees():
+    employees = page_rows('productivity')
+    content = '<h2 class="mt-4">Employee Productivity</h2>' + export_links('productivity')
+    if not employees:
+        content += '<p>No production data available.</p>'
+    else:
+        content += '''
+        <table class="table table-striped table-hover">
+            <thead><tr><th>Employee</th><th>Total Produced</th></tr></thead>
+            <tbody>
+        '''
+        for employee in employees:
+            content += f'''
+            <tr>
+                <td>{employee['name']}</td>
+                <td>{employee['total_produced']}</td>
+            </tr>
+            '''
+        content += '</tbody></table>'
+    return render_page(content)
+
+@export_source('shop_performance', history=True)
+def shop_performance_rows(conn, args):
+    return conn.execute('''
+    SELECT sh.name, SUM(s.total_price) AS total_sales,
+           (SELECT SUM(e.amount) FROM Expenses e WHERE e.shop_id = sh.id) AS total_expenses,
+           SUM(s.total_price) - (SELECT SUM(e.amount) FROM Expenses e WHERE e.shop_id = sh.id) AS net_profit
+    FROM Sales_all s JOIN Shops sh ON s.shop_id = sh.id
+    GROUP BY sh.id
+    ''')
+
+@bp.route('/shops')
+def view_shops():
+    shops = page_rows('shop_performance')
+    content = '<h2 class="mt-4">Shop Performance</h2>' + export_links('shop_performance')
+    if not shops:
+        content += '<p>No shop data available.</p>'
+    else:
+        content += '''
+        <table class="table table-striped table-hover">
+            <thead><tr><th>Shop</th><th>Total Sales</th><th>Total Expenses</th><th>Net Profit</th></tr></thead>
+            <tbody>
+        '''
+        for shop in shops:
+            total_expenses = shop['total_expenses'] if shop['total_expenses'] is not None else 0
+            net_profit = shop['net_profit'] if shop['net_profit'] is not None else 0
+            content += f'''
+            <tr>
+                <td>{shop['name']}</td>
+                <td>{shop['total_sales']}</td>
+                <td>{total_expenses}</td>
+                <td>{net_profit}</td>
+            </tr>
+            '''
+        content += '</tbody></table>'
+    return render_page(content)
+
+def planning_filters(args):
+    return args.get('as_of') or str(date.today()), args.get('horizon', 1, type=int)
+
+@export_source('production_plan')
+def production_plan_rows(conn, args):
+    return Planning.production_plan(conn, *planning_filters(args))['plan']
+
+@bp.route('/planning')
+def view_planning():
+    as_of, horizon = planning_filters(request.args)
+    conn = read_connection()
+    try:
+        forecasts = Planning.forecast_demand(conn, as_of, horizon)
+        result = Planning.production_plan(conn, as_of, horizon)
+    finally:
+        conn.close()
+    content = f'''
+    <h2 class="mt-4">Production Plan</h2>
+    <form method="GET" class="row g-3 mb-3">
+        <div class="col-md-4"><label class="form-label">As of</label><input name="as_of" type="date" class="form-control" value="{as_of}"></div>
+        <div class="col-md-4"><label class="form-label">Days ahead</label><input name="horizon" type="number" min="1" class="form-control" value="{horizon}"></div>
+        <div class="col-12"><button type="submit" class="btn btn-secondary">Recompute</button></div>
+    </form>
+    <p>Expected milk: {result['expected_milk']:.1f} L, needed: {result['milk_needed']:.1f} L'''
+    if result['scale'] < 1:
+        content += f' &mdash; plan scaled to {result["scale"]:.0%} of demand'
+    content += '</p>'
+    if not result['plan']:
+        content += '<p>No sales history in the last 4 weeks.</p>'
+    else:
+        content += export_links('production_plan')
+        content += '<table class="table table-striped table-hover"><thead><tr><th>Product</th><th>Forecast Demand</th><th>In Stock</th><th>Produce</th><th>Milk (L)</th></tr></thead><tbody>'
+        for item in result['plan']:
+            content += f'<tr><td>{item["product_name"]}</td><td>{item["demand"]:.2f} {item["unit"]}</td><td>{item["stock"]:.2f}</td><td>{item["to_produce"]:.2f}</td><td>{item["milk_liters"]:.1f}</td></tr>'
+        content += '</tbody></table>'
+        content += '<h3>Demand by Shop</h3><table class="table table-striped table-hover"><thead><tr><th>Product</th><th>Shop</th><th>Moving Average / Day</th><th>Forecast</th></tr></thead><tbody>'
+        for row in forecasts:
+            content += f'<tr><td>{row["product_name"]}</td><td>{row["shop"]}</td><td>{row["moving_average"]:.2f}</td><td>{row["demand"]:.2f}</td></tr>'
+        content += '</tbody></table>'
+    return render_page(content)
+
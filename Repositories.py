@@ -0,0 +1,372 @@
+import sqlite3
+from typing import Iterable, List, Optional, Sequence, Tuple
+import Accounts
+import Pricing
+
+# Typed row objects. __slots__ keeps them small and attribute access is a
+# slot lookup instead of a sqlite3.Row key search. Item access (row['name'])
+# is kept so rows can be dropped into the existing templates.
+class Record:
+    __slots__ = ()
+
+    def __init__(self, *values):
+        for name, value in zip(self.__slots__, values):
+            setattr(self, name, value)
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+    def as_tuple(self) -> tuple:
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __repr__(self):
+        fields = ', '.join(f'{name}={getattr(self, name)!r}' for name in self.__slots__)
+        return f'{type(self).__name__}({fields})'
+
+class Supplier(Record):
+    __slots__ = ('id', 'name', 'contact', 'address')
+    id: int
+    name: str
+    contact: Optional[str]
+    address: Optional[str]
+
+class MilkCollection(Record):
+    __slots__ = ('id', 'date', 'source_type', 'supplier_id', 'quantity_liters', 'fat_content', 'collected_by_employee')
+    id: int
+    date: str
+    source_type: str
+    supplier_id: Optional[int]
+    quantity_liters: float
+    fat_content: Optional[float]
+    collected_by_employee: Optional[int]
+
+class MilkSeparation(Record):
+    __slots__ = ('id', 'date', 'milk_collection_id', 'milk_used_liters', 'cream_liters', 'skimmed_milk_liters', 'whole_milk_liters')
+    id: int
+    date: str
+    milk_collection_id: int
+    milk_used_liters: float
+    cream_liters: Optional[float]
+    skimmed_milk_liters: Optional[float]
+    whole_milk_liters: Optional[float]
+
+class Product(Record):
+    __slots__ = ('id', 'product_name', 'category', 'ratio_to_milk', 'unit')
+    id: int
+    product_name: str
+    category: Optional[str]
+    ratio_to_milk: Optional[float]
+    unit: Optional[str]
+
+class Production(Record):
+    __slots__ = ('id', 'date', 'product_id', 'milk_used_liters', 'quantity_produced', 'produced_by_employee')
+    id: int
+    date: str
+    product_id: int
+    milk_used_liters: float
+    quantity_produced: float
+    produced_by_employee: Optional[int]
+
+class StockLevel(Record):
+    __slots__ = ('id', 'product_id', 'current_quantity', 'last_updated')
+    id: int
+    product_id: int
+    current_quantity: float
+    last_updated: str
+
+class Sale(Record):
+    __slots__ = ('id', 'date', 'customer_id', 'shop_id', 'product_id', 'quantity', 'total_price')
+    id: int
+    date: str
+    customer_id: int
+    shop_id: int
+    product_id: int
+    quantity: float
+    total_price: float
+
+class Expense(Record):
+    __slots__ = ('id', 'date', 'shop_id', 'description', 'amount', 'category_id')
+    id: int
+    date: str
+    shop_id: int
+    description: Optional[str]
+    amount: float
+    category_id: Optional[int]
+
+class Salary(Record):
+    __slots__ = ('id', 'employee_id', 'date', 'amount_paid', 'period')
+    id: int
+    employee_id: int
+    date: str
+    amount_paid: float
+    period: Optional[str]
+
+class Customer(Record):
+    __slots__ = ('id', 'name', 'contact', 'address')
+    id: int
+    name: str
+    contact: Optional[str]
+    address: Optional[str]
+
+class Shop(Record):
+    __slots__ = ('id', 'name', 'type', 'location')
+    id: int
+    name: str
+    type: Optional[str]
+    location: Optional[str]
+
+class Employee(Record):
+    __slots__ = ('id', 'name', 'role', 'position', 'shop_id', 'monthly_salary', 'join_date')
+    id: int
+    name: str
+    role: Optional[str]
+    position: Optional[str]
+    shop_id: Optional[int]
+    monthly_salary: Optional[float]
+    join_date: Optional[str]
+
+# Generic table repository. The SQL for each table is built once, when the
+# class is defined, so every call passes the same string and hits the
+# connection's statement cache instead of re-preparing the statement.
+class Repository:
+    table = ''
+    record = Record
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        columns = cls.record.__slots__
+        data_columns = [c for c in columns if c != 'id']
+        cls.select_sql = f'SELECT {", ".join(columns)} FROM {cls.table}'
+        cls.get_sql = f'{cls.select_sql} WHERE id = ?'
+        cls.insert_sql = f'INSERT INTO {cls.table} ({", ".join(data_columns)}) VALUES ({", ".join("?" for _ in data_columns)})'
+        cls.delete_sql = f'DELETE FROM {cls.table} WHERE id = ?'
+        cls.data_columns = tuple(data_columns)
+        cls.update_sql = cls._update_sql(cls.data_columns)
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    # UPDATE statements are keyed by the set of columns written, so a partial
+    # update always reuses one SQL string per column set
+    @classmethod
+    def _update_sql(cls, names):
+        cache = cls.__dict__.get('_update_cache')
+        if cache is None:
+            cache = cls._update_cache = {}
+        sql = cache.get(names)
+        if sql is None:
+            unknown = set(names) - set(cls.data_columns)
+            if unknown:
+                raise ValueError(f"Unknown {cls.table} columns: {', '.join(sorted(unknown))}")
+            sql = cache[names] = f'UPDATE {cls.table} SET {", ".join(c + " = ?" for c in names)} WHERE id = ?'
+        return sql
+
+    def _query(self, sql: str, params: Sequence = ()) -> sqlite3.Cursor:
+        cursor = self.conn.cursor()
+        record = self.record
+        cursor.row_factory = lambda _cursor, row: record(*row)
+        return cursor.execute(sql, params)
+
+    def get(self, id: int):
+        return self._query(self.get_sql, (id,)).fetchone()
+
+    def list(self) -> List:
+        return self._query(self.select_sql).fetchall()
+
+    def _values(self, fields: dict) -> list:
+        return [fields.get(c) for c in self.data_columns]
+
+    def insert(self, **fields) -> int:
+        return self.conn.execute(self.insert_sql, self._values(fields)).lastrowid
+
+    def insert_many(self, rows: Iterable[dict]) -> int:
+        return self.conn.executemany(self.insert_sql, (self._values(r) for r in rows)).rowcount
+
+    # Write only the given columns
+    def update(self, id: int, **fields) -> int:
+        names = tuple(fields)
+        return self.conn.execute(self._update_sql(names), [fields[c] for c in names] + [id]).rowcount
+
+    # Batch variant: every row must set the same columns
+    def update_many(self, rows: Iterable[Tuple[int, dict]], columns: Sequence[str] = None) -> int:
+        names = tuple(columns or self.data_columns)
+        return self.conn.executemany(self._update_sql(names),
+                                     ([f.get(c) for c in names] + [i] for i, f in rows)).rowcount
+
+    def delete(self, id: int) -> int:
+        return self.conn.execute(self.delete_sql, (id,)).rowcount
+
+    def delete_many(self, ids: Iterable[int]) -> int:
+        return self.conn.executemany(self.delete_sql, ((i,) for i in ids)).rowcount
+
+class SupplierRepository(Repository):
+    table = 'Suppliers'
+    record = Supplier
+
+class MilkCollectionRepository(Repository):
+    table = 'MilkCollection'
+    record = MilkCollection
+
+class MilkSeparationRepository(Repository):
+    table = 'MilkSeparation'
+    record = MilkSeparation
+
+class ProductRepository(Repository):
+    table = 'Products'
+    record = Product
+
+    # Quantity produced from a given volume of milk (ratio_to_milk litres per unit)
+    def quantity_from_milk(self, product_id: int, milk_used_liters: float) -> float:
+        product = self.get(product_id)
+        ratio = float(product.ratio_to_milk) if product and product.ratio_to_milk else 1.0
+        return milk_used_liters / ratio
+
+class ProductionRepository(Repository):
+    table = 'Production'
+    record = Production
+
+class StockRepository(Repository):
+    table = 'Stock'
+    record = StockLevel
+
+    quantity_sql = 'SELECT current_quantity FROM Stock WHERE product_id = ?'
+    adjust_sql = 'UPDATE Stock SET current_quantity = current_quantity + ?, last_updated = ? WHERE product_id = ?'
+    delete_product_sql = 'DELETE FROM Stock WHERE product_id = ?'
+
+    def quantity(self, product_id: int) -> float:
+        row = self.conn.execute(self.quantity_sql, (product_id,)).fetchone()
+        return row[0] if row else 0
+
+    # Add delta (negative to take stock out) to a product's stock
+    def adjust(self, product_id: int, delta: float, on_date) -> int:
+        return self.conn.execute(self.adjust_sql, (delta, on_date, product_id)).rowcount
+
+    # Batch variant: [(product_id, delta, on_date), ...]
+    def adjust_many(self, changes: Iterable[Tuple[int, float, object]]) -> int:
+        return self.conn.executemany(self.adjust_sql, ((d, on, p) for p, d, on in changes)).rowcount
+
+    def delete_for_product(self, product_id: int) -> int:
+        return self.conn.execute(self.delete_product_sql, (product_id,)).rowcount
+
+class SaleRepository(Repository):
+    table = 'Sales'
+    record = Sale
+
+class ExpenseRepository(Repository):
+    table = 'Expenses'
+    record = Expense
+
+class SalaryRepository(Repository):
+    table = 'Salaries'
+    record = Salary
+
+class CustomerRepository(Repository):
+    table = 'Customers'
+    record = Customer
+
+class ShopRepository(Repository):
+    table = 'Shops'
+    record = Shop
+
+class EmployeeRepository(Repository):
+    table = 'Employees'
+    record = Employee
+
+# Repository class by table name
+REPOSITORIES = {cls.table: cls for cls in Repository.__subclasses__()}
+
+# Stock-keeping operations shared by the web UI and Daily_Operations. They
+# run on the caller's connection and leave committing to the caller, so a
+# record and its stock movement always land in the same transaction.
+
+# Add a product with an empty stock row; returns the product id
+def add_product(conn, product_name, category, ratio_to_milk, unit, on_date):
+    product_id = ProductRepository(conn).insert(product_name=product_name, category=category,
+                                                ratio_to_milk=ratio_to_milk, unit=unit)
+    StockRepository(conn).insert(product_id=product_id, current_quantity=0, last_updated=on_date)
+    return product_id
+
+# Reverse an old stock movement and apply a new one. When the product is
+# unchanged only the net difference is applied, so stock never dips through
+# a reorder level in between.
+def _move_stock(stock, old_product_id, old_delta, product_id, delta, on_date):
+    if old_product_id == int(product_id):
+        stock.adjust(product_id, old_delta + delta, on_date)
+    else:
+        stock.adjust_many([(old_product_id, old_delta, on_date), (product_id, delta, on_date)])
+
+# Record a production run and add its output to stock; returns the quantity produced
+def record_production(conn, on_date, product_id, milk_used_liters, produced_by_employee):
+    quantity_produced = ProductRepository(conn).quantity_from_milk(product_id, milk_used_liters)
+    ProductionRepository(conn).insert(date=on_date, product_id=product_id, milk_used_liters=milk_used_liters,
+                                      quantity_produced=quantity_produced, produced_by_employee=produced_by_employee)
+    StockRepository(conn).adjust(product_id, quantity_produced, on_date)
+    return quantity_produced
+
+def update_production(conn, id, on_date, product_id, milk_used_liters, produced_by_employee):
+    productions = ProductionRepository(conn)
+    stock = StockRepository(conn)
+    old = productions.get(id)
+    quantity_produced = ProductRepository(conn).quantity_from_milk(product_id, milk_used_liters)
+    productions.update(id, date=on_date, product_id=product_id, milk_used_liters=milk_used_liters,
+                       quantity_produced=quantity_produced, produced_by_employee=produced_by_employee)
+    _move_stock(stock, old.product_id, -old.quantity_produced, product_id, quantity_produced, on_date)
+    return quantity_produced
+
+def delete_production(conn, id, on_date):
+    productions = ProductionRepository(conn)
+    old = productions.get(id)
+    StockRepository(conn).adjust(old.product_id, -old.quantity_produced, on_date)
+    productions.delete(id)
+
+# Record a sale and take it out of stock. Returns None when there is not
+# enough stock (nothing is written), else the new sale id. A total_price of
+# None is priced from the price list (Pricing.PriceNotFound if there is no
+# price). Raises Accounts.CreditLimitExceeded when the customer's credit
+# would be exceeded.
+def record_sale(conn, on_date, customer_id, shop_id, product_id, quantity, total_price=None):
+    stock = StockRepository(conn)
+    if stock.quantity(product_id) < quantity:
+        return None
+    if total_price is None:
+        total_price = Pricing.quote(conn, product_id, shop_id, customer_id, on_date, quantity)
+    Accounts.check_credit(conn, customer_id, total_price)
+    sale_id = SaleRepository(conn).insert(date=on_date, customer_id=customer_id, shop_id=shop_id,
+                                          product_id=product_id, quantity=quantity, total_price=total_price)
+    stock.adjust(product_id, -quantity, on_date)
+    return sale_id
+
+# Returns False when the change needs more stock than is available.
+# total_price=None reprices the sale from the price list.
+def update_sale(conn, id, on_date, customer_id, shop_id, product_id, quantity, total_price=None):
+    sales = SaleRepository(conn)
+    stock = StockRepository(conn)
+    old = sales.get(id)
+    needed = quantity - old.quantity if old.product_id == int(product_id) else quantity
+    if stock.quantity(product_id) < needed:
+        return False
+    if total_price is None:
+        total_price = Pricing.quote(conn, product_id, shop_id, customer_id, on_date, quantity)
+    Accounts.check_credit(conn, customer_id, total_price,
+                          released=old.total_price if old.customer_id == int(customer_id) else 0.0)
+    sales.update(id, date=on_date, customer_id=customer_id, shop_id=shop_id,
+                 product_id=product_id, quantity=quantity, total_price=total_price)
+    _move_stock(stock, old.product_id, old.quantity, product_id, -quantity, on_date)
+    return True
+
+def delete_sale(conn, id, on_date):
+    sales = SaleRepository(conn)
+    old = sales.get(id)
+    StockRepository(conn).adjust(old.product_id, old.quantity, on_date)
+    sales.delete(id)
+
+# Plain tables, with no stock movement: the web UI's add and edit pages write
+# them through their repository, passing the form's fields as a dict of columns
+def insert_record(conn, table, fields):
+    return REPOSITORIES[table](conn).insert(**fields)
+
+def update_record(conn, table, id, fields):
+    return REPOSITORIES[table](conn).update(id, **fields)
+
+def delete_record(conn, table, id):
+    return REPOSITORIES[table](conn).delete(id)
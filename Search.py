@@ -0,0 +1,169 @@
+import re
+
+# Entities in the search index: (table, code, name column, contact column, address column).
+# The FTS rowid is id * 4 + code, so triggers find an entity's entry by rowid
+# instead of scanning the index.
+SEARCH_ENTITIES = [
+    ('Customers', 0, 'name', 'contact', 'address'),
+    ('Suppliers', 1, 'name', 'contact', 'address'),
+    ('Products', 2, 'product_name', 'category', 'unit'),
+    ('Employees', 3, 'name', 'role', 'position'),
+]
+
+# Search words shorter than this are ignored: a one-letter prefix matches
+# most of the index
+MIN_TERM_LENGTH = 2
+
+# Queries whose words are all shorter than this match too many rows to
+# rank them all; they return name matches in index order instead
+SHORT_TERM_LENGTH = 3
+
+# Prefix indexes for two- and three-letter terms, the typeahead's hot path
+SEARCH_INDEX = '''
+CREATE VIRTUAL TABLE SearchIndex USING fts5(
+    entity UNINDEXED, entity_id UNINDEXED, name, contact, address,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+)
+'''
+
+# Create the FTS5 index, its vocabulary (for typo correction) and the
+# triggers that keep it in sync. A new index is built from the base tables.
+def ensure_search_schema(conn):
+    rebuild = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='SearchIndex'").fetchone() is None
+    if rebuild:
+        conn.execute(SEARCH_INDEX)
+    conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS SearchTerms USING fts5vocab(SearchIndex, 'row')")
+    for table, code, name_col, contact_col, address_col in SEARCH_ENTITIES:
+        insert_values = f"NEW.id * 4 + {code}, '{table}', NEW.id, NEW.{name_col}, NEW.{contact_col}, NEW.{address_col}"
+        conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS search_{table}_insert AFTER INSERT ON {table}
+        BEGIN
+            INSERT INTO SearchIndex (rowid, entity, entity_id, name, contact, address) VALUES ({insert_values});
+        END
+        ''')
+        conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS search_{table}_update AFTER UPDATE ON {table}
+        BEGIN
+            DELETE FROM SearchIndex WHERE rowid = OLD.id * 4 + {code};
+            INSERT INTO SearchIndex (rowid, entity, entity_id, name, contact, address) VALUES ({insert_values});
+        END
+        ''')
+        conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS search_{table}_delete AFTER DELETE ON {table}
+        BEGIN
+            DELETE FROM SearchIndex WHERE rowid = OLD.id * 4 + {code};
+        END
+        ''')
+    if rebuild:
+        rebuild_search_index(conn)
+
+def rebuild_search_index(conn):
+    conn.execute('DELETE FROM SearchIndex')
+    for table, code, name_col, contact_col, address_col in SEARCH_ENTITIES:
+        conn.execute(f'''
+        INSERT INTO SearchIndex (rowid, entity, entity_id, name, contact, address)
+        SELECT id * 4 + {code}, '{table}', id, {name_col}, {contact_col}, {address_col} FROM {table}
+        ''')
+    conn.execute("INSERT INTO SearchIndex (SearchIndex) VALUES ('optimize')")
+
+def _words(text):
+    return [word for word in re.findall(r'\w+', text.lower()) if len(word) >= MIN_TERM_LENGTH]
+
+# True when b is a one letter insertion, deletion or substitution, or a
+# swap of two neighbouring letters, away from a
+def _one_edit(a, b):
+    if len(a) > len(b):
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    if len(a) < len(b):
+        return len(b) - len(a) == 1 and a[i:] == b[i + 1:]
+    return a[i + 1:] == b[i + 1:] or (a[i + 1:i + 2] + a[i:i + 1] == b[i:i + 2] and a[i + 2:] == b[i + 2:])
+
+# Spellfix-style expansion of a word that matches nothing into FTS5 terms
+# for the indexed words within one insertion, deletion, substitution or
+# transposition of it, e.g. 'jonh' -> ['"john"']. When no whole word is
+# that close, the starts of words are tried instead, as the text may be
+# unfinished ('smih' -> ['"smit"*']). Only words with the same first
+# letter are scanned, which keeps the vocabulary scan short. A word that
+# starts an indexed word is not a typo and gets no corrections.
+def _correction_terms(conn, word):
+    size = len(word)
+    rows = conn.execute('''
+    SELECT DISTINCT substr(term, 1, :size + 1), length(term) <= :size + 1
+    FROM SearchTerms WHERE term >= :first AND term < :next
+    ''', {'size': size, 'first': word[0], 'next': chr(ord(word[0]) + 1)}).fetchall()
+    if any(start.startswith(word) for start, _ in rows):
+        return []
+
+    def close(candidates):
+        return sorted(c for c in candidates if len(c) >= MIN_TERM_LENGTH and _one_edit(word, c))
+
+    whole = close(start for start, is_word in rows if is_word)
+    if whole:
+        return [f'"{c}"' for c in whole]
+    found = close({start[:length] for start, _ in rows for length in (size - 1, size, size + 1)})
+    # A correction that extends another one adds nothing
+    return [f'"{c}"*' for c in found if not any(c != other and c.startswith(other) for other in found)]
+
+# Turn words into an FTS5 query of quoted prefix terms, e.g. ['jo', 'do'] -> '"jo"* "do"*'
+def _prefix_terms(words):
+    return [f'"{word}"*' for word in words]
+
+# Top-N matches ranked by bm25, with name matches weighted highest. Words
+# of one letter are ignored. All words must match; if nothing does, each
+# word may also match indexed words a typo away, then any word may match.
+def search(conn, text, limit=10, entity=None):
+    words = _words(text)
+    if not words:
+        return []
+    if all(len(word) < SHORT_TERM_LENGTH for word in words):
+        return _short_search(conn, words, limit, entity)
+    terms = _prefix_terms(words)
+    sql = '''
+    SELECT entity, entity_id, name, contact, address
+    FROM SearchIndex WHERE SearchIndex MATCH ?
+    '''
+    if entity:
+        sql += ' AND entity = ?'
+    sql += ' ORDER BY bm25(SearchIndex, 0, 0, 10.0, 2.0, 1.0) LIMIT ?'
+    params = [' '.join(terms)] + ([entity] if entity else []) + [limit]
+    rows = conn.execute(sql, params).fetchall()
+    if rows:
+        return rows
+    expanded = []
+    for word, term in zip(words, terms):
+        corrections = _correction_terms(conn, word) if len(word) >= SHORT_TERM_LENGTH else []
+        expanded.append('(' + ' OR '.join(corrections) + ')' if corrections else term)
+    if expanded != terms:
+        params[0] = ' AND '.join(expanded)
+        rows = conn.execute(sql, params).fetchall()
+        if rows:
+            return rows
+    if len(terms) == 1:
+        return rows
+    params[0] = ' OR '.join(terms)
+    return conn.execute(sql, params).fetchall()
+
+# Name matches first, then matches on any column, in index order
+def _short_search(conn, words, limit, entity):
+    sql = '''
+    SELECT entity, entity_id, name, contact, address
+    FROM SearchIndex WHERE SearchIndex MATCH ?
+    '''
+    if entity:
+        sql += ' AND entity = ?'
+    sql += ' LIMIT ?'
+    query = ' '.join(_prefix_terms(words))
+    rows, seen = [], set()
+    for match in ('name : (' + query + ')', query):
+        params = [match] + ([entity] if entity else []) + [limit]
+        for row in conn.execute(sql, params):
+            if (row[0], row[1]) not in seen and len(rows) < limit:
+                seen.add((row[0], row[1]))
+                rows.append(row)
+        if len(rows) == limit:
+            break
+    return rows
@@ -0,0 +1,140 @@
+import json
+from datetime import datetime
+
+# Supplier settlement: price per litre comes from fat-content bands that
+# take effect from a date. Settlements are per supplier per month.
+def ensure_settlement_schema(conn):
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='SettlementDirtyPeriods'").fetchone()
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS FatPriceBands (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        effective_from DATE NOT NULL,
+        min_fat REAL NOT NULL,
+        max_fat REAL NOT NULL,
+        price_per_liter REAL NOT NULL
+    )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_fat_bands_effective ON FatPriceBands (effective_from, min_fat)')
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS SupplierSettlements (
+        supplier_id INTEGER NOT NULL,
+        period TEXT NOT NULL,
+        collections INTEGER NOT NULL,
+        liters REAL NOT NULL,
+        avg_fat REAL,
+        amount REAL NOT NULL,
+        unpriced_liters REAL NOT NULL,
+        computed_at TEXT NOT NULL,
+        PRIMARY KEY (supplier_id, period),
+        FOREIGN KEY (supplier_id) REFERENCES Suppliers(id)
+    )
+    ''')
+    # Months whose settlements are out of date, filled by the triggers below
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS SettlementDirtyPeriods (
+        period TEXT PRIMARY KEY
+    ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS settlement_collection_insert AFTER INSERT ON MilkCollection
+    BEGIN
+        INSERT OR IGNORE INTO SettlementDirtyPeriods VALUES (substr(NEW.date, 1, 7));
+    END
+    ''')
+    # Only columns that change a settlement: ON DELETE SET NULL clearing the
+    # employee reference would override the OR IGNORE below (see Dairy.TABLES)
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS settlement_collection_update
+    AFTER UPDATE OF date, supplier_id, quantity_liters, fat_content ON MilkCollection
+    BEGIN
+        INSERT OR IGNORE INTO SettlementDirtyPeriods VALUES (substr(OLD.date, 1, 7));
+        INSERT OR IGNORE INTO SettlementDirtyPeriods VALUES (substr(NEW.date, 1, 7));
+    END
+    ''')
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS settlement_collection_delete AFTER DELETE ON MilkCollection
+    BEGIN
+        INSERT OR IGNORE INTO SettlementDirtyPeriods VALUES (substr(OLD.date, 1, 7));
+    END
+    ''')
+    # A change to the price table can affect every month from its effective date
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS settlement_bands_insert AFTER INSERT ON FatPriceBands
+    BEGIN
+        INSERT OR IGNORE INTO SettlementDirtyPeriods
+        SELECT DISTINCT substr(date, 1, 7) FROM MilkCollection WHERE date >= NEW.effective_from;
+    END
+    ''')
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS settlement_bands_update AFTER UPDATE ON FatPriceBands
+    BEGIN
+        INSERT OR IGNORE INTO SettlementDirtyPeriods
+        SELECT DISTINCT substr(date, 1, 7) FROM MilkCollection WHERE date >= MIN(OLD.effective_from, NEW.effective_from);
+    END
+    ''')
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS settlement_bands_delete AFTER DELETE ON FatPriceBands
+    BEGIN
+        INSERT OR IGNORE INTO SettlementDirtyPeriods
+        SELECT DISTINCT substr(date, 1, 7) FROM MilkCollection WHERE date >= OLD.effective_from;
+    END
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_milk_collection_date ON MilkCollection (date)')
+    if not exists:
+        # Collections recorded before the triggers existed still need settling
+        conn.execute('INSERT OR IGNORE INTO SettlementDirtyPeriods SELECT DISTINCT substr(date, 1, 7) FROM MilkCollection')
+
+# Price every collection of the given months and total per supplier in one
+# grouped pass. Each collection uses the latest band effective on its date
+# whose fat range contains its fat_content; collections with no matching
+# band are reported as unpriced litres rather than silently paid at zero.
+SETTLEMENT_QUERY = '''
+INSERT INTO SupplierSettlements (supplier_id, period, collections, liters, avg_fat, amount, unpriced_liters, computed_at)
+SELECT mc.supplier_id, substr(mc.date, 1, 7) AS period,
+       COUNT(*),
+       SUM(mc.quantity_liters),
+       SUM(mc.quantity_liters * mc.fat_content) / SUM(CASE WHEN mc.fat_content IS NOT NULL THEN mc.quantity_liters END),
+       TOTAL(mc.quantity_liters * (
+           SELECT b.price_per_liter FROM FatPriceBands b
+           WHERE b.effective_from <= mc.date AND mc.fat_content >= b.min_fat AND mc.fat_content < b.max_fat
+           ORDER BY b.effective_from DESC LIMIT 1)),
+       TOTAL(CASE WHEN NOT EXISTS (
+           SELECT 1 FROM FatPriceBands b
+           WHERE b.effective_from <= mc.date AND mc.fat_content >= b.min_fat AND mc.fat_content < b.max_fat)
+           THEN mc.quantity_liters END),
+       :computed_at
+FROM MilkCollection mc
+WHERE mc.supplier_id IS NOT NULL
+  AND substr(mc.date, 1, 7) IN (SELECT value FROM json_each(:periods))
+GROUP BY mc.supplier_id, period
+'''
+
+# Recompute the given periods ('YYYY-MM'), or every period touched since the
+# last run when none are given. Runs on the caller's write transaction and
+# leaves committing to it; returns the periods.
+def run_settlement(conn, periods=None):
+    if periods is None:
+        periods = [row[0] for row in conn.execute('SELECT period FROM SettlementDirtyPeriods ORDER BY period')]
+    if not periods:
+        return []
+    periods_json = json.dumps(list(periods))
+    conn.execute('DELETE FROM SupplierSettlements WHERE period IN (SELECT value FROM json_each(?))', (periods_json,))
+    conn.execute(SETTLEMENT_QUERY, {'periods': periods_json,
+                                    'computed_at': datetime.now().isoformat(timespec='seconds')})
+    conn.execute('DELETE FROM SettlementDirtyPeriods WHERE period IN (SELECT value FROM json_each(?))', (periods_json,))
+    return list(periods)
+
+def list_settlements(conn, period=None):
+    sql = '''
+    SELECT ss.*, s.name AS supplier
+    FROM SupplierSettlements ss JOIN Suppliers s ON s.id = ss.supplier_id
+    '''
+    params = ()
+    if period:
+        sql += ' WHERE ss.period = ?'
+        params = (period,)
+    sql += ' ORDER BY ss.period DESC, s.name'
+    return conn.execute(sql, params)
+
+def list_price_bands(conn):
+    return conn.execute('SELECT * FROM FatPriceBands ORDER BY effective_from DESC, min_fat').fetchall()
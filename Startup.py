@@ -0,0 +1,60 @@
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Cold-start benchmark. Each run is a fresh interpreter that does what a
+# serverless or cron invocation does: import the web app, build it and
+# serve one request (through WSGI directly, so no test client is imported).
+# The first run only warms the .pyc files and the template bundle, as a
+# deploy would. The budget covers import + app + first request; process
+# start-up is reported but depends on the interpreter, not on this code.
+
+COLD_START_BUDGET = 0.5  # seconds
+
+def _child(config, path):
+    start = time.perf_counter()
+    import UI
+    imported = time.perf_counter()
+    app = UI.create_app(config)
+    created = time.perf_counter()
+    statuses = []
+    environ = {
+        'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': '', 'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1', 'wsgi.url_scheme': 'http', 'wsgi.version': (1, 0),
+        'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr, 'wsgi.multithread': False,
+        'wsgi.multiprocess': False, 'wsgi.run_once': True,
+    }
+    body = b''.join(app(environ, lambda status, headers, exc_info=None: statuses.append(status)))
+    served = time.perf_counter()
+    return {'import': imported - start, 'app': created - imported, 'first_request': served - created,
+            'status': statuses[0], 'bytes': len(body)}
+
+def _run(config, path):
+    here = os.path.dirname(os.path.abspath(__file__))
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, os.path.join(here, 'Startup.py'), json.dumps(config), path],
+                            capture_output=True, text=True, cwd=os.getcwd(), check=True)
+    process = time.perf_counter() - start
+    timings = json.loads(result.stdout.splitlines()[-1])
+    timings['process'] = process
+    return timings
+
+# Median seconds of each phase over `runs` cold starts, plus 'total'
+# (import + app + first request), the number the budget applies to
+def measure(config, runs=5, path='/'):
+    _run(config, path)
+    samples = [_run(config, path) for _ in range(runs)]
+    if samples[0]['status'][:1] not in ('2', '3'):
+        raise RuntimeError(f"GET {path} answered {samples[0]['status']}")
+    for sample in samples:
+        sample['total'] = sample['import'] + sample['app'] + sample['first_request']
+    return {phase: statistics.median(s[phase] for s in samples)
+            for phase in ('import', 'app', 'first_request', 'total', 'process')}
+
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    print(json.dumps(_child(json.loads(sys.argv[1]), sys.argv[2])))
@@ -0,0 +1,111 @@
+import logging
+
+logger = logging.getLogger('dairy.stock_alerts')
+
+# Low-stock alerts are raised by triggers on Stock, so every stock change is
+# evaluated against its product's threshold as it happens; there is no
+# periodic scan. StockAlerts doubles as the alert queue: rows with
+# logged = 0 have not been emitted to the log yet.
+def ensure_alert_schema(conn):
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS ReorderLevels (
+        product_id INTEGER PRIMARY KEY,
+        threshold REAL NOT NULL,
+        FOREIGN KEY (product_id) REFERENCES Products(id)
+    )
+    ''')
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS StockAlerts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        product_id INTEGER NOT NULL,
+        quantity REAL NOT NULL,
+        threshold REAL NOT NULL,
+        raised_at TEXT NOT NULL,
+        resolved_at TEXT,
+        logged INTEGER NOT NULL DEFAULT 0,
+        FOREIGN KEY (product_id) REFERENCES Products(id)
+    )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_stock_alerts_open ON StockAlerts (product_id) WHERE resolved_at IS NULL')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_stock_alerts_unlogged ON StockAlerts (id) WHERE logged = 0')
+
+    # Raise one open alert per product when stock drops below its threshold,
+    # resolve it when stock is back at or above the threshold.
+    for name, event, source in (
+        ('stock_alert_update', 'AFTER UPDATE OF current_quantity ON Stock', 'NEW'),
+        ('stock_alert_insert', 'AFTER INSERT ON Stock', 'NEW'),
+    ):
+        conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS {name} {event}
+        BEGIN
+            INSERT INTO StockAlerts (product_id, quantity, threshold, raised_at)
+            SELECT {source}.product_id, {source}.current_quantity, r.threshold, datetime('now')
+            FROM ReorderLevels r
+            WHERE r.product_id = {source}.product_id AND {source}.current_quantity < r.threshold
+              AND NOT EXISTS (SELECT 1 FROM StockAlerts a WHERE a.product_id = {source}.product_id AND a.resolved_at IS NULL);
+            UPDATE StockAlerts SET resolved_at = datetime('now')
+            WHERE product_id = {source}.product_id AND resolved_at IS NULL
+              AND {source}.current_quantity >= (SELECT threshold FROM ReorderLevels WHERE product_id = {source}.product_id);
+        END
+        ''')
+    # Setting or changing a threshold evaluates the product's current stock once
+    for name, event in (('reorder_level_insert', 'AFTER INSERT ON ReorderLevels'),
+                        ('reorder_level_update', 'AFTER UPDATE ON ReorderLevels')):
+        conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS {name} {event}
+        BEGIN
+            UPDATE StockAlerts SET resolved_at = datetime('now')
+            WHERE product_id = NEW.product_id AND resolved_at IS NULL
+              AND (SELECT SUM(current_quantity) FROM Stock WHERE product_id = NEW.product_id) >= NEW.threshold;
+            INSERT INTO StockAlerts (product_id, quantity, threshold, raised_at)
+            SELECT s.product_id, s.current_quantity, NEW.threshold, datetime('now')
+            FROM Stock s
+            WHERE s.product_id = NEW.product_id AND s.current_quantity < NEW.threshold
+              AND NOT EXISTS (SELECT 1 FROM StockAlerts a WHERE a.product_id = NEW.product_id AND a.resolved_at IS NULL)
+            LIMIT 1;
+        END
+        ''')
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS reorder_level_delete AFTER DELETE ON ReorderLevels
+    BEGIN
+        UPDATE StockAlerts SET resolved_at = datetime('now') WHERE product_id = OLD.product_id AND resolved_at IS NULL;
+    END
+    ''')
+
+def set_reorder_level(conn, product_id, threshold):
+    if threshold is None:
+        conn.execute('DELETE FROM ReorderLevels WHERE product_id = ?', (product_id,))
+    else:
+        conn.execute('''
+        INSERT INTO ReorderLevels (product_id, threshold) VALUES (?, ?)
+        ON CONFLICT (product_id) DO UPDATE SET threshold = excluded.threshold
+        ''', (product_id, threshold))
+
+def count_open_alerts(conn):
+    return conn.execute('SELECT COUNT(*) FROM StockAlerts WHERE resolved_at IS NULL').fetchone()[0]
+
+def list_open_alerts(conn):
+    return conn.execute('''
+    SELECT a.id, a.product_id, p.product_name, p.unit, a.quantity, a.threshold, a.raised_at,
+           (SELECT SUM(current_quantity) FROM Stock s WHERE s.product_id = a.product_id) AS current_quantity
+    FROM StockAlerts a JOIN Products p ON p.id = a.product_id
+    WHERE a.resolved_at IS NULL
+    ORDER BY a.raised_at
+    ''')
+
+def dismiss_alert(conn, alert_id):
+    conn.execute("UPDATE StockAlerts SET resolved_at = datetime('now') WHERE id = ? AND resolved_at IS NULL", (alert_id,))
+
+# Emit alerts raised since the last drain to the log and mark them logged
+def drain_alerts(conn):
+    alerts = conn.execute('''
+    SELECT a.id, p.product_name, a.quantity, a.threshold
+    FROM StockAlerts a JOIN Products p ON p.id = a.product_id
+    WHERE a.logged = 0 ORDER BY a.id
+    ''').fetchall()
+    for alert_id, product_name, quantity, threshold in alerts:
+        logger.warning("Low stock: %s at %s (reorder level %s)", product_name, quantity, threshold)
+    if alerts:
+        with conn:
+            conn.execute('UPDATE StockAlerts SET logged = 1 WHERE logged = 0 AND id <= ?', (alerts[-1][0],))
+    return len(alerts)
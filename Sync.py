@@ -0,0 +1,345 @@
+import json
+import sqlite3
+import sys
+import urllib.request
+import uuid
+import zlib
+from datetime import date
+import Accounts
+import Config
+import Pricing
+import Repositories
+
+# Terminals upload what they record offline; the server sends back the
+# master data and stock levels the terminals need to keep selling.
+UPLOAD_TABLES = ('Sales', 'Expenses')
+DOWNLOAD_TABLES = ('Products', 'Customers', 'Stock')
+
+# Change-log capture: triggers append (table, row id, op) for every write
+# to the tracked tables. Terminals track UPLOAD_TABLES, the server
+# tracks DOWNLOAD_TABLES. The server records the cursor each terminal
+# last acknowledged and prunes its log below the lowest one; deletes that
+# are pruned stay as tombstones so a full download still carries them.
+def ensure_sync_schema(conn, tables):
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS ChangeLog (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        table_name TEXT NOT NULL,
+        row_id INTEGER NOT NULL,
+        op TEXT NOT NULL
+    )
+    ''')
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS SyncState (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    )
+    ''')
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS SyncIdMap (
+        terminal TEXT NOT NULL,
+        table_name TEXT NOT NULL,
+        local_id INTEGER NOT NULL,
+        server_id INTEGER NOT NULL,
+        PRIMARY KEY (terminal, table_name, local_id)
+    ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS SyncTerminals (
+        terminal TEXT PRIMARY KEY,
+        cursor INTEGER NOT NULL,
+        synced_at TEXT NOT NULL
+    )
+    ''')
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS SyncTombstones (
+        table_name TEXT NOT NULL,
+        row_id INTEGER NOT NULL,
+        PRIMARY KEY (table_name, row_id)
+    ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS SyncRejects (
+        terminal TEXT NOT NULL,
+        table_name TEXT NOT NULL,
+        local_id INTEGER NOT NULL,
+        reason TEXT NOT NULL,
+        PRIMARY KEY (terminal, table_name, local_id)
+    ) WITHOUT ROWID
+    ''')
+    for table in tables:
+        for op, event, ref in (('I', 'INSERT', 'NEW'), ('U', 'UPDATE', 'NEW'), ('D', 'DELETE', 'OLD')):
+            conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS changelog_{table}_{event.lower()} AFTER {event} ON {table}
+            BEGIN
+                INSERT INTO ChangeLog (table_name, row_id, op) VALUES ('{table}', {ref}.id, '{op}');
+            END
+            ''')
+
+def _get_state(conn, key, default=None):
+    row = conn.execute("SELECT value FROM SyncState WHERE key=?", (key,)).fetchone()
+    return row[0] if row else default
+
+def _set_state(conn, key, value):
+    conn.execute("INSERT OR REPLACE INTO SyncState (key, value) VALUES (?, ?)", (key, str(value)))
+
+def _columns(conn, table):
+    return [row[1] for row in conn.execute(f'PRAGMA table_info({table})')]
+
+# Collapse change-log entries to the final state of each row:
+# {table: {'columns': [...], 'upserts': [[id, ...], ...], 'deletes': [id, ...]}}
+def _collect_changes(conn, tables, after_seq, upto_seq):
+    changes = {}
+    for table in tables:
+        ids = [row[0] for row in conn.execute(
+            "SELECT DISTINCT row_id FROM ChangeLog WHERE table_name=? AND seq > ? AND seq <= ?",
+            (table, after_seq, upto_seq))]
+        changes[table] = _snapshot_rows(conn, table, ids)
+    return changes
+
+# All rows of a table, or just `ids` (rows no longer there become deletes).
+# A full snapshot carries every delete still known to the server, so rows a
+# terminal kept from before are removed too.
+def _snapshot_rows(conn, table, ids=None):
+    columns = _columns(conn, table)
+    if ids is None:
+        rows = conn.execute(f'SELECT {", ".join(columns)} FROM {table}').fetchall()
+        deletes = [row[0] for row in conn.execute(f'''
+        SELECT row_id FROM ChangeLog WHERE table_name = :table AND op = 'D'
+        UNION SELECT row_id FROM SyncTombstones WHERE table_name = :table
+        EXCEPT SELECT id FROM {table}
+        ''', {'table': table})]
+        return {'columns': columns, 'upserts': [list(r) for r in rows], 'deletes': deletes}
+    upserts, deletes = [], []
+    select_sql = f'SELECT {", ".join(columns)} FROM {table} WHERE id=?'
+    for row_id in ids:
+        row = conn.execute(select_sql, (row_id,)).fetchone()
+        if row is None:
+            deletes.append(row_id)
+        else:
+            upserts.append(list(row))
+    return {'columns': columns, 'upserts': upserts, 'deletes': deletes}
+
+def encode_payload(obj):
+    return zlib.compress(json.dumps(obj, separators=(',', ':'), default=str).encode('utf-8'))
+
+def decode_payload(data):
+    return json.loads(zlib.decompress(data).decode('utf-8'))
+
+# Highest sequence number ever logged; unlike MAX(seq) it survives pruning
+def _high_water(conn):
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'ChangeLog'").fetchone()
+    return row[0] if row else 0
+
+# --- Terminal side ---
+
+# The cursor is None until the first download has been applied; the server
+# answers None with a full snapshot
+def build_upload(conn, terminal):
+    upto_seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM ChangeLog").fetchone()[0]
+    cursor = _get_state(conn, 'download_cursor')
+    return {
+        'terminal': terminal,
+        'cursor': int(cursor) if cursor is not None else None,
+        'upto_seq': upto_seq,
+        'changes': _collect_changes(conn, UPLOAD_TABLES, 0, upto_seq),
+    }
+
+# Rows the server refused stay in the log and go up again next time
+def apply_download(conn, upload, response):
+    with conn:
+        for table, delta in response['changes'].items():
+            cols = delta['columns']
+            placeholders = ', '.join('?' for _ in cols)
+            conn.executemany(f'INSERT OR REPLACE INTO {table} ({", ".join(cols)}) VALUES ({placeholders})',
+                             delta['upserts'])
+            conn.executemany(f'DELETE FROM {table} WHERE id=?', [(i,) for i in delta['deletes']])
+        # Everything up to upto_seq is now on the server. Other readers of
+        # the log (Consolidation.py) see it was pruned past them.
+        conn.execute("DELETE FROM ChangeLog WHERE seq <= ?", (upload['upto_seq'],))
+        _set_state(conn, 'pruned_through', upload['upto_seq'])
+        conn.executemany("INSERT INTO ChangeLog (table_name, row_id, op) VALUES (?, ?, 'U')",
+                         [(table, local_id) for table, local_id, _ in response['rejected']])
+        _set_state(conn, 'download_cursor', response['cursor'])
+        conn.execute("DELETE FROM SyncState WHERE key = 'upload_key'")
+
+# Each upload carries an idempotency key, kept until its download is
+# applied: a retry of the same upload (say after a timeout) reuses it, so
+# the server applies it once. Rows logged since get a new upload and key.
+def _upload_key(conn, upload):
+    pending = _get_state(conn, 'upload_key')
+    if pending and pending.split(':')[0] == str(upload['upto_seq']):
+        return pending.split(':')[1]
+    key = uuid.uuid4().hex
+    with conn:
+        _set_state(conn, 'upload_key', f"{upload['upto_seq']}:{key}")
+    return key
+
+# One round trip: upload pending Sales/Expenses, download master data deltas
+def sync_terminal(db_path, server_url, terminal, timeout=60):
+    conn = sqlite3.connect(db_path)
+    try:
+        with conn:
+            ensure_sync_schema(conn, UPLOAD_TABLES)
+        upload = build_upload(conn, terminal)
+        request = urllib.request.Request(server_url.rstrip('/') + '/sync', data=encode_payload(upload),
+                                         headers={'Content-Type': 'application/octet-stream',
+                                                  'Idempotency-Key': _upload_key(conn, upload)})
+        with urllib.request.urlopen(request, timeout=timeout) as resp:
+            response = decode_payload(resp.read())
+        apply_download(conn, upload, response)
+    finally:
+        conn.close()
+    return response['applied']
+
+# --- Server side ---
+
+# Synced sales go through the same stock, price list and credit limit
+# checks as sales entered on the server. Returns the server id, or None
+# when the sale was refused for lack of stock.
+def _apply_sale(conn, row, columns, server_id):
+    sale = dict(zip(columns, row))
+    values = (sale['date'], sale['customer_id'], sale['shop_id'], sale['product_id'],
+              sale['quantity'], sale.get('total_price'))
+    if server_id is not None and conn.execute("SELECT 1 FROM Sales WHERE id=?", (server_id,)).fetchone():
+        return server_id if Repositories.update_sale(conn, server_id, *values) else None
+    return Repositories.record_sale(conn, *values)
+
+def _apply_row(conn, table, row, columns, server_id):
+    set_cols = [c for c in columns if c != 'id']
+    values = [v for c, v in zip(columns, row) if c != 'id']
+    if server_id is not None:
+        cur = conn.execute(f'UPDATE {table} SET {", ".join(c + "=?" for c in set_cols)} WHERE id=?', values + [server_id])
+        if cur.rowcount:
+            return server_id
+    return conn.execute(f'INSERT INTO {table} ({", ".join(set_cols)}) VALUES ({", ".join("?" for _ in set_cols)})',
+                        values).lastrowid
+
+def _delete_row(conn, table, server_id):
+    if table == 'Sales':
+        if conn.execute("SELECT 1 FROM Sales WHERE id=?", (server_id,)).fetchone():
+            Repositories.delete_sale(conn, server_id, date.today())
+        return
+    conn.execute(f'DELETE FROM {table} WHERE id=?', (server_id,))
+
+# Errors that refuse one uploaded row rather than the whole upload: a
+# credit limit, a missing price, a closed period or a deleted customer
+REJECTED_ERRORS = (Accounts.CreditLimitExceeded, Pricing.PriceNotFound, sqlite3.IntegrityError)
+
+class RowRejected(Exception):
+    pass
+
+def _server_id(conn, terminal, table, local_id):
+    row = conn.execute("SELECT server_id FROM SyncIdMap WHERE terminal=? AND table_name=? AND local_id=?",
+                       (terminal, table, local_id)).fetchone()
+    return row[0] if row else None
+
+# Apply one row in a savepoint, so a refused row leaves nothing behind
+def _apply_upsert(conn, table, row, columns, server_id):
+    conn.execute('SAVEPOINT sync_row')
+    try:
+        if table == 'Sales':
+            server_id = _apply_sale(conn, row, columns, server_id)
+            if server_id is None:
+                raise RowRejected('not enough stock')
+        else:
+            server_id = _apply_row(conn, table, row, columns, server_id)
+    except REJECTED_ERRORS as e:
+        conn.execute('ROLLBACK TO sync_row')
+        raise RowRejected(str(e))
+    finally:
+        conn.execute('RELEASE sync_row')
+    return server_id
+
+# Apply a terminal upload and build its download. Runs on the caller's
+# write transaction (the /sync route uses Web.run_operation). Re-sending
+# the same upload is safe: terminal ids are mapped to server ids, so a
+# repeated insert becomes an update of the same server row. Rows the
+# server refuses are listed in 'rejected' as [table, local id, reason].
+def apply_sync(conn, upload):
+    terminal = upload['terminal']
+    applied, rejected = 0, []
+    ensure_sync_schema(conn, DOWNLOAD_TABLES)
+    for table in UPLOAD_TABLES:
+        delta = upload['changes'].get(table)
+        if not delta:
+            continue
+        columns = delta['columns']
+        id_pos = columns.index('id')
+        for row in delta['upserts']:
+            local_id = row[id_pos]
+            try:
+                server_id = _apply_upsert(conn, table, row, columns, _server_id(conn, terminal, table, local_id))
+            except RowRejected as e:
+                rejected.append([table, local_id, str(e)])
+                continue
+            conn.execute("INSERT OR REPLACE INTO SyncIdMap (terminal, table_name, local_id, server_id) VALUES (?, ?, ?, ?)",
+                         (terminal, table, local_id, server_id))
+            applied += 1
+        for local_id in delta['deletes']:
+            server_id = _server_id(conn, terminal, table, local_id)
+            if server_id is not None:
+                _delete_row(conn, table, server_id)
+                conn.execute("DELETE FROM SyncIdMap WHERE terminal=? AND table_name=? AND local_id=?",
+                             (terminal, table, local_id))
+                applied += 1
+    conn.execute("DELETE FROM SyncRejects WHERE terminal=?", (terminal,))
+    conn.executemany("INSERT INTO SyncRejects (terminal, table_name, local_id, reason) VALUES (?, ?, ?, ?)",
+                     [[terminal] + r for r in rejected])
+    return _download(conn, upload, applied, rejected)
+
+# The reply to an upload that was already applied (its key was claimed)
+# but whose reply the terminal never got: the download again, with the
+# rows refused the first time
+def resend_download(conn, upload):
+    ensure_sync_schema(conn, DOWNLOAD_TABLES)
+    rejected = [list(r) for r in conn.execute(
+        "SELECT table_name, local_id, reason FROM SyncRejects WHERE terminal=?", (upload['terminal'],))]
+    return _download(conn, upload, 0, rejected)
+
+def _download(conn, upload, applied, rejected):
+    cursor = upload.get('cursor')
+    new_cursor = _high_water(conn)
+    if cursor is None or int(cursor) < int(_get_state(conn, 'pruned_through', 0)):
+        # First sync of this terminal, or its cursor is older than the
+        # log: send full master data
+        changes = {table: _snapshot_rows(conn, table) for table in DOWNLOAD_TABLES}
+        # The snapshot needs no log entries, so nothing is held back for it
+        acknowledged = new_cursor
+    else:
+        changes = _collect_changes(conn, DOWNLOAD_TABLES, int(cursor), new_cursor)
+        acknowledged = int(cursor)
+    conn.execute('''
+    INSERT INTO SyncTerminals (terminal, cursor, synced_at) VALUES (?, ?, datetime('now'))
+    ON CONFLICT (terminal) DO UPDATE SET cursor = excluded.cursor, synced_at = excluded.synced_at
+    ''', (upload['terminal'], acknowledged))
+    prune_changelog(conn)
+    return {'applied': applied, 'rejected': rejected, 'cursor': new_cursor, 'changes': changes}
+
+# Drop server log entries every terminal has acknowledged. Deletes among
+# them are kept as tombstones (until the id is used again) for snapshots.
+# Runs on the caller's transaction; returns the number of entries dropped.
+def prune_changelog(conn):
+    floor = conn.execute('SELECT MIN(cursor) FROM SyncTerminals').fetchone()[0]
+    if floor is None or floor <= int(_get_state(conn, 'pruned_through', 0)):
+        return 0
+    conn.execute('''
+    INSERT OR IGNORE INTO SyncTombstones (table_name, row_id)
+    SELECT table_name, row_id FROM ChangeLog WHERE seq <= ? AND op = 'D'
+    ''', (floor,))
+    for table in DOWNLOAD_TABLES:
+        conn.execute(f'''
+        DELETE FROM SyncTombstones WHERE table_name = ? AND row_id IN (SELECT id FROM {table})
+        ''', (table,))
+    dropped = conn.execute('DELETE FROM ChangeLog WHERE seq <= ?', (floor,)).rowcount
+    _set_state(conn, 'pruned_through', floor)
+    return dropped
+
+# Usage: python Sync.py SERVER_URL TERMINAL_ID
+#        e.g. python Sync.py http://127.0.0.1:5000 shop-2-till-1
+if __name__ == '__main__':
+    if len(sys.argv) < 3:
+        print("Usage: python Sync.py SERVER_URL TERMINAL_ID")
+        sys.exit(1)
+    applied = sync_terminal(Config.load_config()['db_path'], sys.argv[1], sys.argv[2])
+    print(f"Sync complete: {applied} changes uploaded.")
@@ -0,0 +1,149 @@
+import os
+import jinja2
+
+# Page templates. Pages build their content as HTML strings and render it
+# into base.html. The templates are served by a loader rather than passed
+# to render_template_string, which lexed, parsed and compiled the base
+# template again on every request: Jinja compiles each one once per app
+# and keeps it.
+#
+# The compiled code can also be bundled on disk (Jinja's bytecode cache)
+# so a fresh process loads it instead of compiling; `dairy_cli.py
+# templates` builds the bundle. Without a bundle directory, or when it is
+# read-only, templates are compiled in memory as before.
+
+# Base template with Bootstrap and Navbar
+BASE_TEMPLATE = '''
+<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Dairy Management System</title>
+    <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css" rel="stylesheet">
+    <style>
+        body { background-color: #f8f9fa; }
+        .container { margin-top: 20px; }
+        .navbar-brand { font-weight: bold; }
+        .flash-message { margin-bottom: 20px; }
+    </style>
+</head>
+<body>
+    <nav class="navbar navbar-expand-lg navbar-dark bg-primary sticky-top">
+        <div class="container-fluid">
+            <a class="navbar-brand" href="{{ url_for('.index') }}">Dairy Management System</a>
+            <button class="navbar-toggler" type="button" data-bs-toggle="collapse" data-bs-target="#navbarNav">
+                <span class="navbar-toggler-icon"></span>
+            </button>
+            <div class="collapse navbar-collapse" id="navbarNav">
+                <ul class="navbar-nav">
+                    <li class="nav-item dropdown">
+                        <a class="nav-link dropdown-toggle" href="#" data-bs-toggle="dropdown">Reports</a>
+                        <ul class="dropdown-menu">
+                            <li><a class="dropdown-item" href="{{ url_for('.view_stock') }}">Stock Levels</a></li>
+                            <li><a class="dropdown-item" href="{{ url_for('.view_sales') }}">Recent Sales</a></li>
+                            <li><a class="dropdown-item" href="{{ url_for('.view_customers') }}">Top Customers</a></li>
+                            <li><a class="dropdown-item" href="{{ url_for('.view_employees') }}">Employee Productivity</a></li>
+                            <li><a class="dropdown-item" href="{{ url_for('.view_shops') }}">Shop Performance</a></li>
+                            <li><a class="dropdown-item" href="{{ url_for('.view_profitability') }}">Profitability</a></li>
+                            <li><a class="dropdown-item" href="{{ url_for('.view_audit') }}">Audit Trail</a></li>
+                            <li><a class="dropdown-item" href="{{ url_for('.view_planning') }}">Production Plan</a></li>
+                        </ul>
+                    </li>
+                    <li class="nav-item dropdown">
+                        <a class="nav-link dropdown-toggle" href="#" data-bs-toggle="dropdown">Data Management</a>
+                        <ul class="dropdown-menu">
+                            <li><a class="dropdown-item" href="{{ url_for('.list_suppliers') }}">Suppliers</a></li>
+                            <li><a class="dropdown-item" href="{{ url_for('.list_milk_collections') }}">Milk Collections</a></li>
+                            <li><a class="dropdown-item" href="{{ url_for('.list_settlements') }}">Supplier Settlements</a></li>
+                            <li><a class="dropdown-item" href="{{ url_for('.list_separations') }}">Milk Separations</a></li>
+                            <li><a class="dropdown-item" href="{{ url_for('.list_products') }}">Products</a></li>
+                            <li><a class="dropdown-item" href="{{ url_for('.list_prices') }}">Price List</a></li>
+                            <li><a class="dropdown-item" href="{{ url_for('.list_productions') }}">Productions</a></li>
+                            <li><a class="dropdown-item" href="{{ url_for('.list_employees') }}">Employees</a></li>
+                            <li><a class="dropdown-item" href="{{ url_for('.list_shops') }}">Shops</a></li>
+                            <li><a class="dropdown-item" href="{{ url_for('.list_expenses') }}">Expenses</a></li>
+                            <li><a class="dropdown-item" href="{{ url_for('.list_salaries') }}">Salaries</a></li>
+                            <li><a class="dropdown-item" href="{{ url_for('.payroll') }}">Payroll</a></li>
+                            <li><a class="dropdown-item" href="{{ url_for('.list_customers') }}">Customers</a></li>
+                            <li><a class="dropdown-item" href="{{ url_for('.list_payments') }}">Customer Payments</a></li>
+                            <li><a class="dropdown-item" href="{{ url_for('.list_sales') }}">Sales</a></li>
+                            <li><a class="dropdown-item" href="{{ url_for('.list_archive') }}">Archive</a></li>
+                        </ul>
+                    </li>
+                    <li class="nav-item">
+                        <a class="nav-link" href="{{ url_for('.view_alerts') }}">Stock Alerts{% if open_alerts %} <span class="badge bg-danger">{{ open_alerts }}</span>{% endif %}</a>
+                    </li>
+                </ul>
+                <div class="ms-auto position-relative">
+                    <input id="search-box" class="form-control" type="search" placeholder="Search customers, suppliers, products..." autocomplete="off">
+                    <ul id="search-results" class="dropdown-menu"></ul>
+                </div>
+            </div>
+        </div>
+    </nav>
+    <div class="container">
+        {% for message in get_flashed_messages() %}
+            <div class="alert alert-info flash-message">{{ message }}</div>
+        {% endfor %}
+        {{ content|safe }}
+    </div>
+    <script src="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js"></script>
+    <script>
+        // Typeahead over /search
+        const box = document.getElementById('search-box');
+        const results = document.getElementById('search-results');
+        let pending;
+        box.addEventListener('input', () => {
+            clearTimeout(pending);
+            pending = setTimeout(async () => {
+                const q = box.value.trim();
+                // One letter matches too much to be worth a request (see Search.py)
+                if (q.length < 2) { results.classList.remove('show'); return; }
+                const resp = await fetch('{{ url_for('.search') }}?limit=8&q=' + encodeURIComponent(q));
+                const matches = await resp.json();
+                results.replaceChildren(...matches.map(m => {
+                    const li = document.createElement('li');
+                    const a = document.createElement('a');
+                    a.className = 'dropdown-item';
+                    a.href = m.url;
+                    a.textContent = m.name + ' (' + m.entity + ')';
+                    li.appendChild(a);
+                    return li;
+                }));
+                results.classList.toggle('show', matches.length > 0);
+            }, 100);
+        });
+    </script>
+</body>
+</html>
+'''
+
+TEMPLATES = {'base.html': BASE_TEMPLATE}
+
+# Bundle directory for a configuration: template_bundle, or
+# <db name>-templates next to the database
+def bundle_dir(config):
+    return config['template_bundle'] or os.path.splitext(config['db_path'])[0] + '-templates'
+
+# Writes compiled templates only where the bundle directory exists and is writable
+class _Bundle(jinja2.FileSystemBytecodeCache):
+    def dump_bytecode(self, bucket):
+        try:
+            super().dump_bytecode(bucket)
+        except OSError:
+            pass
+
+def install(app, config):
+    app.jinja_loader = jinja2.DictLoader(TEMPLATES)
+    app.jinja_env.bytecode_cache = _Bundle(bundle_dir(config))
+
+# Compile every template into the bundle directory. The code depends on the
+# app's Jinja settings (autoescaping, filters), so it is compiled by the app
+# that will load it. Returns the names compiled.
+def build_bundle(app, config):
+    os.makedirs(bundle_dir(config), exist_ok=True)
+    app.jinja_env.cache.clear()
+    for name in TEMPLATES:
+        app.jinja_env.get_template(name)
+    return list(TEMPLATES)
@@ -0,0 +1,163 @@
+import os
+import re
+import sqlite3
+from datetime import date
+import Accounts
+import Profitability
+import Settlement
+
+# Hot/cold tiering. Closing a period moves Sales, MilkCollection (with its
+# separations) and Production rows dated before a cutoff out of the live
+# database into one history database per year (<history_dir>/<year>.db).
+# The live file stays small; reports that span closed periods read the
+# <Table>_all temp views, which union the live table with the history
+# databases attached on demand. Once a period is closed its rows can no
+# longer be written: the settlements and the profitability cube would be
+# recomputed from the live rows alone.
+
+# Tables moved by close_period, in move order, with the condition (on the
+# cutoff and year) that selects their rows. Separations go with their
+# collection so the RESTRICT foreign key never blocks the move.
+HISTORY_TABLES = [
+    ('MilkSeparation', '''milk_collection_id IN (SELECT id FROM main.MilkCollection
+                          WHERE date < :cutoff AND substr(date, 1, 4) = :year)'''),
+    ('MilkCollection', 'date < :cutoff AND substr(date, 1, 4) = :year'),
+    ('Production', 'date < :cutoff AND substr(date, 1, 4) = :year'),
+    ('Sales', 'date < :cutoff AND substr(date, 1, 4) = :year'),
+]
+
+YEAR_FILE = re.compile(r'^(\d{4})\.db$')
+
+# Message of the error raised by a write dated in a closed period
+CLOSED_PERIOD = 'Period is closed'
+
+# The date everything before which has been closed (one row, absent until
+# the first close) and triggers that refuse rows dated before it
+def ensure_tiering_schema(conn):
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS ClosedPeriods (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        closed_before TEXT NOT NULL
+    )
+    ''')
+    for table, _ in HISTORY_TABLES:
+        if table == 'MilkSeparation':
+            # Dated by its collection, which is checked
+            continue
+        for event in ('INSERT', 'UPDATE OF date'):
+            conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS closed_{table}_{event.split()[0].lower()} BEFORE {event} ON {table}
+            WHEN NEW.date < (SELECT closed_before FROM ClosedPeriods)
+            BEGIN
+                SELECT RAISE(ABORT, '{CLOSED_PERIOD}');
+            END
+            ''')
+
+def is_closed_period(error):
+    return isinstance(error, sqlite3.IntegrityError) and str(error) == CLOSED_PERIOD
+
+# History directory for a configuration: history_dir, or <db name>-history
+# next to the database so each tenant keeps its own
+def history_dir(config):
+    return config['history_dir'] or os.path.splitext(config['db_path'])[0] + '-history'
+
+def _columns(conn, schema, table):
+    return [(row[1], row[2]) for row in conn.execute(f'PRAGMA {schema}.table_info({table})')]
+
+def _attach(conn, directory, year):
+    schema = f'h{year}'
+    attached = {row[1] for row in conn.execute('PRAGMA database_list')}
+    if schema not in attached:
+        conn.execute('ATTACH DATABASE ? AS ' + schema, (os.path.join(directory, f'{year}.db'),))
+    return schema
+
+# History tables keep the ids (so joins to master data still work) but no
+# foreign keys, which cannot point across databases
+def _ensure_history_table(conn, schema, table):
+    columns = _columns(conn, 'main', table)
+    if not _columns(conn, schema, table):
+        definitions = ', '.join('id INTEGER PRIMARY KEY' if name == 'id' else f'{name} {decl}' for name, decl in columns)
+        conn.execute(f'CREATE TABLE {schema}.{table} ({definitions})')
+        if any(name == 'date' for name, _ in columns):
+            conn.execute(f'CREATE INDEX {schema}.idx_{table}_date ON {table} (date)')
+    return [name for name, _ in columns]
+
+# Move everything dated before `cutoff` (the first day of a month, so whole
+# months close) into the history databases. The months are closed to new
+# writes and their settlements brought up to date first; they keep their
+# settlements and are not marked dirty by the move. Each year moves in one transaction. With a WAL live
+# database that transaction is atomic per file only, so rows are copied
+# with INSERT OR IGNORE: if a crash leaves them in both places, running
+# close_period again finishes the move. Customer balances keep the moved
+# sales (see Accounts.keep_closed_sales) and the profitability cube keeps
+# the closed months as they were. Returns {table: rows moved}.
+def close_period(conn, cutoff, directory):
+    if not isinstance(cutoff, date):
+        cutoff = date.fromisoformat(cutoff)
+    if cutoff.day != 1:
+        raise ValueError(f"Periods close on whole months; use the first day of a month, not {cutoff}")
+    cutoff = cutoff.isoformat()
+    with conn:
+        conn.execute('BEGIN IMMEDIATE')
+        conn.execute('''
+        INSERT INTO ClosedPeriods (id, closed_before) VALUES (1, ?)
+        ON CONFLICT (id) DO UPDATE SET closed_before = MAX(closed_before, excluded.closed_before)
+        ''', (cutoff,))
+        Settlement.run_settlement(conn)
+        Profitability.refresh_cube(conn)
+    years = [row[0] for row in conn.execute('''
+    SELECT substr(date, 1, 4) AS year FROM MilkCollection WHERE date < :cutoff
+    UNION SELECT substr(date, 1, 4) FROM Production WHERE date < :cutoff
+    UNION SELECT substr(date, 1, 4) FROM Sales WHERE date < :cutoff
+    ORDER BY year
+    ''', {'cutoff': cutoff})]
+    moved = {table: 0 for table, _ in HISTORY_TABLES}
+    if not years:
+        return moved
+    os.makedirs(directory, exist_ok=True)
+    for year in years:
+        schema = _attach(conn, directory, year)
+        try:
+            with conn:
+                conn.execute('BEGIN IMMEDIATE')
+                params = {'cutoff': cutoff, 'year': year}
+                for table, where in HISTORY_TABLES:
+                    columns = ', '.join(_ensure_history_table(conn, schema, table))
+                    conn.execute(f'INSERT OR IGNORE INTO {schema}.{table} ({columns}) '
+                                 f'SELECT {columns} FROM main.{table} WHERE {where}', params)
+                    if table == 'Sales':
+                        Accounts.keep_closed_sales(conn, where, params)
+                    moved[table] += conn.execute(f'DELETE FROM main.{table} WHERE {where}', params).rowcount
+                conn.execute('DELETE FROM SettlementDirtyPeriods WHERE period < ?', (cutoff[:7],))
+                conn.execute("DELETE FROM ProfitDirty WHERE source = 'sale' AND month < ?", (cutoff[:7],))
+        finally:
+            conn.execute(f'DETACH DATABASE {schema}')
+    return moved
+
+def history_years(directory):
+    if not os.path.isdir(directory):
+        return []
+    return sorted(m.group(1) for m in map(YEAR_FILE.match, os.listdir(directory)) if m)
+
+# Attach the history years overlapping [start, end] (all when not given)
+# and (re)create the temp views <Table>_all = live rows UNION ALL history.
+# Temp views are per connection, so call this on the connection that runs
+# the report. Returns the years attached.
+def attach_history(conn, directory, start=None, end=None):
+    years = [y for y in history_years(directory)
+             if (not start or y >= str(start)[:4]) and (not end or y <= str(end)[:4])]
+    limit = conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+    if len(years) > limit:
+        raise ValueError(f"Report spans {len(years)} closed years but only {limit} databases can be attached; narrow the date range")
+    wanted = {f'h{year}' for year in years}
+    for row in conn.execute('PRAGMA database_list').fetchall():
+        if re.fullmatch(r'h\d{4}', row[1]) and row[1] not in wanted:
+            conn.execute(f'DETACH DATABASE {row[1]}')
+    schemas = [_attach(conn, directory, year) for year in years]
+    for table, _ in HISTORY_TABLES:
+        columns = ', '.join(name for name, _ in _columns(conn, 'main', table))
+        parts = [f'SELECT {columns} FROM main.{table}']
+        parts += [f'SELECT {columns} FROM {schema}.{table}' for schema in schemas if _columns(conn, schema, table)]
+        conn.execute(f'DROP VIEW IF EXISTS temp.{table}_all')
+        conn.execute(f'CREATE TEMP VIEW {table}_all AS ' + ' UNION ALL '.join(parts))
+    return years
@@ -0,0 +1,302 @@
+from flask import Blueprint, Response, abort, current_app, g, has_request_context, render_template, request, redirect, session, url_for, flash
+import sqlite3
+import time
+import uuid
+from datetime import date
+import Archive
+import Audit
+import Config
+import Contention
+import Dairy
+import Export
+import Idempotency
+import Replica
+import Repositories
+import Stock_Alerts
+import Tiering
+
+# Shared web layer: the blueprint that the page modules (Report_Pages,
+# Data_Pages, Api_Routes) register their routes on, per-tenant state,
+# connection and write helpers, request hooks and the export registry.
+# Importing it builds no app and opens no database; see UI.create_app.
+
+# All routes live on a blueprint so that create_app can build one app per tenant
+bp = Blueprint('dairy', __name__)
+
+# Per-app (per-tenant) state: configuration, connection pool, read replica and caches
+class TenantState:
+    def __init__(self, config):
+        self.config = config
+        self.pool = Config.ConnectionPool(config)
+        self.replica = Replica.ReadReplica(config['db_path'], config['replica_path'],
+                                           max_staleness=config['replica_max_staleness'])
+        self.cache = {}
+        self.schema_ready = False
+        self.lock_metrics = Contention.LockMetrics()
+
+def get_tenant():
+    return current_app.extensions['dairy']
+
+# Database connection function; close() returns the connection to the tenant's pool
+def get_db_connection():
+    conn = get_tenant().pool.get()
+    conn.row_factory = sqlite3.Row  # Return dict-like rows
+    return conn
+
+# Remember when this client last wrote, so its next reads see its own writes
+def mark_write():
+    if has_request_context():
+        session['last_write'] = time.time()
+
+# Helper to execute queries. Writes run through run_transaction, so a busy
+# database is retried instead of failing the request.
+def execute_query(query, params=(), fetchone=False, fetchall=False):
+    if not fetchone and not fetchall:
+        run_operation(lambda conn: conn.execute(query, params))
+        return None
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute(query, params)
+        return cursor.fetchone() if fetchone else cursor.fetchall()
+    finally:
+        conn.close()
+
+# One row as its Repositories record (None when there is no such id)
+def get_record(table, id):
+    conn = get_db_connection()
+    try:
+        return Repositories.REPOSITORIES[table](conn).get(id)
+    finally:
+        conn.close()
+
+# Bring older databases up to the current schema once per tenant
+@bp.before_app_request
+def ensure_schema():
+    tenant = get_tenant()
+    if tenant.schema_ready:
+        return
+    conn = get_db_connection()
+    try:
+        Dairy.upgrade_schema(conn)
+    finally:
+        conn.close()
+    tenant.schema_ready = True
+
+# Hidden one-time key for a write form (see Idempotency.py)
+def idempotency_field():
+    return f'<input type="hidden" name="idempotency_key" value="{uuid.uuid4().hex}">'
+
+# The idempotency key of the current POST (Idempotency-Key header or form
+# field), until the request's first write has claimed it
+def pending_idempotency_key():
+    if not has_request_context() or request.method != 'POST' or g.get('idempotency_claimed'):
+        return None
+    key = request.headers.get('Idempotency-Key') or request.form.get('idempotency_key')
+    if key and len(key) > Idempotency.MAX_KEY_LENGTH:
+        abort(400)
+    return key or None
+
+# Run a Repositories operation in one write transaction and return its
+# result, retrying while the database is locked (see Contention.py). The
+# request's idempotency key is claimed in the same transaction, so a
+# resubmitted form writes nothing. An operation that wrote nothing (a
+# refused sale, say) leaves the key free for the corrected resubmission.
+def run_operation(operation, *args):
+    tenant = get_tenant()
+    key = pending_idempotency_key()
+    if key:
+        operation = Idempotency.claimed(key, tenant.config['idempotency_ttl'], operation)
+    conn = get_db_connection()
+    try:
+        result = Contention.run_configured(tenant.config, conn, operation, *args, metrics=tenant.lock_metrics)
+    except Idempotency.NothingWritten as e:
+        return e.result
+    finally:
+        conn.close()
+    if key:
+        g.idempotency_claimed = True
+    mark_write()
+    return result
+
+# Archive a row together with the history that references it (see
+# Archive.py), so deletes never leave orphans behind
+def archive_record(table, id, noun):
+    batch_id, moved = run_operation(Archive.archive_delete, table, id, f'{noun} #{id}')
+    related = moved - 1
+    flash(f'{noun} archived' + (f' with {related} related records' if related > 0 else ''))
+    return batch_id
+
+# Low-stock alerts raised by a write are emitted to the log right after it.
+# If the database is busy they stay queued for the next request.
+@bp.after_app_request
+def emit_stock_alerts(response):
+    if request.method == 'POST':
+        conn = get_db_connection()
+        try:
+            Stock_Alerts.drain_alerts(conn)
+        except sqlite3.OperationalError as e:
+            if not Contention.is_busy(e):
+                raise
+        finally:
+            conn.close()
+    return response
+
+# A write still locked out after its retries is refused with 503 and
+# Retry-After rather than a 500, so tills know to resend it
+@bp.app_errorhandler(sqlite3.OperationalError)
+def database_busy(error):
+    if not Contention.is_busy(error):
+        raise error
+    get_tenant().lock_metrics.count('rejected')
+    content = '''
+    <h2>The database is busy</h2>
+    <p>Your change was not saved. Please wait a moment and submit it again.</p>
+    '''
+    response = Response(render_page(content), status=503)
+    response.headers['Retry-After'] = '1'
+    return response
+
+# A resubmitted form (or retried request) whose key was already used:
+# nothing was written, so send the client back where it came from
+@bp.app_errorhandler(Idempotency.DuplicateRequest)
+def duplicate_request(error):
+    flash('Already recorded; the repeated submission was ignored')
+    return redirect(request.referrer or url_for('.index'), code=303)
+
+# A write dated in a closed period (see Tiering.py) is refused; nothing
+# was written
+@bp.app_errorhandler(sqlite3.IntegrityError)
+def closed_period(error):
+    if not Tiering.is_closed_period(error):
+        raise error
+    flash('Not saved: that date falls in a closed period')
+    return redirect(request.referrer or url_for('.index'), code=303)
+
+# Pages are their content rendered into base.html (see Templates.py)
+def render_page(content):
+    return render_template('base.html', content=content)
+
+# Before/after values of each recorded change (see Audit.py)
+def audit_rows(entries, show_entity=False):
+    rows = ''
+    for entry in entries:
+        changes = '<br>'.join(f'{column}: {before} &rarr; {after}'
+                              for column, (before, after) in entry['changes'].items())
+        row = f'<td>{entry["at"]}</td>'
+        if show_entity:
+            link = url_for('.view_audit', entity=entry['entity'], entity_id=entry['entity_id'])
+            row += f'<td><a href="{link}">{entry["entity"]} #{entry["entity_id"]}</a></td>'
+        rows += f'<tr>{row}<td>{changes}</td></tr>'
+    return rows
+
+# Change history shown under an edit form
+def audit_history(entity, entity_id):
+    conn = get_db_connection()
+    try:
+        entries = Audit.history(conn, entity, entity_id)
+    finally:
+        conn.close()
+    if not entries:
+        return ''
+    return ('<h3 class="mt-4">Change History</h3><table class="table table-sm table-striped">'
+            '<thead><tr><th>When</th><th>Changes</th></tr></thead><tbody>'
+            + audit_rows(entries) + '</tbody></table>')
+
+# Open alert count for the navbar badge
+@bp.app_context_processor
+def inject_open_alerts():
+    conn = get_db_connection()
+    try:
+        return {'open_alerts': Stock_Alerts.count_open_alerts(conn)}
+    finally:
+        conn.close()
+
+# Connection for read-only report/list queries: the replica when it is within
+# the staleness bound (and newer than this client's last write), else the primary.
+# history=True makes the <Table>_all views over closed periods available (see Tiering.py).
+# The attached history databases and temp views last as long as the
+# connection, so history reads never use a pooled one: they open their own,
+# which close() really closes.
+def read_connection(history=False):
+    tenant = get_tenant()
+    conn = tenant.replica.connect(since=session.get('last_write') if has_request_context() else None)
+    if conn is None:
+        conn = Config.connect(tenant.config) if history else get_db_connection()
+    conn.row_factory = sqlite3.Row
+    if history:
+        try:
+            Tiering.attach_history(conn, Tiering.history_dir(tenant.config))
+        except Exception:
+            conn.close()
+            raise
+    return conn
+
+def execute_read_query(query, params=(), fetchone=False, fetchall=False, history=False):
+    conn = read_connection(history)
+    try:
+        cursor = conn.execute(query, params)
+        if fetchone:
+            return cursor.fetchone()
+        if fetchall:
+            return cursor.fetchall()
+        return None
+    finally:
+        conn.close()
+
+# Downloads (see Export.py). Every report and list page reads its table
+# from a source registered here: source(conn, args) returns a cursor (or a
+# list of rows) filtered by the page's query arguments, and
+# /export/<name>.<fmt> streams the same source straight to the client.
+# prepare, if given, runs before the read connection is opened.
+EXPORTS = {}
+
+def export_source(name, history=False, prepare=None):
+    def register(source):
+        EXPORTS[name] = (source, history, prepare)
+        return source
+    return register
+
+# A page's rows from its registered source
+def page_rows(name):
+    source, history, prepare = EXPORTS[name]
+    if prepare:
+        prepare()
+    conn = read_connection(history)
+    try:
+        result = source(conn, request.args)
+        return result.fetchall() if hasattr(result, 'fetchall') else result
+    finally:
+        conn.close()
+
+# Download links for a page's table, carrying its current filters
+def export_links(name, **args):
+    params = request.args.to_dict(flat=False)
+    params.update(args)
+    links = ' | '.join(f'<a href="{url_for(".export", name=name, fmt=fmt, **params)}">{fmt.upper()}</a>'
+                       for fmt in Export.FORMATS)
+    return f'<p class="small">Download: {links}</p>'
+
+@bp.route('/export/<name>.<fmt>')
+def export(name, fmt):
+    if name not in EXPORTS or fmt not in Export.FORMATS:
+        abort(404)
+    source, history, prepare = EXPORTS[name]
+    if prepare:
+        prepare()
+    conn = read_connection(history)
+    try:
+        columns, rows = Export.table(source(conn, request.args))
+    except Exception:
+        conn.close()
+        raise
+
+    # The connection stays open until the last row is sent
+    def generate():
+        try:
+            yield from Export.chunks(fmt, columns, rows, name)
+        finally:
+            conn.close()
+    response = Response(generate(), content_type=Export.FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename="{name}-{date.today()}.{fmt}"'
+    return response
+
@@ -0,0 +1,438 @@
+import argparse
+import sys
+import time
+import Config
+
+# Command-line tool for cron jobs and headless batch work.
+# Only argparse, sqlite3 and Config are imported at startup; each command
+# imports what it needs, and Flask is only loaded by `serve`.
+#
+#   python dairy_cli.py init [--sample]
+#   python dairy_cli.py migrate
+#   python dairy_cli.py import Sales sales.csv
+#   python dairy_cli.py report sales --start 2025-08-01 --end 2025-08-31 --format json
+#   python dairy_cli.py close-period --before 2025-01-01
+#   python dairy_cli.py reprice --from 2025-09-01 --percent 5 [--category Cheese]
+#   python dairy_cli.py backup [--dest path]
+#   python dairy_cli.py vacuum [--full] | analyze [--full] | check | maintain
+#   python dairy_cli.py bench [--repeat 50]
+#   python dairy_cli.py audit-bench [--writes 500]
+#   python dairy_cli.py templates | cold-start [--runs 5] [--path /]
+#   python dairy_cli.py loadtest [--tills 8 --duration 30] [--url http://127.0.0.1:5000]
+#   python dairy_cli.py serve [--host 0.0.0.0] [--port 5000]
+
+# Reports: name -> (query, date column used by --start/--end or None).
+# Sales, Production and MilkCollection are read through the <Table>_all
+# views so closed periods are included (see Tiering.py).
+REPORTS = {
+    'stock': ('''
+        SELECT p.product_name, s.current_quantity, p.unit, s.last_updated
+        FROM Stock s JOIN Products p ON s.product_id = p.id
+        ORDER BY s.current_quantity ASC''', None),
+    'sales': ('''
+        SELECT s.id, s.date, c.name AS customer, sh.name AS shop, p.product_name, s.quantity, s.total_price
+        FROM Sales_all s JOIN Customers c ON s.customer_id = c.id
+        JOIN Shops sh ON s.shop_id = sh.id JOIN Products p ON s.product_id = p.id
+        WHERE {where}
+        ORDER BY s.date, s.id''', 's.date'),
+    'customers': ('''
+        SELECT c.name, SUM(s.quantity) AS total_volume, SUM(s.total_price) AS total_spent
+        FROM Sales_all s JOIN Customers c ON s.customer_id = c.id
+        WHERE {where}
+        GROUP BY c.id ORDER BY total_volume DESC''', 's.date'),
+    'employees': ('''
+        SELECT e.name, SUM(p.quantity_produced) AS total_produced
+        FROM Production_all p JOIN Employees e ON p.produced_by_employee = e.id
+        WHERE {where}
+        GROUP BY e.id ORDER BY total_produced DESC''', 'p.date'),
+    'shops': ('''
+        SELECT sh.name, TOTAL(s.total_price) AS total_sales,
+               (SELECT TOTAL(e.amount) FROM Expenses e WHERE e.shop_id = sh.id AND {expense_where}) AS total_expenses
+        FROM Shops sh LEFT JOIN Sales_all s ON s.shop_id = sh.id AND {where}
+        GROUP BY sh.id ORDER BY sh.name''', 's.date'),
+    'production': ('''
+        SELECT p.id, p.date, pr.product_name, p.milk_used_liters, p.quantity_produced, e.name AS employee
+        FROM Production_all p JOIN Products pr ON p.product_id = pr.id
+        LEFT JOIN Employees e ON p.produced_by_employee = e.id
+        WHERE {where}
+        ORDER BY p.date, p.id''', 'p.date'),
+    'milk': ('''
+        SELECT mc.id, mc.date, mc.source_type, s.name AS supplier, mc.quantity_liters, mc.fat_content
+        FROM MilkCollection_all mc LEFT JOIN Suppliers s ON mc.supplier_id = s.id
+        WHERE {where}
+        ORDER BY mc.date, mc.id''', 'mc.date'),
+    'expenses': ('''
+        SELECT e.id, e.date, s.name AS shop, e.description, e.amount
+        FROM Expenses e JOIN Shops s ON e.shop_id = s.id
+        WHERE {where}
+        ORDER BY e.date, e.id''', 'e.date'),
+}
+
+def _date_filter(column, start, end):
+    clauses, params = [], {}
+    if column and start:
+        clauses.append(f'{column} >= :start')
+        params['start'] = start
+    if column and end:
+        clauses.append(f'{column} <= :end')
+        params['end'] = end
+    return ' AND '.join(clauses) or '1', params
+
+def report_query(name, start=None, end=None):
+    query, column = REPORTS[name]
+    where, params = _date_filter(column, start, end)
+    expense_where, _ = _date_filter('e.date', start, end)
+    return query.format(where=where, expense_where=expense_where), params
+
+def _connect(args):
+    return Config.connect(args.config)
+
+def cmd_init(args):
+    import Dairy
+    conn = _connect(args)
+    Dairy.create_tables(conn)
+    Dairy.upgrade_schema(conn)
+    if args.sample:
+        import sample
+        sample.insert_sample_data(conn)
+    conn.close()
+    print(f"Initialized {args.config['db_path']}")
+
+def cmd_migrate(args):
+    import Dairy
+    conn = _connect(args)
+    Dairy.create_tables(conn)
+    Dairy.upgrade_schema(conn)
+    conn.close()
+    print(f"Schema of {args.config['db_path']} is up to date")
+
+# CSV with a header row of column names. Rows are inserted as-is in one
+# transaction (ids are assigned on insert; Sales/Production rows do not
+# move stock).
+def cmd_import(args):
+    import csv
+    import Repositories
+    repository_class = Repositories.REPOSITORIES.get(args.table)
+    if repository_class is None:
+        sys.exit(f"Unknown table {args.table}; choose from {', '.join(Repositories.REPOSITORIES)}")
+    conn = _connect(args)
+    repository = repository_class(conn)
+    count = 0
+    start = time.perf_counter()
+    with open(args.csv_file, newline='') as f:
+        reader = csv.DictReader(f)
+        unknown = set(reader.fieldnames or ()) - set(repository.data_columns) - {'id'}
+        if unknown:
+            sys.exit(f"Unknown {args.table} columns: {', '.join(sorted(unknown))}")
+        with conn:
+            batch = []
+            for row in reader:
+                batch.append({k: (v if v != '' else None) for k, v in row.items()})
+                if len(batch) >= args.batch:
+                    repository.insert_many(batch)
+                    count += len(batch)
+                    batch = []
+            if batch:
+                repository.insert_many(batch)
+                count += len(batch)
+    conn.close()
+    print(f"Imported {count} rows into {args.table} in {time.perf_counter() - start:.2f}s")
+
+# Write new prices for every scope in force on --from, in one transaction
+def cmd_reprice(args):
+    import Pricing
+    conn = _connect(args)
+    start = time.perf_counter()
+    with conn:
+        conn.execute('BEGIN IMMEDIATE')
+        changed = Pricing.bulk_reprice(conn, args.effective_from, args.percent, args.amount, args.product,
+                                       args.shop, args.category, include_overrides=not args.no_overrides)
+    conn.close()
+    print(f"Repriced {changed} price rows from {args.effective_from} in {time.perf_counter() - start:.2f}s")
+
+def _connect_reports(args, start=None, end=None):
+    import Tiering
+    conn = _connect(args)
+    Tiering.attach_history(conn, Tiering.history_dir(args.config), start, end)
+    return conn
+
+def cmd_report(args):
+    import csv
+    import json
+    query, params = report_query(args.name, args.start, args.end)
+    conn = _connect_reports(args, args.start, args.end)
+    cursor = conn.execute(query, params)
+    columns = [d[0] for d in cursor.description]
+    if args.format == 'xlsx':
+        out = open(args.out, 'wb') if args.out else sys.stdout.buffer
+    else:
+        out = open(args.out, 'w', newline='') if args.out else sys.stdout
+    try:
+        if args.format == 'xlsx':
+            import Export
+            for chunk in Export.xlsx_chunks(columns, cursor, args.name):
+                out.write(chunk)
+        elif args.format == 'json':
+            json.dump([dict(zip(columns, row)) for row in cursor], out, indent=1, default=str)
+            out.write('\n')
+        else:
+            writer = csv.writer(out)
+            writer.writerow(columns)
+            writer.writerows(cursor)
+    finally:
+        conn.close()
+        if out not in (sys.stdout, sys.stdout.buffer):
+            out.close()
+
+# Move Sales, MilkCollection and Production before --before into the
+# per-year history databases
+def cmd_close_period(args):
+    import Tiering
+    conn = _connect(args)
+    start = time.perf_counter()
+    try:
+        moved = Tiering.close_period(conn, args.before, Tiering.history_dir(args.config))
+    except ValueError as e:
+        sys.exit(str(e))
+    finally:
+        conn.close()
+    print(', '.join(f'{table}: {count}' for table, count in moved.items()) +
+          f" rows moved in {time.perf_counter() - start:.2f}s")
+
+def cmd_backup(args):
+    import Backup
+    result = Backup.backup_database(args.config['db_path'], args.dest)
+    print(f"Backup written to {result['path']}: {result['bytes']} bytes in "
+          f"{result['seconds']:.2f}s ({result['mb_per_s']:.2f} MB/s), integrity ok.")
+
+# Incremental vacuum within a time budget; --full rebuilds the whole file
+# (and switches an older database to incremental auto_vacuum)
+def cmd_vacuum(args):
+    import Maintenance
+    conn = _connect(args)
+    start = time.perf_counter()
+    if args.full:
+        if not Maintenance.enable_incremental_vacuum(conn):
+            conn.execute('VACUUM')
+        print(f"VACUUM done in {time.perf_counter() - start:.2f}s")
+    else:
+        freed = Maintenance.incremental_vacuum(conn, max_seconds=args.seconds)
+        remaining = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        print(f"Freed {freed} pages in {time.perf_counter() - start:.2f}s, {remaining} free pages left")
+    conn.close()
+
+def cmd_analyze(args):
+    import Maintenance
+    conn = _connect(args)
+    start = time.perf_counter()
+    if args.full:
+        conn.execute('ANALYZE')
+    Maintenance.optimize(conn)
+    conn.close()
+    print(f"{'ANALYZE' if args.full else 'PRAGMA optimize'} done in {time.perf_counter() - start:.2f}s")
+
+def cmd_check(args):
+    import Maintenance
+    conn = _connect(args)
+    ok, messages = Maintenance.quick_check(conn, max_seconds=args.seconds)
+    conn.close()
+    print('; '.join(messages))
+    if not ok:
+        sys.exit(1)
+
+# One bounded maintenance pass, for cron in the off-peak window
+def cmd_maintain(args):
+    import Maintenance
+    summary = Maintenance.run_maintenance(args.config)
+    check = {None: 'not finished', True: 'ok', False: 'FAILED'}[summary['check']]
+    print(f"optimize: {'done' if summary['optimized'] else 'skipped (busy)'}, "
+          f"idempotency keys purged: {summary['keys_purged']}, audit entries flushed: {summary['audit_flushed']}, pages freed: {summary['pages_freed']}, quick_check: {check}")
+    if summary['check'] is False:
+        sys.exit('; '.join(summary['messages']))
+
+# Time every report query and a few repository lookups against the
+# configured database. Read-only.
+def cmd_bench(args):
+    import statistics
+    import Repositories
+    conn = _connect_reports(args)
+    cases = [(f'report {name}', lambda name=name: conn.execute(*report_query(name)).fetchall()) for name in REPORTS]
+    sales = Repositories.SaleRepository(conn)
+    stock = Repositories.StockRepository(conn)
+    first_sale = conn.execute('SELECT MIN(id) FROM Sales').fetchone()[0] or 0
+    cases.append(('SaleRepository.get', lambda: sales.get(first_sale)))
+    cases.append(('StockRepository.quantity', lambda: stock.quantity(1)))
+    print(f"{'case':<28} {'median ms':>10} {'min ms':>10}")
+    for label, case in cases:
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            case()
+            timings.append((time.perf_counter() - start) * 1000)
+        print(f"{label:<28} {statistics.median(timings):>10.3f} {min(timings):>10.3f}")
+    conn.close()
+
+# Write latency with and without the audit triggers (see Audit.benchmark),
+# on a scratch copy. Exits non-zero when the overhead on any edit, bare or
+# as a request, is over budget.
+def cmd_audit_bench(args):
+    import Audit
+    results = Audit.benchmark(args.config, writes=args.writes)
+    if not results:
+        sys.exit('Nothing to edit: the database has no customers or sales')
+    budget = args.budget if args.budget is not None else Audit.OVERHEAD_BUDGET
+    print(f"{'case':<16} {'level':<12} {'plain ms':>10} {'audited ms':>11} {'overhead':>9}")
+    over = []
+    for (case, level), (plain, audited, overhead) in results.items():
+        print(f"{case:<16} {level:<12} {plain:>10.3f} {audited:>11.3f} {overhead:>8.1%}")
+        if overhead > budget:
+            over.append(f'{case} ({level})')
+    if over:
+        sys.exit(f"Audit overhead over the {budget:.0%} budget: {', '.join(over)}")
+    print(f"Edits within the {budget:.0%} budget")
+
+# Compile the page templates into the bundle directory (see Templates.py),
+# e.g. at deploy time, so fresh processes skip compiling them
+def cmd_templates(args):
+    import Templates
+    import UI
+    names = Templates.build_bundle(UI.create_app(args.config), args.config)
+    print(f"{len(names)} templates compiled into {Templates.bundle_dir(args.config)}")
+
+# Time fresh processes importing the app and serving a first request
+# (see Startup.py); exits non-zero over the budget
+def cmd_cold_start(args):
+    import Startup
+    try:
+        result = Startup.measure(args.config, runs=args.runs, path=args.path)
+    except RuntimeError as e:
+        sys.exit(str(e))
+    budget = args.budget if args.budget is not None else Startup.COLD_START_BUDGET
+    for phase, seconds in result.items():
+        print(f"{phase:<14} {seconds * 1000:>8.1f} ms")
+    if result['total'] > budget:
+        sys.exit(f"Cold start {result['total'] * 1000:.0f} ms is over the {budget * 1000:.0f} ms budget")
+    print(f"Cold start within the {budget * 1000:.0f} ms budget")
+
+# Replay mixed till, collection and dashboard traffic (see Load_Test.py).
+# In process against a scratch copy of the database unless --url or --in-place.
+def cmd_loadtest(args):
+    import Load_Test
+    try:
+        summary = Load_Test.run_load_test(args.config, tills=args.tills, collectors=args.collectors,
+                                          dashboards=args.dashboards, duration=args.duration,
+                                          burst=args.burst, base_url=args.url,
+                                          in_place=args.in_place, seed=args.seed)
+    except ValueError as e:
+        sys.exit(str(e))
+    print(Load_Test.format_report(summary))
+
+def cmd_serve(args):
+    import UI
+    UI.run_server(args.config, host=args.host, port=args.port, debug=args.debug)
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='dairy', description='Dairy Management System operations')
+    parser.add_argument('--config', dest='config_path', help='JSON config file (default: DAIRY_CONFIG)')
+    parser.add_argument('--db', help='database path (overrides the config)')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    p = commands.add_parser('init', help='create the schema')
+    p.add_argument('--sample', action='store_true', help='also insert sample data')
+    p.set_defaults(func=cmd_init)
+
+    p = commands.add_parser('migrate', help='upgrade an existing database to the current schema')
+    p.set_defaults(func=cmd_migrate)
+
+    p = commands.add_parser('import', help='bulk import a CSV file into a table')
+    p.add_argument('table')
+    p.add_argument('csv_file')
+    p.add_argument('--batch', type=int, default=5000, help='rows per executemany batch')
+    p.set_defaults(func=cmd_import)
+
+    p = commands.add_parser('report', help='write a report as CSV, JSON or XLSX')
+    p.add_argument('name', choices=sorted(REPORTS))
+    p.add_argument('--format', choices=('csv', 'json', 'xlsx'), default='csv')
+    p.add_argument('--start', help='first date (YYYY-MM-DD)')
+    p.add_argument('--end', help='last date (YYYY-MM-DD)')
+    p.add_argument('--out', help='output file (default: stdout)')
+    p.set_defaults(func=cmd_report)
+
+    p = commands.add_parser('close-period', help='move rows before a date into the yearly history databases')
+    p.add_argument('--before', required=True, help='first day of the first month to keep live (YYYY-MM-01)')
+    p.set_defaults(func=cmd_close_period)
+
+    p = commands.add_parser('reprice', help='change prices in bulk from a date')
+    p.add_argument('--from', dest='effective_from', required=True, help='date the new prices take effect (YYYY-MM-DD)')
+    p.add_argument('--percent', type=float, default=0.0, help='percentage change, e.g. 5 or -2.5')
+    p.add_argument('--amount', type=float, default=0.0, help='fixed change per unit, applied after --percent')
+    p.add_argument('--product', type=int, help='only this product id')
+    p.add_argument('--shop', type=int, help='only prices for this shop id')
+    p.add_argument('--category', help='only products in this category')
+    p.add_argument('--no-overrides', action='store_true', help='leave customer-specific prices alone')
+    p.set_defaults(func=cmd_reprice)
+
+    p = commands.add_parser('backup', help='take a verified online backup')
+    p.add_argument('--dest', help='backup file (default: backups/dairy-<timestamp>.db)')
+    p.set_defaults(func=cmd_backup)
+
+    p = commands.add_parser('vacuum', help='return free pages to the filesystem')
+    p.add_argument('--seconds', type=float, default=5.0, help='time budget for incremental vacuum')
+    p.add_argument('--full', action='store_true', help='rebuild the whole file (locks the database)')
+    p.set_defaults(func=cmd_vacuum)
+
+    p = commands.add_parser('analyze', help='refresh query planner statistics')
+    p.add_argument('--full', action='store_true', help='run a full ANALYZE first')
+    p.set_defaults(func=cmd_analyze)
+
+    p = commands.add_parser('check', help='run PRAGMA quick_check within a time budget')
+    p.add_argument('--seconds', type=float, default=60.0)
+    p.set_defaults(func=cmd_check)
+
+    p = commands.add_parser('maintain', help='one bounded maintenance pass (optimize, vacuum, check)')
+    p.set_defaults(func=cmd_maintain)
+
+    p = commands.add_parser('bench', help='time report queries and repository lookups')
+    p.add_argument('--repeat', type=int, default=20)
+    p.set_defaults(func=cmd_bench)
+
+    p = commands.add_parser('audit-bench', help='measure the write latency added by the audit trail')
+    p.add_argument('--writes', type=int, default=500, help='timed writes per case, audited and not')
+    p.add_argument('--budget', type=float, help='largest acceptable overhead (default 0.10 = 10%%)')
+    p.set_defaults(func=cmd_audit_bench)
+
+    p = commands.add_parser('templates', help='build the precompiled template bundle')
+    p.set_defaults(func=cmd_templates)
+
+    p = commands.add_parser('cold-start', help='measure import + first request time of a fresh process')
+    p.add_argument('--runs', type=int, default=5, help='timed cold starts (after one warm-up)')
+    p.add_argument('--path', default='/', help='page requested first')
+    p.add_argument('--budget', type=float, help='largest acceptable median in seconds (default 0.5)')
+    p.set_defaults(func=cmd_cold_start)
+
+    p = commands.add_parser('loadtest', help='replay concurrent shop, till and dashboard traffic')
+    p.add_argument('--tills', type=int, default=8, help='concurrent tills posting sales in bursts')
+    p.add_argument('--collectors', type=int, default=2, help='collection centres posting milk collections')
+    p.add_argument('--dashboards', type=int, default=2, help='dashboards polling /stock and /shops')
+    p.add_argument('--duration', type=float, default=30.0, help='seconds to run')
+    p.add_argument('--burst', type=int, default=5, help='largest burst of back-to-back sales')
+    p.add_argument('--url', help='load a running server instead of the in-process test client')
+    p.add_argument('--in-place', action='store_true', help='write to the configured database, not a copy')
+    p.add_argument('--seed', type=int)
+    p.set_defaults(func=cmd_loadtest)
+
+    p = commands.add_parser('serve', help='run the web UI')
+    p.add_argument('--host', default='127.0.0.1')
+    p.add_argument('--port', type=int, default=5000)
+    p.add_argument('--debug', action='store_true')
+    p.set_defaults(func=cmd_serve)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    overrides = {'db_path': args.db} if args.db else {}
+    args.config = Config.load_config(args.config_path, **overrides)
+    args.func(args)
+
+if __name__ == '__main__':
+    main()
@@ -1,21 +1,27 @@
-import sqlite3
+import Config
 
-conn = sqlite3.connect('dairy.db')
-cursor = conn.cursor()
+# Insert a small set of sample rows for trying out the app
+def insert_sample_data(conn):
+    cursor = conn.cursor()
+    # Insert sample products
+    cursor.execute("INSERT INTO Products (product_name, category, ratio_to_milk, unit) VALUES ('Cheese', 'Dairy Product', 10.0, 'kg')")
+    cursor.execute("INSERT INTO Products (product_name, category, ratio_to_milk, unit) VALUES ('Boiled Milk', 'Raw Material', 1.0, 'liters')")
+    cursor.execute("INSERT INTO Shops (name, type, location) VALUES ('General Dairy Shop', 'general', 'Downtown')")
+    cursor.execute("INSERT INTO Shops (name, type, location) VALUES ('Milk Shop', 'milk_focused', 'Suburb')")
+    cursor.execute("INSERT INTO Customers (name, contact, address) VALUES ('John Doe', '1234567890', '123 Main St')")
+    cursor.execute("INSERT INTO Employees (name, role, position, monthly_salary) VALUES ('Alice', 'Processor', 'Lead', 2000)")
+    cursor.execute("INSERT INTO Stock (product_id, current_quantity, last_updated) VALUES (1, 100, '2025-08-21')")
+    cursor.execute("INSERT INTO Stock (product_id, current_quantity, last_updated) VALUES (2, 500, '2025-08-21')")
+    cursor.execute("INSERT INTO Sales (date, customer_id, shop_id, product_id, quantity, total_price) VALUES ('2025-08-21', 1, 1, 1, 10, 100)")
+    cursor.execute("INSERT INTO Production (date, product_id, milk_used_liters, quantity_produced, produced_by_employee) VALUES ('2025-08-21', 1, 1000, 100, 1)")
+    cursor.execute("INSERT INTO Expenses (date, shop_id, description, amount, category_id) VALUES ('2025-08-21', 1, 'Utilities', 200, (SELECT id FROM ExpenseCategories WHERE name = 'Utilities'))")
+    cursor.execute("INSERT INTO PriceList (product_id, effective_from, unit_price) VALUES (1, '2025-01-01', 10)")
+    cursor.execute("INSERT INTO PriceList (product_id, effective_from, unit_price) VALUES (2, '2025-01-01', 1.2)")
+    conn.commit()
 
-# Insert sample products
-cursor.execute("INSERT INTO Products (product_name, category, ratio_to_milk, unit) VALUES ('Cheese', 'Dairy Product', 10.0, 'kg')")
-cursor.execute("INSERT INTO Products (product_name, category, ratio_to_milk, unit) VALUES ('Boiled Milk', 'Raw Material', 1.0, 'liters')")
-cursor.execute("INSERT INTO Shops (name, type, location) VALUES ('General Dairy Shop', 'general', 'Downtown')")
-cursor.execute("INSERT INTO Shops (name, type, location) VALUES ('Milk Shop', 'milk_focused', 'Suburb')")
-cursor.execute("INSERT INTO Customers (name, contact, address) VALUES ('John Doe', '1234567890', '123 Main St')")
-cursor.execute("INSERT INTO Employees (name, role, position, monthly_salary) VALUES ('Alice', 'Processor', 'Lead', 2000)")
-cursor.execute("INSERT INTO Stock (product_id, current_quantity, last_updated) VALUES (1, 100, '2025-08-21')")
-cursor.execute("INSERT INTO Stock (product_id, current_quantity, last_updated) VALUES (2, 500, '2025-08-21')")
-cursor.execute("INSERT INTO Sales (date, customer_id, shop_id, product_id, quantity, total_price) VALUES ('2025-08-21', 1, 1, 1, 10, 100)")
-cursor.execute("INSERT INTO Production (date, product_id, milk_used_liters, quantity_produced, produced_by_employee) VALUES ('2025-08-21', 1, 1000, 100, 1)")
-cursor.execute("INSERT INTO Expenses (date, shop_id, description, amount) VALUES ('2025-08-21', 1, 'Utilities', 200)")
-
-conn.commit()
-conn.close()
-print("Sample data inserted.")
\ No newline at end of file
+# Usage: python sample.py  (run python Dairy.py first)
+if __name__ == '__main__':
+    conn = Config.connect(Config.load_config())
+    insert_sample_data(conn)
+    conn.close()
+    print("Sample data inserted.")
@@ -0,0 +1,105 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+import Accounts
+import Dairy
+import Repositories
+
+# Customer accounts: running balances kept by triggers, the statement and
+# credit limits on sales. Run with: python -m pytest test_accounts.py
+
+def _open(path):
+    conn = sqlite3.connect(path)
+    Dairy.create_tables(conn)
+    Dairy.upgrade_schema(conn)
+    return conn
+
+class AccountTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.conn = _open(os.path.join(self.directory, 'dairy.db'))
+        with self.conn:
+            self.conn.execute("INSERT INTO Shops (name) VALUES ('Main')")
+            self.conn.executemany("INSERT INTO Customers (name) VALUES (?)", [('Asha',), ('Bala',)])
+            Repositories.add_product(self.conn, 'Ghee', 'Fat', 20, 'kg', '2025-09-01')
+            self.conn.execute('UPDATE Stock SET current_quantity = 100')
+
+    def tearDown(self):
+        self.conn.close()
+        shutil.rmtree(self.directory)
+
+    def _account(self, customer_id=1):
+        return tuple(Accounts.get_account(self.conn, customer_id)[1:])
+
+    def _sell(self, customer_id, total_price, on_date='2025-09-02'):
+        with self.conn:
+            return Repositories.record_sale(self.conn, on_date, customer_id, 1, 1, 1, total_price)
+
+    def test_sales_and_payments_move_the_balance(self):
+        self._sell(1, 500)
+        self._sell(1, 300)
+        with self.conn:
+            Accounts.record_payment(self.conn, 1, '2025-09-03', 600, 'cash')
+        self.assertEqual(self._account(), (200, 800, 600, None))
+
+    def test_edits_and_deletes_are_reversed(self):
+        sale_id = self._sell(1, 500)
+        with self.conn:
+            payment_id = Accounts.record_payment(self.conn, 1, '2025-09-03', 100)
+            Repositories.update_sale(self.conn, sale_id, '2025-09-02', 2, 1, 1, 1, 450)
+        self.assertEqual(self._account(1), (-100, 0, 100, None))
+        self.assertEqual(self._account(2), (450, 450, 0, None))
+        with self.conn:
+            Accounts.delete_payment(self.conn, payment_id)
+            Repositories.delete_sale(self.conn, sale_id, '2025-09-04')
+        self.assertEqual((self._account(1), self._account(2)), ((0, 0, 0, None), (0, 0, 0, None)))
+
+    def test_statement_runs_the_balance(self):
+        self._sell(1, 500, '2025-09-01')
+        with self.conn:
+            Accounts.record_payment(self.conn, 1, '2025-09-01', 200)
+        self._sell(1, 100, '2025-09-05')
+        opening, lines = Accounts.statement(self.conn, 1)
+        self.assertEqual(opening, 0)
+        self.assertEqual([(line[1], line[3], line[4]) for line in lines],
+                         [('sale', 500, 500), ('payment', -200, 300), ('sale', 100, 400)])
+
+    def test_sale_over_the_credit_limit_is_refused(self):
+        with self.conn:
+            Accounts.set_credit_limit(self.conn, 1, 600)
+        self._sell(1, 500)
+        with self.assertRaises(Accounts.CreditLimitExceeded) as caught:
+            self._sell(1, 150)
+        self.assertAlmostEqual(caught.exception.available, 100)
+        self.assertEqual(self.conn.execute('SELECT COUNT(*) FROM Sales').fetchone(), (1,))
+        self.assertEqual(self.conn.execute('SELECT current_quantity FROM Stock').fetchone(), (99,))
+        # Exactly up to the limit is fine, and a payment makes room
+        self._sell(1, 100)
+        with self.conn:
+            Accounts.record_payment(self.conn, 1, '2025-09-03', 150)
+        self._sell(1, 150)
+        self.assertEqual(self._account(), (600, 750, 150, 600))
+
+    def test_editing_a_sale_counts_only_the_difference(self):
+        with self.conn:
+            Accounts.set_credit_limit(self.conn, 1, 600)
+        sale_id = self._sell(1, 500)
+        with self.conn:
+            Repositories.update_sale(self.conn, sale_id, '2025-09-02', 1, 1, 1, 1, 600)
+        with self.assertRaises(Accounts.CreditLimitExceeded):
+            with self.conn:
+                Repositories.update_sale(self.conn, sale_id, '2025-09-02', 1, 1, 1, 1, 601)
+        self.assertEqual(self._account()[0], 600)
+
+    def test_customer_without_a_limit_is_never_refused(self):
+        self._sell(2, 10000)
+        with self.conn:
+            Accounts.set_credit_limit(self.conn, 2, 100)
+            Accounts.set_credit_limit(self.conn, 2, None)
+        self._sell(2, 5000)
+        self.assertEqual(self._account(2), (15000, 15000, 0, None))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+import Analytics_Export
+import Dairy
+
+# Incremental analytics export: which monthly partitions a change marks for
+# rewriting. Run with: python -m pytest test_analytics_export.py
+
+def _open(path):
+    conn = sqlite3.connect(path)
+    Dairy.create_tables(conn)
+    Dairy.upgrade_schema(conn)
+    return conn
+
+class PartitionFingerprintTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.conn = _open(os.path.join(self.directory, 'dairy.db'))
+        with self.conn:
+            self.conn.execute("INSERT INTO Shops (name) VALUES ('Main')")
+            self.conn.executemany("INSERT INTO Expenses (date, description, amount, shop_id) VALUES (?, ?, ?, 1)",
+                                  [('2025-03-02', 'Diesel', 100), ('2025-03-20', 'Rent', 900), ('2025-04-01', 'Diesel', 120)])
+        self.before = Analytics_Export.partition_fingerprints(self.conn, 'Expenses')
+
+    def tearDown(self):
+        self.conn.close()
+        shutil.rmtree(self.directory)
+
+    def _changed(self, sql):
+        with self.conn:
+            self.conn.execute(sql)
+        after = Analytics_Export.partition_fingerprints(self.conn, 'Expenses')
+        return sorted(month for month in set(self.before) | set(after) if self.before.get(month) != after.get(month))
+
+    def test_text_edit_is_detected(self):
+        self.assertEqual(self._changed("UPDATE Expenses SET description = 'Petrol' WHERE id = 1"), ['2025-03'])
+
+    def test_reference_edit_is_detected(self):
+        with self.conn:
+            self.conn.execute("INSERT INTO Shops (name) VALUES ('Depot')")
+        self.assertEqual(self._changed("UPDATE Expenses SET shop_id = 2 WHERE id = 3"), ['2025-04'])
+
+    def test_reference_cleared_by_a_delete_is_detected(self):
+        self.conn.execute('PRAGMA foreign_keys = ON')
+        with self.conn:
+            self.conn.execute("UPDATE Expenses SET category_id = 1 WHERE id = 3")
+        self.before = Analytics_Export.partition_fingerprints(self.conn, 'Expenses')
+        self.assertEqual(self._changed("DELETE FROM ExpenseCategories WHERE id = 1"), ['2025-04'])
+
+    def test_date_moved_within_the_month_is_detected(self):
+        self.assertEqual(self._changed("UPDATE Expenses SET date = '2025-03-05' WHERE id = 1"), ['2025-03'])
+
+    def test_offsetting_edits_are_detected(self):
+        with self.conn:
+            self.conn.execute("UPDATE Expenses SET amount = 200 WHERE id = 1")
+        self.assertEqual(self._changed("UPDATE Expenses SET amount = 800 WHERE id = 2"), ['2025-03'])
+
+    def test_move_to_another_month_marks_both(self):
+        self.assertEqual(self._changed("UPDATE Expenses SET date = '2025-04-09' WHERE id = 1"), ['2025-03', '2025-04'])
+
+    def test_emptied_month_drops_out(self):
+        self.assertEqual(self._changed("DELETE FROM Expenses WHERE id = 3"), ['2025-04'])
+        self.assertNotIn('2025-04', Analytics_Export.partition_fingerprints(self.conn, 'Expenses'))
+
+    def test_untouched_month_keeps_its_fingerprint(self):
+        self.assertEqual(self._changed("INSERT INTO Expenses (date, description, amount, shop_id) VALUES ('2025-05-01', 'Rent', 900, 1)"),
+                         ['2025-05'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+import Archive
+import Dairy
+
+# Archiving a row with the history that references it, found by walking
+# the foreign keys, and restoring it. Run with: python -m pytest test_archive.py
+
+def _open(path):
+    conn = sqlite3.connect(path)
+    Dairy.create_tables(conn)
+    Dairy.upgrade_schema(conn)
+    conn.execute('PRAGMA foreign_keys = ON')
+    return conn
+
+class ArchiveTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.conn = _open(os.path.join(self.directory, 'dairy.db'))
+        with self.conn:
+            self.conn.execute("INSERT INTO Shops (name) VALUES ('Main')")
+            self.conn.execute("INSERT INTO Customers (name) VALUES ('Asha')")
+            self.conn.executemany("INSERT INTO Employees (name, shop_id) VALUES (?, 1)", [('Ravi',), ('Meena',)])
+            self.conn.executemany("INSERT INTO Suppliers (name) VALUES (?)", [('Green Farm',), ('Hill Dairy',)])
+            self.conn.executemany("INSERT INTO MilkCollection (date, source_type, supplier_id, quantity_liters, collected_by_employee) "
+                                  "VALUES (?, 'Supplier', ?, 100, 1)", [('2025-03-01', 1), ('2025-03-02', 1), ('2025-03-02', 2)])
+            self.conn.executemany("INSERT INTO MilkSeparation (date, milk_collection_id, milk_used_liters) VALUES (?, ?, 50)",
+                                  [('2025-03-02', 2), ('2025-03-03', 3)])
+            self.conn.execute("INSERT INTO Products (product_name, unit) VALUES ('Ghee', 'kg')")
+            self.conn.execute("INSERT INTO Stock (product_id, current_quantity, last_updated) VALUES (1, 40, '2025-03-01')")
+            self.conn.execute("INSERT INTO Sales (date, customer_id, shop_id, product_id, quantity, total_price) "
+                              "VALUES ('2025-03-04', 1, 1, 1, 2, 100)")
+            self.conn.execute("INSERT INTO Salaries (employee_id, date, amount_paid) VALUES (1, '2025-03-31', 3000)")
+
+    def tearDown(self):
+        self.conn.close()
+        shutil.rmtree(self.directory)
+
+    def _archive(self, table, row_id):
+        with self.conn:
+            return Archive.archive_delete(self.conn, table, row_id, f'{table} #{row_id}')
+
+    def _restore(self, batch_id):
+        with self.conn:
+            return Archive.restore_batch(self.conn, batch_id)
+
+    def _ids(self, table):
+        return [row[0] for row in self.conn.execute(f'SELECT id FROM {table} ORDER BY id')]
+
+    def test_archive_follows_references_down_the_tree(self):
+        batch_id, moved = self._archive('Suppliers', 1)
+        # The supplier, its two collections and the separation of one of them
+        self.assertEqual(moved, 4)
+        self.assertEqual((self._ids('Suppliers'), self._ids('MilkCollection'), self._ids('MilkSeparation')), ([2], [3], [2]))
+        self.assertEqual(self.conn.execute('SELECT id, archive_batch FROM MilkSeparation_archive').fetchall(), [(1, batch_id)])
+        self.assertEqual(self.conn.execute('SELECT table_name, row_id, rows FROM ArchiveBatches').fetchall(), [('Suppliers', 1, 4)])
+
+    def test_restore_puts_every_row_back(self):
+        before = self.conn.execute('SELECT * FROM MilkCollection ORDER BY id').fetchall()
+        batch_id, moved = self._archive('Suppliers', 1)
+        self.assertEqual(self._restore(batch_id), moved)
+        self.assertEqual(self.conn.execute('SELECT * FROM MilkCollection ORDER BY id').fetchall(), before)
+        self.assertEqual(self._ids('MilkSeparation'), [1, 2])
+        self.assertEqual(self.conn.execute('SELECT COUNT(*) FROM MilkCollection_archive').fetchone(), (0,))
+        self.assertEqual(self.conn.execute('SELECT COUNT(*) FROM ArchiveBatches').fetchone(), (0,))
+        self.assertEqual(self.conn.execute('PRAGMA foreign_key_check').fetchall(), [])
+
+    def test_set_null_references_are_cleared_not_archived(self):
+        batch_id, moved = self._archive('Employees', 1)
+        # Only the salary goes with the employee; the collections stay
+        self.assertEqual(moved, 2)
+        self.assertEqual(self._ids('MilkCollection'), [1, 2, 3])
+        self.assertEqual(self.conn.execute('SELECT COUNT(*) FROM MilkCollection WHERE collected_by_employee IS NULL').fetchone(), (3,))
+        self._restore(batch_id)
+        self.assertEqual(self._ids('Salaries'), [1])
+        self.assertEqual(self.conn.execute('SELECT COUNT(*) FROM MilkCollection WHERE collected_by_employee IS NULL').fetchone(), (3,))
+
+    def test_product_takes_its_stock_and_sales_along(self):
+        batch_id, moved = self._archive('Products', 1)
+        self.assertEqual(moved, 3)
+        self.assertEqual((self._ids('Stock'), self._ids('Sales')), ([], []))
+        self._restore(batch_id)
+        self.assertEqual(self.conn.execute('SELECT product_id, current_quantity FROM Stock').fetchall(), [(1, 40)])
+        self.assertEqual(self._ids('Sales'), [1])
+
+    def test_restore_of_an_unknown_batch(self):
+        self.assertEqual(self._restore(99), 0)
+
+    def test_orphans_are_cleared_or_archived(self):
+        self.conn.execute('PRAGMA foreign_keys = OFF')
+        with self.conn:
+            self.conn.execute("INSERT INTO Sales (date, customer_id, shop_id, product_id, quantity, total_price) "
+                              "VALUES ('2025-03-05', 7, 1, 1, 1, 50)")
+            self.conn.execute("UPDATE Employees SET shop_id = 9 WHERE id = 2")
+        with self.conn:
+            self.assertEqual(Archive.resolve_violations(self.conn), 2)
+        self.assertEqual(self.conn.execute('PRAGMA foreign_key_check').fetchall(), [])
+        self.assertEqual(self._ids('Sales'), [1])
+        self.assertEqual(self.conn.execute('SELECT customer_id FROM Sales_archive').fetchall(), [(7,)])
+        self.assertEqual(self.conn.execute('SELECT shop_id FROM Employees WHERE id = 2').fetchone(), (None,))
+        self.assertEqual(self.conn.execute('SELECT label, rows FROM ArchiveBatches').fetchall(), [('orphaned rows', 2)])
+
+if __name__ == '__main__':
+    unittest.main()
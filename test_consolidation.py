@@ -0,0 +1,135 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+import Consolidation
+import Dairy
+
+# Consolidating shop databases into a central one: shared rows matched by
+# natural key, orphans retried, and edits and deletes carried over from the
+# shop's ChangeLog. Run with: python -m pytest test_consolidation.py
+
+def _open(path):
+    conn = sqlite3.connect(path)
+    Dairy.create_tables(conn)
+    Dairy.upgrade_schema(conn)
+    return conn
+
+def _rows(conn, sql):
+    return conn.execute(sql).fetchall()
+
+class ConsolidationTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.central_path = os.path.join(self.directory, 'central.db')
+        self.shop_path = os.path.join(self.directory, 'north.db')
+        self.shop = _open(self.shop_path)
+        with self.shop:
+            self.shop.execute("INSERT INTO Shops (name) VALUES ('North')")
+            self.shop.execute("INSERT INTO Products (product_name, unit) VALUES ('Ghee', 'kg')")
+            self.shop.execute("INSERT INTO Customers (name, contact) VALUES ('Asha', '555')")
+        self.central = sqlite3.connect(self.central_path)
+
+    def tearDown(self):
+        self.shop.close()
+        self.central.close()
+        shutil.rmtree(self.directory)
+
+    def _sale(self, customer_id, total):
+        with self.shop:
+            return self.shop.execute("INSERT INTO Sales (date, customer_id, shop_id, product_id, quantity, total_price) "
+                                     "VALUES ('2025-09-02', ?, 1, 1, 1, ?)", (customer_id, total)).lastrowid
+
+    def _consolidate(self, shop_path=None, shop_key='north'):
+        return Consolidation.consolidate_shop(shop_path or self.shop_path, shop_key, self.central_path)
+
+    def test_only_consolidated_tables_are_copied(self):
+        self._consolidate()
+        tables = {row[0] for row in self.central.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+        self.assertLessEqual(set(Consolidation.CONSOLIDATED_TABLES), tables)
+        for table in ('ChangeLog', 'SyncState', 'IdempotencyKeys', 'SearchIndex', 'AnalyticsPartitions', 'Stock'):
+            self.assertNotIn(table, tables)
+
+    def test_orphan_is_retried_without_holding_back_later_rows(self):
+        # Sale 1 refers to a customer the shop has not recorded yet
+        self._sale(7, 100)
+        self._sale(1, 200)
+        stats = self._consolidate()
+        self.assertEqual((stats['Sales']['inserted'], stats['Sales']['skipped']), (1, 1))
+        self.assertEqual(_rows(self.central, 'SELECT total_price FROM Sales'), [(200,)])
+        self.assertEqual(_rows(self.central, "SELECT last_id FROM ShardWatermark WHERE table_name = 'Sales'"), [(2,)])
+        self.assertEqual(_rows(self.central, 'SELECT table_name, local_id FROM ShardPending'), [('Sales', 1)])
+
+        with self.shop:
+            self.shop.execute("INSERT INTO Customers (id, name, contact) VALUES (7, 'Bala', '556')")
+        stats = self._consolidate()
+        self.assertEqual((stats['Sales']['inserted'], stats['Sales']['skipped']), (1, 0))
+        self.assertEqual(_rows(self.central, 'SELECT c.name, s.total_price FROM Sales s JOIN Customers c '
+                                             'ON c.id = s.customer_id ORDER BY s.total_price'),
+                         [('Bala', 100), ('Asha', 200)])
+        self.assertEqual(_rows(self.central, 'SELECT COUNT(*) FROM ShardPending'), [(0,)])
+
+    def test_edits_are_carried_over(self):
+        sale = self._sale(1, 100)
+        self._consolidate()
+        with self.shop:
+            self.shop.execute("UPDATE Sales SET total_price = 120 WHERE id = ?", (sale,))
+            self.shop.execute("UPDATE Customers SET contact = '999' WHERE id = 1")
+        stats = self._consolidate()
+        self.assertEqual((stats['Sales']['updated'], stats['Customers']['updated']), (1, 1))
+        self.assertEqual(_rows(self.central, 'SELECT total_price FROM Sales'), [(120,)])
+        self.assertEqual(_rows(self.central, 'SELECT name, contact FROM Customers'), [('Asha', '999')])
+        # The shop's log is pruned once consolidation has read it
+        self.assertEqual(_rows(self.shop, 'SELECT COUNT(*) FROM ChangeLog'), [(0,)])
+        self.assertEqual(self._consolidate()['Sales']['updated'], 0)
+
+    def test_edits_before_tracking_started_are_picked_up(self):
+        self._sale(1, 100)
+        self._consolidate()
+        # A log pruned past the consolidation cursor means every merged row is compared
+        with self.shop:
+            self.shop.execute("UPDATE Sales SET total_price = 130")
+            self.shop.execute("DELETE FROM ChangeLog")
+            self.shop.execute("INSERT OR REPLACE INTO SyncState (key, value) VALUES ('pruned_through', '1000')")
+        self.assertEqual(self._consolidate()['Sales']['updated'], 1)
+        self.assertEqual(_rows(self.central, 'SELECT total_price FROM Sales'), [(130,)])
+
+    def test_deleted_sale_is_deleted_centrally(self):
+        first = self._sale(1, 100)
+        self._sale(1, 200)
+        self._consolidate()
+        with self.shop:
+            self.shop.execute("DELETE FROM Sales WHERE id = ?", (first,))
+        self.assertEqual(self._consolidate()['Sales']['deleted'], 1)
+        self.assertEqual(_rows(self.central, 'SELECT total_price FROM Sales'), [(200,)])
+        self.assertEqual(_rows(self.central, "SELECT local_id FROM ShardIdMap WHERE table_name = 'Sales'"), [(2,)])
+
+    def test_shared_rows_are_matched_across_shops(self):
+        south_path = os.path.join(self.directory, 'south.db')
+        south = _open(south_path)
+        try:
+            with south:
+                south.execute("INSERT INTO Shops (name) VALUES ('South')")
+                south.execute("INSERT INTO Customers (name, contact) VALUES ('Chitra', '557')")
+                south.execute("INSERT INTO Customers (name, contact) VALUES ('Asha', '555')")
+                south.execute("INSERT INTO Products (product_name, unit) VALUES ('Ghee', 'kg')")
+                south.execute("INSERT INTO Sales (date, customer_id, shop_id, product_id, quantity, total_price) "
+                              "VALUES ('2025-09-03', 2, 1, 1, 2, 300)")
+        finally:
+            south.close()
+        self._sale(1, 100)
+        self._consolidate()
+        stats = self._consolidate(south_path, 'south')
+        self.assertEqual((stats['Customers']['inserted'], stats['Customers']['matched']), (1, 1))
+        # A customer deleted at one shop stays for the others
+        with self.shop:
+            self.shop.execute("DELETE FROM Sales")
+            self.shop.execute("DELETE FROM Customers WHERE id = 1")
+        self._consolidate()
+        self.assertEqual(_rows(self.central, 'SELECT c.name, sh.name, s.total_price FROM Sales s '
+                                             'JOIN Customers c ON c.id = s.customer_id JOIN Shops sh ON sh.id = s.shop_id'),
+                         [('Asha', 'South', 300)])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+import Config
+import Contention
+import Dairy
+import Idempotency
+import UI
+
+# Idempotency keys: a claimed key blocks a second write, and a write that
+# changed nothing or failed gives its key back for the corrected retry.
+# Run with: python -m pytest test_idempotency.py
+
+def _open(path):
+    conn = sqlite3.connect(path)
+    Dairy.create_tables(conn)
+    Dairy.upgrade_schema(conn)
+    return conn
+
+def _add_shop(conn, name):
+    return conn.execute('INSERT INTO Shops (name) VALUES (?)', (name,)).lastrowid
+
+def _nothing(conn):
+    return 'refused'
+
+def _fail(conn):
+    conn.execute("INSERT INTO Shops (name) VALUES ('Half')")
+    raise ValueError('failed after writing')
+
+class ClaimTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.conn = _open(os.path.join(self.directory, 'dairy.db'))
+
+    def tearDown(self):
+        self.conn.close()
+        shutil.rmtree(self.directory)
+
+    def _run(self, key, operation, *args):
+        return Contention.run_transaction(self.conn, Idempotency.claimed(key, 60, operation), *args)
+
+    def _keys(self):
+        return [row[0] for row in self.conn.execute('SELECT key FROM IdempotencyKeys')]
+
+    def _shops(self):
+        return [row[0] for row in self.conn.execute('SELECT name FROM Shops ORDER BY id')]
+
+    def test_second_use_of_a_key_writes_nothing(self):
+        self.assertEqual(self._run('k1', _add_shop, 'Main'), 1)
+        with self.assertRaises(Idempotency.DuplicateRequest):
+            self._run('k1', _add_shop, 'Main')
+        self.assertEqual(self._shops(), ['Main'])
+        self.assertEqual(self._keys(), ['k1'])
+
+    def test_operation_that_wrote_nothing_releases_its_key(self):
+        with self.assertRaises(Idempotency.NothingWritten) as caught:
+            self._run('k1', _nothing)
+        self.assertEqual(caught.exception.result, 'refused')
+        self.assertEqual(self._keys(), [])
+        self.assertEqual(self._run('k1', _add_shop, 'Main'), 1)
+        self.assertEqual(self._keys(), ['k1'])
+
+    def test_failed_operation_releases_its_key(self):
+        with self.assertRaises(ValueError):
+            self._run('k1', _fail)
+        self.assertEqual((self._keys(), self._shops()), ([], []))
+        self._run('k1', _add_shop, 'Main')
+        self.assertEqual(self._shops(), ['Main'])
+
+    def test_expired_key_can_be_claimed_again(self):
+        with self.conn:
+            self.assertTrue(Idempotency.claim(self.conn, 'k1', 60, now=1000))
+            self.assertFalse(Idempotency.claim(self.conn, 'k1', 60, now=1059))
+            self.assertTrue(Idempotency.claim(self.conn, 'k1', 60, now=1061))
+        self.assertEqual(self.conn.execute('SELECT expires_at FROM IdempotencyKeys').fetchone(), (1121,))
+
+    def test_purge_removes_expired_keys_in_batches(self):
+        with self.conn:
+            for i in range(5):
+                Idempotency.claim(self.conn, f'k{i}', 60, now=1000 + i * 100)
+        self.assertEqual(Idempotency.purge_expired(self.conn, now=1300, limit=2), 2)
+        self.assertEqual(Idempotency.purge_expired(self.conn, now=1300, limit=2), 1)
+        self.assertEqual(sorted(self._keys()), ['k3', 'k4'])
+
+class FormResubmitTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        path = os.path.join(self.directory, 'dairy.db')
+        conn = _open(path)
+        with conn:
+            _add_shop(conn, 'Main')
+            conn.execute("INSERT INTO Customers (name) VALUES ('Asha')")
+            conn.execute("INSERT INTO Products (product_name, unit) VALUES ('Ghee', 'kg')")
+            conn.execute("INSERT INTO Stock (product_id, current_quantity, last_updated) VALUES (1, 3, '2025-09-01')")
+        self.conn = conn
+        self.app = UI.create_app(Config.load_config(db_path=path))
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        self.app.extensions['dairy'].pool.close()
+        self.conn.close()
+        shutil.rmtree(self.directory)
+
+    def _post_sale(self):
+        return self.client.post('/add_sale', data={'date': '2025-09-02', 'customer_id': 1, 'shop_id': 1, 'product_id': 1,
+                                                   'quantity': 5, 'total_price': 50, 'idempotency_key': 'form-1'})
+
+    def test_refused_sale_can_be_resubmitted_with_the_same_form(self):
+        self._post_sale()
+        self.assertEqual(self.conn.execute('SELECT COUNT(*) FROM Sales').fetchone(), (0,))
+        with self.conn:
+            self.conn.execute('UPDATE Stock SET current_quantity = 10')
+        self._post_sale()
+        # A double submit of the accepted form is ignored
+        self._post_sale()
+        self.assertEqual(self.conn.execute('SELECT quantity FROM Sales').fetchall(), [(5,)])
+        self.assertEqual(self.conn.execute('SELECT current_quantity FROM Stock').fetchone(), (5,))
+
+if __name__ == '__main__':
+    unittest.main()
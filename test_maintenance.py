@@ -0,0 +1,110 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from datetime import date, datetime
+import Config
+import Dairy
+import Maintenance
+
+# Bounded maintenance steps: the off-peak window, incremental vacuum,
+# the time-boxed integrity check and a full pass.
+# Run with: python -m pytest test_maintenance.py
+
+def _open(path):
+    conn = sqlite3.connect(path)
+    Dairy.create_tables(conn)
+    Dairy.upgrade_schema(conn)
+    return conn
+
+class WindowTest(unittest.TestCase):
+    def test_daytime_window(self):
+        self.assertTrue(Maintenance.in_window('13:00-14:30', datetime(2025, 3, 1, 14, 29)))
+        self.assertFalse(Maintenance.in_window('13:00-14:30', datetime(2025, 3, 1, 14, 30)))
+
+    def test_window_past_midnight(self):
+        for hour, inside in ((23, True), (2, True), (5, False), (12, False)):
+            self.assertEqual(Maintenance.in_window('22:00-05:00', datetime(2025, 3, 1, hour, 0)), inside, hour)
+
+class MaintenanceTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'dairy.db')
+        self.conn = _open(self.path)
+        with self.conn:
+            self.conn.executemany("INSERT INTO Customers (name, address) VALUES (?, ?)",
+                                  [(f'Customer {i}', 'x' * 500) for i in range(2000)])
+        self.config = Config.load_config(db_path=self.path)
+
+    def tearDown(self):
+        self.conn.close()
+        shutil.rmtree(self.directory)
+
+    def _free_pages(self):
+        return self.conn.execute('PRAGMA freelist_count').fetchone()[0]
+
+    def test_new_database_vacuums_incrementally(self):
+        self.assertEqual(self.conn.execute('PRAGMA auto_vacuum').fetchone(), (Maintenance.AUTO_VACUUM_INCREMENTAL,))
+        self.assertFalse(Maintenance.enable_incremental_vacuum(self.conn))
+
+    def test_existing_database_is_switched_once(self):
+        conn = sqlite3.connect(os.path.join(self.directory, 'old.db'))
+        try:
+            conn.execute('CREATE TABLE t (x)')
+            conn.commit()
+            self.assertTrue(Maintenance.enable_incremental_vacuum(conn))
+            self.assertEqual(conn.execute('PRAGMA auto_vacuum').fetchone(), (Maintenance.AUTO_VACUUM_INCREMENTAL,))
+            self.assertFalse(Maintenance.enable_incremental_vacuum(conn))
+        finally:
+            conn.close()
+
+    def test_incremental_vacuum_releases_free_pages(self):
+        with self.conn:
+            self.conn.execute('DELETE FROM Customers')
+        free = self._free_pages()
+        self.assertGreater(free, 100)
+        self.assertEqual(Maintenance.incremental_vacuum(self.conn, max_seconds=5, pages_per_step=32), free)
+        self.assertEqual(self._free_pages(), 0)
+
+    def test_incremental_vacuum_gives_way_to_a_writer(self):
+        with self.conn:
+            self.conn.execute('DELETE FROM Customers')
+        writer = sqlite3.connect(self.path)
+        maintenance = sqlite3.connect(self.path, timeout=0)
+        try:
+            writer.execute('BEGIN IMMEDIATE')
+            self.assertEqual(Maintenance.incremental_vacuum(maintenance, max_seconds=5), 0)
+        finally:
+            writer.rollback()
+            writer.close()
+            maintenance.close()
+        self.assertGreater(self._free_pages(), 0)
+
+    def test_quick_check(self):
+        self.assertEqual(Maintenance.quick_check(self.conn), (True, ['ok']))
+
+    def test_quick_check_stops_at_its_time_budget(self):
+        self.assertEqual(Maintenance.quick_check(self.conn, max_seconds=-1), (None, ['time budget exhausted']))
+        # The progress handler is removed again
+        self.assertEqual(self.conn.execute('SELECT COUNT(*) FROM Customers').fetchone(), (2000,))
+
+    def test_pass_purges_keys_and_frees_pages(self):
+        with self.conn:
+            self.conn.executemany('INSERT INTO IdempotencyKeys (key, expires_at) VALUES (?, ?)', [('old', 0), ('live', 4e9)])
+            self.conn.execute('DELETE FROM Customers')
+        summary = Maintenance.run_maintenance(self.config)
+        self.assertTrue(summary['optimized'])
+        self.assertEqual(summary['keys_purged'], 1)
+        self.assertGreater(summary['pages_freed'], 0)
+        self.assertTrue(summary['check'])
+        self.assertEqual(self.conn.execute('SELECT key FROM IdempotencyKeys').fetchall(), [('live',)])
+
+    def test_integrity_check_runs_once_a_day(self):
+        scheduler = Maintenance.MaintenanceScheduler(self.config)
+        self.assertTrue(scheduler.run_once()['check'])
+        self.assertEqual(scheduler.last_check, date.today())
+        self.assertIsNone(scheduler.run_once()['check'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+import Dairy
+import Payroll
+
+# Payroll runs against a temporary database: what counts as already paid
+# for a period, and that a period is only paid once.
+# Run with: python -m pytest test_payroll.py
+
+def _open(path):
+    conn = sqlite3.connect(path)
+    Dairy.create_tables(conn)
+    Dairy.upgrade_schema(conn)
+    return conn
+
+class PayrollTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.conn = _open(os.path.join(self.directory, 'dairy.db'))
+        with self.conn:
+            self.conn.execute("INSERT INTO Shops (name) VALUES ('Main')")
+            self.conn.executemany("INSERT INTO Employees (name, shop_id, monthly_salary, join_date) VALUES (?, 1, ?, ?)",
+                                  [('Asha', 3100, '2024-01-01'), ('Bala', 3000, '2025-03-17')])
+
+    def tearDown(self):
+        self.conn.close()
+        shutil.rmtree(self.directory)
+
+    def _due(self, period):
+        return [(row[0], row[7]) for row in Payroll.preview_payroll(self.conn, period)]
+
+    def _run(self, period, pay_date=None):
+        with self.conn:
+            return Payroll.run_payroll(self.conn, period, pay_date)
+
+    def test_new_employee_is_prorated(self):
+        # Bala joined on the 17th: 15 of 31 days
+        self.assertEqual(self._due('2025-03'), [(1, 3100), (2, 1451.61)])
+
+    def test_partial_payment_reduces_due(self):
+        with self.conn:
+            self.conn.execute("INSERT INTO Salaries (employee_id, date, amount_paid) VALUES (1, '2025-03-10', 1000)")
+        self.assertEqual(self._due('2025-03'), [(1, 2100), (2, 1451.61)])
+        created, run = self._run('2025-03')
+        self.assertTrue(created)
+        self.assertEqual(self.conn.execute('SELECT employee_id, SUM(amount_paid) FROM Salaries GROUP BY employee_id').fetchall(),
+                         [(1, 3100), (2, 1451.61)])
+
+    def test_period_is_paid_once(self):
+        self._run('2025-03')
+        created, run = self._run('2025-03', '2025-04-05')
+        self.assertFalse(created)
+        self.assertEqual(run[2], '2025-03-31')
+        self.assertEqual(self.conn.execute('SELECT COUNT(*) FROM Salaries').fetchone(), (2,))
+        self.assertEqual(self._due('2025-03'), [(1, 0), (2, 0)])
+
+    def test_payment_after_the_period_counts_for_the_period(self):
+        # March paid on 1 April: March is settled and April is still fully due
+        self._run('2025-03', '2025-04-01')
+        self.assertEqual(self._due('2025-03'), [(1, 0), (2, 0)])
+        self.assertEqual(self._due('2025-04'), [(1, 3100), (2, 3000)])
+        self._run('2025-04')
+        self.assertEqual(self.conn.execute("SELECT period, SUM(amount_paid) FROM Salaries GROUP BY period").fetchall(),
+                         [('2025-03', 4551.61), ('2025-04', 6100)])
+
+    def test_advance_recorded_for_a_period(self):
+        with self.conn:
+            self.conn.execute("INSERT INTO Salaries (employee_id, date, amount_paid, period) VALUES (2, '2025-03-28', 500, '2025-04')")
+        self.assertEqual(self._due('2025-03'), [(1, 3100), (2, 1451.61)])
+        self.assertEqual(self._due('2025-04'), [(1, 3100), (2, 2500)])
+
+if __name__ == '__main__':
+    unittest.main()
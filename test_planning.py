@@ -0,0 +1,82 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+import Dairy
+import Planning
+
+# Demand forecast and the milk-constrained production plan, on four weeks
+# of sales ending Friday 2025-03-28. Run with: python -m pytest test_planning.py
+
+def _open(path):
+    conn = sqlite3.connect(path)
+    Dairy.create_tables(conn)
+    Dairy.upgrade_schema(conn)
+    return conn
+
+AS_OF = '2025-03-28'
+
+class PlanningTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.conn = _open(os.path.join(self.directory, 'dairy.db'))
+        with self.conn:
+            self.conn.executemany("INSERT INTO Shops (name) VALUES (?)", [('Main',), ('Depot',)])
+            self.conn.execute("INSERT INTO Customers (name) VALUES ('Walk-in')")
+            self.conn.executemany("INSERT INTO Products (product_name, ratio_to_milk, unit) VALUES (?, ?, ?)",
+                                  [('Paneer', 2.0, 'kg'), ('Curd', 1.0, 'kg'), ('Ghee', 20.0, 'kg')])
+            self.conn.executemany("INSERT INTO Stock (product_id, current_quantity, last_updated) VALUES (?, ?, '2025-03-01')",
+                                  [(1, 3), (2, 0), (3, 5)])
+            # Paneer sells 10 every Saturday at Main; Curd 2 a day at Depot.
+            # The February sale is outside the four-week window.
+            sales = [(d, 1, 1, 10) for d in ('2025-03-01', '2025-03-08', '2025-03-15', '2025-03-22')]
+            sales += [(f'2025-03-{day:02d}', 2, 2, 2) for day in range(1, 29)]
+            sales.append(('2025-02-28', 1, 1, 100))
+            self.conn.executemany("INSERT INTO Sales (date, customer_id, product_id, shop_id, quantity, total_price) VALUES (?, 1, ?, ?, ?, 0)", sales)
+            # 140 L over the window: 5 L a day expected
+            self.conn.executemany("INSERT INTO MilkCollection (date, source_type, quantity_liters) VALUES (?, 'Farm', 35)",
+                                  [('2025-03-07',), ('2025-03-14',), ('2025-03-21',), ('2025-03-28',)])
+
+    def tearDown(self):
+        self.conn.close()
+        shutil.rmtree(self.directory)
+
+    def _demand(self, **kwargs):
+        return {(row[0], row[2]): round(row[5], 4) for row in Planning.forecast_demand(self.conn, AS_OF, **kwargs)}
+
+    def test_weekday_is_blended_with_the_moving_average(self):
+        # Saturday: 0.7 * 10 + 0.3 * 40 / 28
+        self.assertEqual(self._demand(), {(1, 1): 7.4286, (2, 2): 2.0})
+
+    def test_horizon_sums_the_days(self):
+        # Sunday adds only the moving-average share
+        self.assertEqual(self._demand(horizon_days=2), {(1, 1): 7.8571, (2, 2): 4.0})
+
+    def test_seasonality_weight(self):
+        self.assertEqual(self._demand(seasonality=0.0), {(1, 1): 1.4286, (2, 2): 2.0})
+
+    def test_products_without_recent_sales_are_not_forecast(self):
+        self.assertNotIn(3, [key[0] for key in self._demand()])
+
+    def test_plan_is_scaled_to_the_expected_milk(self):
+        result = Planning.production_plan(self.conn, AS_OF)
+        self.assertEqual(result['expected_milk'], 5.0)
+        plan = {item['product_name']: item for item in result['plan']}
+        # Curd: 2 kg from 2 L; Paneer: 4.43 kg from 8.86 L after 3 kg in stock
+        self.assertAlmostEqual(result['milk_needed'], 2.0 + (7.4286 - 3) * 2, places=3)
+        self.assertAlmostEqual(result['scale'], 5.0 / result['milk_needed'])
+        self.assertAlmostEqual(sum(item['milk_liters'] for item in plan.values()), 5.0)
+        self.assertAlmostEqual(plan['Paneer']['to_produce'], plan['Paneer']['milk_liters'] / 2.0)
+        self.assertAlmostEqual(plan['Curd']['to_produce'] / 2.0, result['scale'])
+
+    def test_plan_is_not_scaled_when_milk_suffices(self):
+        with self.conn:
+            self.conn.execute("INSERT INTO MilkCollection (date, source_type, quantity_liters) VALUES ('2025-03-27', 'Farm', 560)")
+        result = Planning.production_plan(self.conn, AS_OF)
+        self.assertEqual(result['scale'], 1.0)
+        plan = {item['product_name']: round(item['to_produce'], 4) for item in result['plan']}
+        self.assertEqual(plan, {'Curd': 2.0, 'Paneer': 4.4286})
+
+if __name__ == '__main__':
+    unittest.main()
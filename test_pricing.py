@@ -0,0 +1,126 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+import Config
+import Dairy
+import Pricing
+import Repositories
+import UI
+
+# Price list lookups through PriceIndex: effective dates, the scope order
+# (customer at shop, customer, shop, everywhere) and reloading after a
+# change. Run with: python -m pytest test_pricing.py
+
+def _open(path):
+    conn = sqlite3.connect(path)
+    Dairy.create_tables(conn)
+    Dairy.upgrade_schema(conn)
+    return conn
+
+class PriceIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.conn = _open(os.path.join(self.directory, 'dairy.db'))
+        with self.conn:
+            self.conn.executemany("INSERT INTO Shops (name) VALUES (?)", [('Main',), ('Depot',)])
+            self.conn.executemany("INSERT INTO Customers (name) VALUES (?)", [('Asha',), ('Bala',)])
+            Repositories.add_product(self.conn, 'Ghee', 'Fat', 20, 'kg', '2025-01-01')
+            Repositories.add_product(self.conn, 'Curd', 'Cultured', 1, 'kg', '2025-01-01')
+            self.conn.execute('UPDATE Stock SET current_quantity = 100')
+            Pricing.set_price(self.conn, 1, '2025-01-01', 500)
+            Pricing.set_price(self.conn, 1, '2025-03-01', 520)
+            Pricing.set_price(self.conn, 1, '2025-02-01', 510, shop_id=2)
+            Pricing.set_price(self.conn, 1, '2025-01-15', 480, customer_id=1)
+            Pricing.set_price(self.conn, 1, '2025-02-15', 470, shop_id=2, customer_id=1)
+
+    def tearDown(self):
+        self.conn.close()
+        shutil.rmtree(self.directory)
+
+    def _price(self, on_date, shop_id=1, customer_id=2, product_id=1):
+        return Pricing.unit_price(self.conn, product_id, shop_id, customer_id, on_date)
+
+    def test_price_in_force_on_the_date(self):
+        self.assertEqual([self._price(d) for d in ('2024-12-31', '2025-01-01', '2025-02-28', '2025-03-01')],
+                         [None, 500, 500, 520])
+
+    def test_most_specific_scope_wins(self):
+        self.assertEqual(self._price('2025-02-20', shop_id=2), 510)
+        self.assertEqual(self._price('2025-02-20', customer_id=1), 480)
+        self.assertEqual(self._price('2025-02-20', shop_id=2, customer_id=1), 470)
+        # Before the shop's customer price starts, the customer's own price applies
+        self.assertEqual(self._price('2025-02-10', shop_id=2, customer_id=1), 480)
+
+    def test_form_values_are_accepted(self):
+        self.assertEqual(Pricing.unit_price(self.conn, '1', '2', '', '2025-02-20'), 510)
+
+    def test_index_reloads_after_a_change(self):
+        index = Pricing.price_index(self.conn)
+        self.assertIs(Pricing.price_index(self.conn), index)
+        with self.conn:
+            Pricing.set_price(self.conn, 1, '2025-03-01', 530)
+        self.assertIsNot(Pricing.price_index(self.conn), index)
+        self.assertEqual(self._price('2025-03-02'), 530)
+        with self.conn:
+            Pricing.delete_price(self.conn, 2)
+        self.assertEqual(self._price('2025-03-02'), 500)
+
+    def test_quote_and_missing_price(self):
+        self.assertEqual(Pricing.quote(self.conn, 1, 1, 2, '2025-01-10', 1.5), 750)
+        with self.assertRaises(Pricing.PriceNotFound):
+            Pricing.quote(self.conn, 2, 1, 2, '2025-01-10', 1)
+
+    def test_sale_without_a_total_is_priced_from_the_list(self):
+        with self.conn:
+            Repositories.record_sale(self.conn, '2025-02-20', 1, 2, 1, 2, None)
+            with self.assertRaises(Pricing.PriceNotFound):
+                Repositories.record_sale(self.conn, '2025-02-20', 1, 2, 2, 2, None)
+        self.assertEqual(self.conn.execute('SELECT product_id, total_price FROM Sales').fetchall(), [(1, 940)])
+
+    def test_bulk_reprice(self):
+        with self.conn:
+            written = Pricing.bulk_reprice(self.conn, '2025-04-01', percent=10, include_overrides=False)
+        self.assertEqual(written, 2)
+        self.assertEqual((self._price('2025-04-01'), self._price('2025-04-01', shop_id=2)), (572, 561))
+        self.assertEqual(self._price('2025-04-01', customer_id=1), 480)
+
+class EditSaleTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        path = os.path.join(self.directory, 'dairy.db')
+        self.conn = _open(path)
+        with self.conn:
+            self.conn.execute("INSERT INTO Shops (name) VALUES ('Main')")
+            self.conn.execute("INSERT INTO Customers (name) VALUES ('Asha')")
+            Repositories.add_product(self.conn, 'Ghee', 'Fat', 20, 'kg', '2025-01-01')
+            self.conn.execute('UPDATE Stock SET current_quantity = 100')
+            Pricing.set_price(self.conn, 1, '2025-01-01', 500)
+            Repositories.record_sale(self.conn, '2025-02-01', 1, 1, 1, 2, None)
+        self.app = UI.create_app(Config.load_config(db_path=path))
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        self.app.extensions['dairy'].pool.close()
+        self.conn.close()
+        shutil.rmtree(self.directory)
+
+    def _edit(self, quantity, total_price=''):
+        self.client.post('/edit_sale/1', data={'date': '2025-02-01', 'customer_id': 1, 'shop_id': 1, 'product_id': 1,
+                                               'quantity': quantity, 'total_price': total_price})
+        return self.conn.execute('SELECT quantity, total_price FROM Sales').fetchone()
+
+    def test_form_does_not_carry_the_old_total(self):
+        page = self.client.get('/edit_sale/1').data.decode()
+        self.assertIn('placeholder="From price list (was 1000.0)"', page)
+        self.assertNotIn('value="1000.0"', page)
+
+    def test_changed_quantity_is_repriced(self):
+        self.assertEqual(self._edit(3), (3, 1500))
+
+    def test_entered_total_is_kept(self):
+        self.assertEqual(self._edit(3, 1400), (3, 1400))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+import Dairy
+import Profitability
+
+# Profitability cube: the cells a write marks dirty and the incremental
+# refresh of only those cells. Run with: python -m pytest test_profitability.py
+
+def _open(path):
+    conn = sqlite3.connect(path)
+    Dairy.create_tables(conn)
+    Dairy.upgrade_schema(conn)
+    return conn
+
+class ProfitCubeTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.conn = _open(os.path.join(self.directory, 'dairy.db'))
+        with self.conn:
+            self.conn.executemany("INSERT INTO Shops (name) VALUES (?)", [('Main',), ('Depot',)])
+            self.conn.execute("INSERT INTO Customers (name) VALUES ('Asha')")
+            self.conn.executemany("INSERT INTO Products (product_name, category, unit) VALUES (?, ?, 'kg')",
+                                  [('Ghee', 'Fat'), ('Curd', None)])
+            fuel = self.conn.execute("INSERT INTO ExpenseCategories (name) VALUES ('Fuel')").lastrowid
+            self.conn.execute("INSERT INTO Employees (name, shop_id) VALUES ('Ravi', 1)")
+            self.conn.executemany("INSERT INTO Sales (date, customer_id, shop_id, product_id, quantity, total_price) VALUES (?, 1, ?, ?, 1, ?)",
+                                  [('2025-03-02', 1, 1, 500), ('2025-03-09', 2, 2, 40), ('2025-04-01', 1, 1, 520)])
+            self.conn.executemany("INSERT INTO Expenses (date, shop_id, description, amount, category_id) VALUES (?, ?, ?, ?, ?)",
+                                  [('2025-03-05', 1, 'Diesel', 100, fuel), ('2025-03-06', 1, 'Tape', 5, None)])
+            self.conn.execute("INSERT INTO Salaries (employee_id, date, amount_paid) VALUES (1, '2025-03-31', 3000)")
+        self._refresh()
+
+    def tearDown(self):
+        self.conn.close()
+        shutil.rmtree(self.directory)
+
+    def _refresh(self):
+        with self.conn:
+            return Profitability.refresh_cube(self.conn)
+
+    def _cube(self):
+        return self.conn.execute('SELECT shop_id, month, source, category, amount, entries FROM ProfitCube '
+                                 'ORDER BY shop_id, month, source, category').fetchall()
+
+    def _dirty(self):
+        return self.conn.execute('SELECT shop_id, month, source FROM ProfitDirty ORDER BY 1, 2, 3').fetchall()
+
+    def test_cube_sums_each_cell(self):
+        self.assertEqual(self._cube(), [
+            (1, '2025-03', 'expense', 'Fuel', 100, 1), (1, '2025-03', 'expense', 'Uncategorized', 5, 1),
+            (1, '2025-03', 'salary', 'Salaries', 3000, 1), (1, '2025-03', 'sale', 'Fat', 500, 1),
+            (1, '2025-04', 'sale', 'Fat', 520, 1), (2, '2025-03', 'sale', 'Uncategorized', 40, 1)])
+        self.assertEqual(Profitability.pending(self.conn), 0)
+        self.assertEqual(self._refresh(), 0)
+
+    def test_only_dirty_cells_are_recomputed(self):
+        with self.conn:
+            # Tamper with a cell no write touches: the refresh must leave it
+            self.conn.execute("UPDATE ProfitCube SET amount = 1 WHERE shop_id = 1 AND month = '2025-04'")
+            self.conn.execute("UPDATE Sales SET total_price = 60 WHERE id = 2")
+        self.assertEqual(self._dirty(), [(2, '2025-03', 'sale')])
+        self.assertEqual(self._refresh(), 1)
+        cube = {row[:4]: row[4] for row in self._cube()}
+        self.assertEqual((cube[(2, '2025-03', 'sale', 'Uncategorized')], cube[(1, '2025-04', 'sale', 'Fat')]), (60, 1))
+
+    def test_moved_sale_updates_both_cells(self):
+        with self.conn:
+            self.conn.execute("UPDATE Sales SET date = '2025-05-01', shop_id = 2 WHERE id = 3")
+        self.assertEqual(self._dirty(), [(1, '2025-04', 'sale'), (2, '2025-05', 'sale')])
+        self._refresh()
+        months = [row[:3] for row in self._cube() if row[2] == 'sale']
+        self.assertNotIn((1, '2025-04', 'sale'), months)
+        self.assertIn((2, '2025-05', 'sale'), months)
+
+    def test_renamed_category_refiles_its_rows(self):
+        with self.conn:
+            self.conn.execute("UPDATE Products SET category = 'Ghee' WHERE id = 1")
+            self.conn.execute("UPDATE ExpenseCategories SET name = 'Vehicles' WHERE name = 'Fuel'")
+        self._refresh()
+        self.assertEqual(Profitability.categories(self.conn), ['Ghee', 'Salaries', 'Uncategorized', 'Vehicles'])
+
+    def test_salaries_follow_their_employee(self):
+        with self.conn:
+            self.conn.execute("UPDATE Employees SET shop_id = 2 WHERE id = 1")
+        self._refresh()
+        self.assertIn((2, '2025-03', 'salary', 'Salaries', 3000, 1), self._cube())
+        self.assertNotIn((1, '2025-03', 'salary', 'Salaries', 3000, 1), self._cube())
+
+    def test_shop_deleted_under_its_employees(self):
+        self.conn.execute('PRAGMA foreign_keys = ON')
+        with self.conn:
+            self.conn.execute("INSERT INTO Shops (name) VALUES ('Kiosk')")
+            self.conn.execute("UPDATE Employees SET shop_id = 3 WHERE id = 1")
+            self.conn.execute("DELETE FROM Shops WHERE id = 3")
+        self._refresh()
+        self.assertIn((0, '2025-03', 'salary', 'Salaries', 3000, 1), self._cube())
+
+    def test_slices(self):
+        rows = Profitability.profitability(self.conn, group_by=('shop', 'month')).fetchall()
+        self.assertEqual([tuple(row) for row in rows],
+                         [('Depot', '2025-03', 40, 0, 0, 40), ('Main', '2025-03', 500, 105, 3000, -2605),
+                          ('Main', '2025-04', 520, 0, 0, 520)])
+        self.assertEqual(tuple(Profitability.profitability(self.conn, group_by=(), category='Fat').fetchone()), (1020, 0, 0, 1020))
+
+if __name__ == '__main__':
+    unittest.main()
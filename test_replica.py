@@ -0,0 +1,82 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+import unittest
+import Dairy
+import Replica
+
+# Read replica: copies of the primary, staleness and read-your-writes.
+# Run with: python -m pytest test_replica.py
+
+def _open(path):
+    conn = sqlite3.connect(path)
+    Dairy.create_tables(conn)
+    Dairy.upgrade_schema(conn)
+    return conn
+
+class ReadReplicaTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'dairy.db')
+        self.conn = _open(self.path)
+        with self.conn:
+            self.conn.execute("INSERT INTO Customers (name) VALUES ('Asha')")
+        self.replica = Replica.ReadReplica(self.path, max_staleness=30.0)
+
+    def tearDown(self):
+        self.conn.close()
+        shutil.rmtree(self.directory)
+
+    def _names(self, conn):
+        try:
+            return [row[0] for row in conn.execute('SELECT name FROM Customers ORDER BY id')]
+        finally:
+            conn.close()
+
+    def test_no_replica_until_the_first_refresh(self):
+        self.assertIsNone(self.replica.refreshed_at())
+        self.assertIsNone(self.replica.connect())
+
+    def test_replica_is_a_copy_taken_at_refresh(self):
+        self.replica.refresh()
+        with self.conn:
+            self.conn.execute("INSERT INTO Customers (name) VALUES ('Bala')")
+        self.assertEqual(self._names(self.replica.connect()), ['Asha'])
+        self.replica.refresh()
+        self.assertEqual(self._names(self.replica.connect()), ['Asha', 'Bala'])
+
+    def test_reader_keeps_its_copy_across_a_refresh(self):
+        self.replica.refresh()
+        reader = self.replica.connect()
+        with self.conn:
+            self.conn.execute("INSERT INTO Customers (name) VALUES ('Bala')")
+        self.replica.refresh()
+        self.assertEqual(self._names(reader), ['Asha'])
+
+    def test_replica_is_read_only(self):
+        self.replica.refresh()
+        reader = self.replica.connect()
+        try:
+            with self.assertRaises(sqlite3.OperationalError):
+                reader.execute("INSERT INTO Customers (name) VALUES ('Bala')")
+        finally:
+            reader.close()
+
+    def test_stale_replica_is_not_used(self):
+        self.replica.refresh()
+        old = time.time() - 60
+        os.utime(self.replica.replica_path, (old, old))
+        self.assertFalse(self.replica.is_fresh())
+        self.assertIsNone(self.replica.connect())
+
+    def test_client_that_wrote_after_the_copy_reads_the_primary(self):
+        self.replica.refresh()
+        taken = self.replica.refreshed_at()
+        self.assertTrue(self.replica.is_fresh(since=taken - 1))
+        self.assertFalse(self.replica.is_fresh(since=taken + 1))
+        self.assertIsNone(self.replica.connect(since=taken + 1))
+
+if __name__ == '__main__':
+    unittest.main()
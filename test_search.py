@@ -0,0 +1,78 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+import Dairy
+import Search
+
+# Typeahead search over the FTS5 index: prefix matches, the typo fallback
+# and index maintenance by the triggers. Run with: python -m pytest test_search.py
+
+def _open(path):
+    conn = sqlite3.connect(path)
+    Dairy.create_tables(conn)
+    Dairy.upgrade_schema(conn)
+    return conn
+
+class SearchTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.conn = _open(os.path.join(self.directory, 'dairy.db'))
+        with self.conn:
+            self.conn.executemany("INSERT INTO Customers (name, contact, address) VALUES (?, ?, ?)",
+                                  [('John Smith', '555-0101', 'Hill Road'), ('Joan Smithers', '555-0102', 'Lake View'),
+                                   ('Priya Nair', '555-0103', 'Smith Street')])
+            self.conn.execute("INSERT INTO Suppliers (name, contact, address) VALUES ('Green Farm', 'Ravi', 'Hill Road')")
+
+    def tearDown(self):
+        self.conn.close()
+        shutil.rmtree(self.directory)
+
+    def _found(self, text, **kwargs):
+        return [(row[0], row[1]) for row in Search.search(self.conn, text, **kwargs)]
+
+    def test_prefix_match_ranks_names_first(self):
+        self.assertEqual(self._found('smith')[:2], [('Customers', 1), ('Customers', 2)])
+        self.assertEqual(self._found('smith')[2], ('Customers', 3))
+
+    def test_all_words_must_match(self):
+        self.assertEqual(self._found('joan smi'), [('Customers', 2)])
+
+    def test_entity_filter(self):
+        self.assertEqual(self._found('hill road', entity='Suppliers'), [('Suppliers', 1)])
+
+    def test_one_letter_words_are_ignored(self):
+        self.assertEqual(self._found('j'), [])
+
+    def test_short_terms_return_name_matches_first(self):
+        self.assertEqual(self._found('sm', limit=2), [('Customers', 1), ('Customers', 2)])
+
+    def test_misspelt_word_matches_the_indexed_word(self):
+        # transposition, substitution, deletion and insertion
+        for text in ('jonh', 'jihn', 'jhn', 'johhn'):
+            self.assertEqual(self._found(text), [('Customers', 1)], text)
+
+    def test_unfinished_misspelt_word_matches_word_starts(self):
+        self.assertEqual(self._found('pryi'), [('Customers', 3)])
+
+    def test_word_that_starts_an_indexed_word_is_not_corrected(self):
+        self.assertEqual(Search._correction_terms(self.conn, 'smit'), [])
+        self.assertEqual(Search._correction_terms(self.conn, 'jonh'), ['"john"'])
+
+    def test_typo_in_one_of_several_words(self):
+        self.assertEqual(self._found('jonh smith'), [('Customers', 1)])
+
+    def test_any_word_matches_when_all_cannot(self):
+        self.assertEqual(sorted(self._found('priya farm')), [('Customers', 3), ('Suppliers', 1)])
+
+    def test_triggers_keep_the_index_in_sync(self):
+        with self.conn:
+            self.conn.execute("UPDATE Customers SET name = 'Jon Smith' WHERE id = 1")
+            self.conn.execute("DELETE FROM Customers WHERE id = 2")
+        self.assertEqual(self._found('jon'), [('Customers', 1)])
+        self.assertEqual(self._found('smithers'), [])
+        self.assertEqual(self.conn.execute('SELECT COUNT(*) FROM SearchIndex').fetchone(), (3,))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+import Dairy
+import Settlement
+
+# Supplier settlement: pricing collections by fat band and recomputing only
+# the months a change touched. Run with: python -m pytest test_settlement.py
+
+def _open(path):
+    conn = sqlite3.connect(path)
+    Dairy.create_tables(conn)
+    Dairy.upgrade_schema(conn)
+    return conn
+
+class SettlementTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.conn = _open(os.path.join(self.directory, 'dairy.db'))
+        with self.conn:
+            self.conn.executemany("INSERT INTO Suppliers (name) VALUES (?)", [('Green Farm',), ('Hill Dairy',)])
+            self.conn.execute("INSERT INTO Employees (name) VALUES ('Ravi')")
+            self.conn.executemany("INSERT INTO FatPriceBands (effective_from, min_fat, max_fat, price_per_liter) VALUES (?, ?, ?, ?)",
+                                  [('2025-01-01', 3.0, 4.0, 40), ('2025-01-01', 4.0, 10.0, 50), ('2025-03-15', 4.0, 10.0, 55)])
+            self.conn.executemany("INSERT INTO MilkCollection (date, source_type, supplier_id, quantity_liters, fat_content, collected_by_employee) "
+                                  "VALUES (?, 'Supplier', ?, ?, ?, 1)",
+                                  [('2025-03-10', 1, 100, 4.5), ('2025-03-20', 1, 100, 4.5), ('2025-03-21', 1, 10, 2.0),
+                                   ('2025-04-02', 2, 50, 3.5)])
+
+    def tearDown(self):
+        self.conn.close()
+        shutil.rmtree(self.directory)
+
+    def _settle(self, periods=None):
+        with self.conn:
+            return Settlement.run_settlement(self.conn, periods)
+
+    def _dirty(self):
+        return [row[0] for row in self.conn.execute('SELECT period FROM SettlementDirtyPeriods ORDER BY period')]
+
+    def _settlements(self):
+        return self.conn.execute('SELECT supplier_id, period, collections, liters, round(avg_fat, 3), amount, unpriced_liters '
+                                 'FROM SupplierSettlements ORDER BY period, supplier_id').fetchall()
+
+    def test_collections_are_priced_by_the_band_in_effect(self):
+        self.assertEqual(self._settle(), ['2025-03', '2025-04'])
+        # 100 L at 50 before the 15th, 100 L at 55 after; 10 L below every band
+        self.assertEqual(self._settlements(), [(1, '2025-03', 3, 210, 4.381, 10500, 10), (2, '2025-04', 1, 50, 3.5, 2000, 0)])
+
+    def test_nothing_to_do_once_settled(self):
+        self._settle()
+        self.assertEqual(self._dirty(), [])
+        self.assertEqual(self._settle(), [])
+
+    def test_collection_edit_marks_its_months(self):
+        self._settle()
+        with self.conn:
+            self.conn.execute("UPDATE MilkCollection SET fat_content = 3.5 WHERE id = 3")
+            self.conn.execute("UPDATE MilkCollection SET date = '2025-05-01' WHERE id = 4")
+        self.assertEqual(self._dirty(), ['2025-03', '2025-04', '2025-05'])
+        self.assertEqual(self._settle(), ['2025-03', '2025-04', '2025-05'])
+        self.assertEqual(self._settlements(), [(1, '2025-03', 3, 210, 4.452, 10900, 0), (2, '2025-05', 1, 50, 3.5, 2000, 0)])
+
+    def test_delete_marks_its_month(self):
+        self._settle()
+        with self.conn:
+            self.conn.execute("DELETE FROM MilkCollection WHERE id = 4")
+        self.assertEqual(self._settle(), ['2025-04'])
+        self.assertEqual([row[1] for row in self._settlements()], ['2025-03'])
+
+    def test_unrelated_column_does_not_mark(self):
+        self._settle()
+        self.conn.execute('PRAGMA foreign_keys = ON')
+        with self.conn:
+            self.conn.execute("UPDATE MilkCollection SET source_type = 'Farm' WHERE id = 1")
+            # ON DELETE SET NULL clears collected_by_employee on every collection
+            self.conn.execute("DELETE FROM Employees WHERE id = 1")
+        self.assertEqual(self.conn.execute('SELECT COUNT(*) FROM MilkCollection WHERE collected_by_employee IS NULL').fetchone(), (4,))
+        self.assertEqual(self._dirty(), [])
+
+    def test_new_band_marks_months_from_its_date(self):
+        self._settle()
+        with self.conn:
+            self.conn.execute("INSERT INTO FatPriceBands (effective_from, min_fat, max_fat, price_per_liter) VALUES ('2025-04-01', 3.0, 4.0, 42)")
+        self.assertEqual(self._dirty(), ['2025-04'])
+        self._settle()
+        self.assertEqual(self._settlements()[1][5], 2100)
+
+    def test_band_moved_earlier_marks_from_the_earlier_date(self):
+        self._settle()
+        with self.conn:
+            self.conn.execute("UPDATE FatPriceBands SET effective_from = '2025-03-01' WHERE id = 3")
+        self.assertEqual(self._dirty(), ['2025-03', '2025-04'])
+        self._settle()
+        self.assertEqual(self._settlements()[0][5], 11000)
+
+    def test_explicit_periods_leave_the_others_dirty(self):
+        self.assertEqual(self._settle(['2025-04']), ['2025-04'])
+        self.assertEqual(self._dirty(), ['2025-03'])
+        self.assertEqual([row[1] for row in self._settlements()], ['2025-04'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+import Dairy
+import Repositories
+import Stock_Alerts
+
+# Low-stock alerts raised and resolved by the Stock triggers, and the log
+# drain. Run with: python -m pytest test_stock_alerts.py
+
+def _open(path):
+    conn = sqlite3.connect(path)
+    Dairy.create_tables(conn)
+    Dairy.upgrade_schema(conn)
+    return conn
+
+class StockAlertTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.conn = _open(os.path.join(self.directory, 'dairy.db'))
+        with self.conn:
+            self.conn.execute("INSERT INTO Shops (name) VALUES ('Main')")
+            self.conn.execute("INSERT INTO Customers (name) VALUES ('Asha')")
+            Repositories.add_product(self.conn, 'Ghee', 'Fat', 20, 'kg', '2025-09-01')
+            Repositories.add_product(self.conn, 'Curd', 'Cultured', 1, 'kg', '2025-09-01')
+            self.conn.execute("UPDATE Stock SET current_quantity = 50")
+
+    def tearDown(self):
+        self.conn.close()
+        shutil.rmtree(self.directory)
+
+    def _open_alerts(self):
+        return [(row[1], row[4], row[5]) for row in Stock_Alerts.list_open_alerts(self.conn)]
+
+    def _sell(self, quantity, product_id=1):
+        with self.conn:
+            Repositories.record_sale(self.conn, '2025-09-02', 1, 1, product_id, quantity, 0)
+
+    def test_no_alert_without_a_reorder_level(self):
+        self._sell(45)
+        self.assertEqual(self._open_alerts(), [])
+
+    def test_drop_below_the_threshold_raises_one_alert(self):
+        with self.conn:
+            Stock_Alerts.set_reorder_level(self.conn, 1, 10)
+        self._sell(35)
+        self.assertEqual(self._open_alerts(), [])
+        self._sell(6)
+        self._sell(4)
+        self.assertEqual(self._open_alerts(), [(1, 9, 10)])
+        self.assertEqual(Stock_Alerts.count_open_alerts(self.conn), 1)
+
+    def test_restock_resolves_the_alert(self):
+        with self.conn:
+            Stock_Alerts.set_reorder_level(self.conn, 1, 10)
+        self._sell(45)
+        with self.conn:
+            Repositories.record_production(self.conn, '2025-09-03', 1, 200, None)
+        self.assertEqual(self._open_alerts(), [])
+        self.assertEqual(self.conn.execute('SELECT COUNT(*) FROM StockAlerts WHERE resolved_at IS NOT NULL').fetchone(), (1,))
+        self._sell(10)
+        self.assertEqual(self._open_alerts(), [(1, 5, 10)])
+
+    def test_new_threshold_checks_current_stock(self):
+        with self.conn:
+            Stock_Alerts.set_reorder_level(self.conn, 2, 60)
+        self.assertEqual(self._open_alerts(), [(2, 50, 60)])
+        with self.conn:
+            Stock_Alerts.set_reorder_level(self.conn, 2, 40)
+        self.assertEqual(self._open_alerts(), [])
+        with self.conn:
+            Stock_Alerts.set_reorder_level(self.conn, 2, 60)
+            Stock_Alerts.set_reorder_level(self.conn, 2, None)
+        self.assertEqual(self._open_alerts(), [])
+
+    def test_dismissed_alert_is_raised_again_on_the_next_change(self):
+        with self.conn:
+            Stock_Alerts.set_reorder_level(self.conn, 1, 10)
+        self._sell(45)
+        with self.conn:
+            Stock_Alerts.dismiss_alert(self.conn, 1)
+        self.assertEqual(self._open_alerts(), [])
+        self._sell(1)
+        self.assertEqual(self._open_alerts(), [(1, 4, 10)])
+
+    def test_drain_logs_each_alert_once(self):
+        with self.conn:
+            Stock_Alerts.set_reorder_level(self.conn, 1, 10)
+            Stock_Alerts.set_reorder_level(self.conn, 2, 60)
+        self._sell(45)
+        with self.assertLogs('dairy.stock_alerts', 'WARNING') as logged:
+            self.assertEqual(Stock_Alerts.drain_alerts(self.conn), 2)
+        self.assertEqual(logged.output, ['WARNING:dairy.stock_alerts:Low stock: Curd at 50.0 (reorder level 60.0)',
+                                         'WARNING:dairy.stock_alerts:Low stock: Ghee at 5.0 (reorder level 10.0)'])
+        self.assertEqual(Stock_Alerts.drain_alerts(self.conn), 0)
+
+if __name__ == '__main__':
+    unittest.main()
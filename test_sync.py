@@ -0,0 +1,228 @@
+import os
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+import urllib.request
+import Accounts
+import Contention
+import Dairy
+import Sync
+
+# Terminal sync between two databases. TerminalSyncTest skips the HTTP hop
+# (every payload still goes through encode_payload/decode_payload);
+# HttpSyncTest runs the server app in a subprocess and syncs over HTTP.
+# Run with: python -m pytest test_sync.py  (or python -m unittest test_sync)
+
+def _open(path):
+    conn = sqlite3.connect(path)
+    Dairy.create_tables(conn)
+    Dairy.upgrade_schema(conn)
+    return conn
+
+def _sync(terminal_conn, server_conn, terminal):
+    with terminal_conn:
+        Sync.ensure_sync_schema(terminal_conn, Sync.UPLOAD_TABLES)
+    upload = Sync.build_upload(terminal_conn, terminal)
+    response = Sync.decode_payload(Sync.encode_payload(Contention.run_transaction(
+        server_conn, Sync.apply_sync, Sync.decode_payload(Sync.encode_payload(upload)))))
+    Sync.apply_download(terminal_conn, upload, response)
+    return response
+
+def _rows(conn, sql):
+    return conn.execute(sql).fetchall()
+
+class TerminalSyncTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.server = _open(os.path.join(self.directory, 'server.db'))
+        self.till = _open(os.path.join(self.directory, 'till.db'))
+        with self.server:
+            self.server.execute("INSERT INTO Shops (name) VALUES ('Main')")
+            self.server.executemany("INSERT INTO Customers (name) VALUES (?)", [('Asha',), ('Bala',)])
+            self.server.execute("INSERT INTO Products (product_name, unit) VALUES ('Ghee', 'kg')")
+            self.server.execute("INSERT INTO Stock (product_id, current_quantity, last_updated) VALUES (1, 50, '2025-09-01')")
+        with self.till:
+            self.till.execute("INSERT INTO Shops (name) VALUES ('Main')")
+
+    def tearDown(self):
+        self.server.close()
+        self.till.close()
+        shutil.rmtree(self.directory)
+
+    def test_sales_up_master_data_down(self):
+        first = _sync(self.till, self.server, 'till-1')
+        self.assertEqual(_rows(self.till, 'SELECT id, name FROM Customers'), [(1, 'Asha'), (2, 'Bala')])
+        self.assertEqual(_rows(self.till, 'SELECT current_quantity FROM Stock'), [(50,)])
+
+        with self.till:
+            self.till.execute("INSERT INTO Sales (date, customer_id, shop_id, product_id, quantity, total_price) "
+                              "VALUES ('2025-09-02', 1, 1, 1, 5, 500)")
+        with self.server:
+            self.server.execute("DELETE FROM Customers WHERE id = 2")
+        second = _sync(self.till, self.server, 'till-1')
+        self.assertEqual(second['applied'], 1)
+        self.assertGreater(second['cursor'], first['cursor'])
+        self.assertEqual(_rows(self.server, 'SELECT customer_id, quantity FROM Sales'), [(1, 5)])
+        # The server's stock movement and delete come back as a delta
+        self.assertEqual(second['changes']['Customers']['deletes'], [2])
+        self.assertEqual(_rows(self.till, 'SELECT id FROM Customers'), [(1,)])
+        self.assertEqual(_rows(self.till, 'SELECT current_quantity FROM Stock'), [(45,)])
+        self.assertEqual(_rows(self.till, 'SELECT COUNT(*) FROM ChangeLog'), [(0,)])
+
+        # Nothing new: an empty delta, and the acknowledged log is pruned
+        third = _sync(self.till, self.server, 'till-1')
+        self.assertEqual(third['changes']['Products'], {'columns': ['id', 'product_name', 'category', 'ratio_to_milk', 'unit'],
+                                                        'upserts': [], 'deletes': []})
+        self.assertEqual(_rows(self.server, 'SELECT COUNT(*) FROM ChangeLog'), [(0,)])
+
+    def test_server_without_log_entries_sends_one_snapshot(self):
+        first = _sync(self.till, self.server, 'till-1')
+        self.assertEqual(len(first['changes']['Customers']['upserts']), 2)
+        # Master data was loaded before sync was set up, so nothing is logged
+        self.assertEqual(first['cursor'], 0)
+        second = _sync(self.till, self.server, 'till-1')
+        self.assertEqual(second['changes']['Customers']['upserts'], [])
+
+    def test_snapshot_carries_pruned_deletes(self):
+        _sync(self.till, self.server, 'till-1')
+        stale = os.path.join(self.directory, 'till-2.db')
+        self.till.commit()
+        shutil.copy(os.path.join(self.directory, 'till.db'), stale)
+        with self.server:
+            self.server.execute("DELETE FROM Customers WHERE id = 2")
+        # till-1 acknowledges the delete, so the server prunes it from its log
+        _sync(self.till, self.server, 'till-1')
+        _sync(self.till, self.server, 'till-1')
+        self.assertEqual(_rows(self.server, "SELECT COUNT(*) FROM ChangeLog WHERE op = 'D'"), [(0,)])
+
+        # A till that was offline since before the delete is behind the
+        # pruned log, so it gets a snapshot with the delete as a tombstone
+        conn = sqlite3.connect(stale)
+        try:
+            response = _sync(conn, self.server, 'till-2')
+            self.assertEqual(response['changes']['Customers']['deletes'], [2])
+            self.assertEqual(_rows(conn, 'SELECT id FROM Customers'), [(1,)])
+        finally:
+            conn.close()
+
+    def test_sale_over_credit_limit_stays_on_the_terminal(self):
+        _sync(self.till, self.server, 'till-1')
+        with self.server:
+            Accounts.set_credit_limit(self.server, 1, 300)
+        with self.till:
+            self.till.executemany("INSERT INTO Sales (date, customer_id, shop_id, product_id, quantity, total_price) "
+                                  "VALUES ('2025-09-02', ?, 1, 1, 5, ?)", [(1, 500), (2, 100)])
+        response = _sync(self.till, self.server, 'till-1')
+        self.assertEqual(response['applied'], 1)
+        self.assertEqual([r[:2] for r in response['rejected']], [['Sales', 1]])
+        self.assertEqual(_rows(self.server, 'SELECT customer_id, total_price FROM Sales'), [(2, 100)])
+        self.assertEqual(_rows(self.server, 'SELECT current_quantity FROM Stock'), [(45,)])
+        self.assertEqual(_rows(self.till, "SELECT table_name, row_id FROM ChangeLog"), [('Sales', 1)])
+
+        # Once the limit is raised the same sale goes through
+        with self.server:
+            Accounts.set_credit_limit(self.server, 1, 1000)
+        response = _sync(self.till, self.server, 'till-1')
+        self.assertEqual((response['applied'], response['rejected']), (1, []))
+        self.assertEqual(_rows(self.server, 'SELECT customer_id, total_price FROM Sales ORDER BY id'), [(2, 100), (1, 500)])
+        self.assertEqual(_rows(self.till, 'SELECT COUNT(*) FROM ChangeLog'), [(0,)])
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+class HttpSyncTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        server_path = os.path.join(self.directory, 'server.db')
+        self.till_path = os.path.join(self.directory, 'till.db')
+        for path in (server_path, self.till_path):
+            conn = _open(path)
+            with conn:
+                conn.execute("INSERT INTO Shops (name) VALUES ('Main')")
+            conn.close()
+        self.server = sqlite3.connect(server_path)
+        with self.server:
+            self.server.execute("INSERT INTO Customers (name) VALUES ('Asha')")
+            self.server.execute("INSERT INTO Products (product_name, unit) VALUES ('Ghee', 'kg')")
+            self.server.execute("INSERT INTO Stock (product_id, current_quantity, last_updated) VALUES (1, 50, '2025-09-01')")
+        port = _free_port()
+        self.url = f'http://127.0.0.1:{port}'
+        env = dict(os.environ, DAIRY_DB=server_path, DAIRY_CONFIG='', DAIRY_TENANTS='')
+        self.process = subprocess.Popen(
+            [sys.executable, '-c', f'import UI; UI.create_app().run(port={port})'],
+            cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        deadline = time.time() + 30
+        while True:
+            try:
+                urllib.request.urlopen(self.url + '/', timeout=5).close()
+                break
+            except OSError:
+                if time.time() > deadline or self.process.poll() is not None:
+                    self.tearDown()
+                    self.fail('server did not start')
+                time.sleep(0.1)
+
+    def tearDown(self):
+        self.process.terminate()
+        self.process.wait(timeout=10)
+        self.server.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _upload(self, key):
+        conn = sqlite3.connect(self.till_path)
+        try:
+            upload = Sync.build_upload(conn, 'till-1')
+        finally:
+            conn.close()
+        request = urllib.request.Request(self.url + '/sync', data=Sync.encode_payload(upload),
+                                         headers={'Idempotency-Key': key})
+        with urllib.request.urlopen(request, timeout=30) as resp:
+            return Sync.decode_payload(resp.read())
+
+    def test_sync_over_http(self):
+        self.assertEqual(Sync.sync_terminal(self.till_path, self.url, 'till-1'), 0)
+        till = sqlite3.connect(self.till_path)
+        try:
+            self.assertEqual(_rows(till, 'SELECT id, name FROM Customers'), [(1, 'Asha')])
+            with till:
+                till.execute("INSERT INTO Sales (date, customer_id, shop_id, product_id, quantity, total_price) "
+                             "VALUES ('2025-09-02', 1, 1, 1, 5, 500)")
+        finally:
+            till.close()
+        self.assertEqual(Sync.sync_terminal(self.till_path, self.url, 'till-1'), 1)
+        self.assertEqual(_rows(self.server, 'SELECT customer_id, quantity, total_price FROM Sales'), [(1, 5, 500)])
+        self.assertEqual(_rows(self.server, 'SELECT current_quantity FROM Stock'), [(45,)])
+        till = sqlite3.connect(self.till_path)
+        try:
+            self.assertEqual(_rows(till, 'SELECT current_quantity FROM Stock'), [(45,)])
+            self.assertEqual(_rows(till, 'SELECT COUNT(*) FROM ChangeLog'), [(0,)])
+        finally:
+            till.close()
+
+    def test_retried_upload_is_applied_once(self):
+        Sync.sync_terminal(self.till_path, self.url, 'till-1')
+        till = sqlite3.connect(self.till_path)
+        with till:
+            till.execute("INSERT INTO Sales (date, customer_id, shop_id, product_id, quantity, total_price) "
+                         "VALUES ('2025-09-02', 1, 1, 1, 5, 500)")
+        till.close()
+        first = self._upload('upload-1')
+        # The reply was lost; the terminal sends the same upload again
+        with self.server:
+            self.server.execute("UPDATE Stock SET current_quantity = 40")
+        retry = self._upload('upload-1')
+        self.assertEqual((first['applied'], retry['applied']), (1, 0))
+        self.assertEqual(_rows(self.server, 'SELECT COUNT(*) FROM Sales'), [(1,)])
+        self.assertEqual(_rows(self.server, 'SELECT current_quantity FROM Stock'), [(40,)])
+        self.assertEqual(retry['changes']['Stock']['upserts'][0][2], 40)
+
+if __name__ == '__main__':
+    unittest.main()
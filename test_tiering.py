@@ -0,0 +1,137 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+import Config
+import Dairy
+import Tiering
+import UI
+
+# Closing periods into per-year history databases: the triggers that refuse
+# writes dated in a closed period, the move itself and the *_all views.
+# Run with: python -m pytest test_tiering.py
+
+def _open(path):
+    conn = sqlite3.connect(path)
+    Dairy.create_tables(conn)
+    Dairy.upgrade_schema(conn)
+    return conn
+
+SALE = "INSERT INTO Sales (date, customer_id, shop_id, product_id, quantity, total_price) VALUES (?, 1, 1, 1, 1, ?)"
+
+class ClosePeriodTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.history = os.path.join(self.directory, 'history')
+        self.conn = _open(os.path.join(self.directory, 'dairy.db'))
+        with self.conn:
+            self.conn.execute("INSERT INTO Shops (name) VALUES ('Main')")
+            self.conn.execute("INSERT INTO Customers (name) VALUES ('Asha')")
+            self.conn.execute("INSERT INTO Suppliers (name) VALUES ('Green Farm')")
+            self.conn.execute("INSERT INTO Products (product_name, unit) VALUES ('Ghee', 'kg')")
+            self.conn.executemany(SALE, [('2023-11-05', 100), ('2024-12-30', 200), ('2025-01-02', 300)])
+            self.conn.executemany("INSERT INTO MilkCollection (date, source_type, supplier_id, quantity_liters, fat_content) "
+                                  "VALUES (?, 'Supplier', 1, 100, 4.0)", [('2024-12-01',), ('2025-01-01',)])
+            self.conn.execute("INSERT INTO MilkSeparation (date, milk_collection_id, milk_used_liters) VALUES ('2024-12-02', 1, 50)")
+            self.conn.execute("INSERT INTO FatPriceBands (effective_from, min_fat, max_fat, price_per_liter) VALUES ('2023-01-01', 0, 10, 40)")
+
+    def tearDown(self):
+        self.conn.close()
+        shutil.rmtree(self.directory)
+
+    def _close(self, cutoff='2025-01-01'):
+        return Tiering.close_period(self.conn, cutoff, self.history)
+
+    def _refused(self, sql, params=()):
+        with self.assertRaises(sqlite3.IntegrityError) as caught:
+            with self.conn:
+                self.conn.execute(sql, params)
+        self.assertTrue(Tiering.is_closed_period(caught.exception))
+
+    def test_rows_before_the_cutoff_move_to_their_year(self):
+        moved = self._close()
+        self.assertEqual(moved, {'MilkSeparation': 1, 'MilkCollection': 1, 'Production': 0, 'Sales': 2})
+        self.assertEqual(Tiering.history_years(self.history), ['2023', '2024'])
+        self.assertEqual(self.conn.execute('SELECT date FROM Sales').fetchall(), [('2025-01-02',)])
+        history = sqlite3.connect(os.path.join(self.history, '2024.db'))
+        try:
+            self.assertEqual(history.execute('SELECT id, date FROM Sales').fetchall(), [(2, '2024-12-30')])
+            self.assertEqual(history.execute('SELECT id FROM MilkSeparation').fetchall(), [(1,)])
+        finally:
+            history.close()
+        # Nothing is left attached
+        self.assertEqual([row[1] for row in self.conn.execute('PRAGMA database_list')], ['main'])
+
+    def test_closed_months_keep_settlements_and_balances(self):
+        self._close()
+        self.assertEqual(self.conn.execute('SELECT period, amount FROM SupplierSettlements').fetchall(), [('2024-12', 4000), ('2025-01', 4000)])
+        self.assertEqual(self.conn.execute('SELECT balance, total_invoiced FROM CustomerAccounts').fetchall(), [(600, 600)])
+
+    def test_writes_dated_in_a_closed_period_are_refused(self):
+        self._close()
+        self._refused(SALE, ('2024-12-31', 10))
+        self._refused("UPDATE Sales SET date = '2024-06-01' WHERE id = 3")
+        self._refused("INSERT INTO MilkCollection (date, source_type, quantity_liters) VALUES ('2024-12-31', 'Farm', 5)")
+        self._refused("INSERT INTO Production (date, product_id, milk_used_liters, quantity_produced) VALUES ('2024-01-01', 1, 5, 1)")
+        with self.conn:
+            self.conn.execute(SALE, ('2025-01-01', 10))
+            self.conn.execute("UPDATE Sales SET quantity = 2 WHERE id = 3")
+
+    def test_cutoff_never_moves_back(self):
+        self._close()
+        self._close('2024-06-01')
+        self.assertEqual(self.conn.execute('SELECT closed_before FROM ClosedPeriods').fetchone(), ('2025-01-01',))
+
+    def test_cutoff_must_start_a_month(self):
+        with self.assertRaises(ValueError):
+            self._close('2025-01-15')
+        self.assertEqual(self.conn.execute('SELECT COUNT(*) FROM ClosedPeriods').fetchone(), (0,))
+
+    def test_closing_again_moves_nothing(self):
+        self._close()
+        self.assertEqual(sum(self._close().values()), 0)
+
+    def test_all_views_union_live_and_history(self):
+        self._close()
+        self.assertEqual(Tiering.attach_history(self.conn, self.history), ['2023', '2024'])
+        self.assertEqual(self.conn.execute('SELECT id FROM Sales_all ORDER BY id').fetchall(), [(1,), (2,), (3,)])
+        # A narrower range detaches the years it no longer needs
+        self.assertEqual(Tiering.attach_history(self.conn, self.history, '2024-01-01', '2025-12-31'), ['2024'])
+        self.assertEqual(self.conn.execute('SELECT id FROM Sales_all ORDER BY id').fetchall(), [(2,), (3,)])
+        self.assertEqual(self.conn.execute('SELECT COUNT(*) FROM MilkCollection_all').fetchone(), (2,))
+
+class HistoryReadTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        path = os.path.join(self.directory, 'dairy.db')
+        conn = _open(path)
+        with conn:
+            conn.execute("INSERT INTO Shops (name) VALUES ('Main')")
+            conn.execute("INSERT INTO Customers (name) VALUES ('Asha')")
+            conn.execute("INSERT INTO Products (product_name, unit) VALUES ('Ghee', 'kg')")
+            conn.executemany(SALE, [('2024-12-30', 200), ('2025-01-02', 300)])
+        config = Config.load_config(db_path=path)
+        Tiering.close_period(conn, '2025-01-01', Tiering.history_dir(config))
+        conn.close()
+        self.app = UI.create_app(config)
+
+    def tearDown(self):
+        self.app.extensions['dairy'].pool.close()
+        shutil.rmtree(self.directory)
+
+    def test_history_report_leaves_pooled_connections_clean(self):
+        response = self.app.test_client().get('/customers')
+        self.assertEqual(response.status_code, 200)
+        # Both sales, live and closed, are in the report
+        self.assertIn(b'<td>2.0</td>', response.data)
+        pool = self.app.extensions['dairy'].pool
+        conn = pool.get()
+        try:
+            self.assertEqual([row[1] for row in conn.execute('PRAGMA database_list')], ['main'])
+            self.assertEqual(conn.execute('SELECT COUNT(*) FROM sqlite_temp_master').fetchone(), (0,))
+        finally:
+            conn.close()
+
+if __name__ == '__main__':
+    unittest.main()